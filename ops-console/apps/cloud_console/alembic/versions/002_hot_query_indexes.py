@@ -0,0 +1,36 @@
+"""composite indexes for hot queries (see app/queries.py)
+
+Revision ID: 002_hot_query_indexes
+Revises: 001_init
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "002_hot_query_indexes"
+down_revision: Union[str, None] = "001_init"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # pull_tasks：node_id + state 过滤，按 created_at 认领
+    op.create_index("ix_tasks_node_id_state_created_at", "tasks", ["node_id", "state", "created_at", "id"], unique=False)
+    # ui_node_detail：单节点按 updated_at DESC
+    op.create_index("ix_tasks_node_id_updated_at", "tasks", ["node_id", "updated_at"], unique=False)
+    # ui_tasks：ORDER BY created_at DESC LIMIT 50
+    op.create_index("ix_tasks_created_at", "tasks", ["created_at", "id"], unique=False)
+    # ui_nodes：按 last_seen 排序
+    op.create_index("ix_nodes_last_seen", "nodes", ["last_seen"], unique=False)
+    # node_id 单列索引是上面两个复合索引的前缀，删除以减少写放大
+    op.drop_index(op.f("ix_tasks_node_id"), table_name="tasks")
+
+
+def downgrade() -> None:
+    op.create_index(op.f("ix_tasks_node_id"), "tasks", ["node_id"], unique=False)
+    op.drop_index("ix_nodes_last_seen", table_name="nodes")
+    op.drop_index("ix_tasks_created_at", table_name="tasks")
+    op.drop_index("ix_tasks_node_id_updated_at", table_name="tasks")
+    op.drop_index("ix_tasks_node_id_state_created_at", table_name="tasks")
@@ -0,0 +1,36 @@
+"""node_events table and nodes(status, last_seen) index for the liveness sweeper
+
+Revision ID: 003_node_liveness
+Revises: 002_hot_query_indexes
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "003_node_liveness"
+down_revision: Union[str, None] = "002_hot_query_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "node_events",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, primary_key=True),
+        sa.Column("node_id", sa.String(64), nullable=False),
+        sa.Column("from_status", sa.String(32), nullable=True),
+        sa.Column("to_status", sa.String(32), nullable=False),
+        sa.Column("ts", sa.DateTime(), nullable=False, server_default=sa.text("CURRENT_TIMESTAMP")),
+    )
+    op.create_index("ix_node_events_node_id_ts", "node_events", ["node_id", "ts"], unique=False)
+    # 存活扫描：status != 'offline' AND last_seen < cutoff；节点列表按 status 过滤
+    op.create_index("ix_nodes_status_last_seen", "nodes", ["status", "last_seen"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_nodes_status_last_seen", table_name="nodes")
+    op.drop_index("ix_node_events_node_id_ts", table_name="node_events")
+    op.drop_table("node_events")
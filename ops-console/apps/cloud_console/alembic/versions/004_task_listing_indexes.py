@@ -0,0 +1,28 @@
+"""indexes for keyset-paginated task listing (see app/queries.task_page)
+
+Revision ID: 004_task_listing_indexes
+Revises: 003_node_liveness
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "004_task_listing_indexes"
+down_revision: Union[str, None] = "003_node_liveness"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 任务列表按 (created_at, id) 倒序翻页，每种过滤条件各有一条以 (created_at, id) 结尾的索引
+    op.create_index("ix_tasks_node_id_created_at", "tasks", ["node_id", "created_at", "id"], unique=False)
+    op.create_index("ix_tasks_state_created_at", "tasks", ["state", "created_at", "id"], unique=False)
+    op.create_index("ix_tasks_type_created_at", "tasks", ["type", "created_at", "id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tasks_type_created_at", table_name="tasks")
+    op.drop_index("ix_tasks_state_created_at", table_name="tasks")
+    op.drop_index("ix_tasks_node_id_created_at", table_name="tasks")
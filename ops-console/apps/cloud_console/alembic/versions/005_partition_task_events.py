@@ -0,0 +1,56 @@
+"""range-partition task_events by month on ts (MySQL only)
+
+Revision ID: 005_partition_task_events
+Revises: 004_task_listing_indexes
+Create Date: 2026-10-18
+
+分区后过期数据由 app/retention.py 按分区归档并 DROP PARTITION，不再需要大批量 DELETE。
+MySQL 要求分区列出现在每个唯一键中，主键改为 (id, ts)；id 仍自增且唯一。
+tasks 不分区：任务按 id 点查（认领、回传、详情）无法做分区裁剪，且 id 需要保持全局唯一约束。
+其他方言（SQLite 开发 / 测试库）不做任何变更，retention 退回按时间分批 DELETE。
+"""
+from datetime import date, datetime
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "005_partition_task_events"
+down_revision: Union[str, None] = "004_task_listing_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 迁移时预建的未来月份分区数，之后由 retention 任务维护
+_MONTHS_AHEAD = 3
+
+
+def _next_month(d: date) -> date:
+    return date(d.year + (d.month == 12), d.month % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "mysql":
+        return
+    op.execute("ALTER TABLE task_events DROP PRIMARY KEY, ADD PRIMARY KEY (id, ts)")
+
+    oldest = bind.execute(sa.text("SELECT MIN(ts) FROM task_events")).scalar()
+    today = datetime.utcnow().date()
+    month = (oldest.date() if oldest else today).replace(day=1)
+    last = today.replace(day=1)
+    for _ in range(_MONTHS_AHEAD):
+        last = _next_month(last)
+    parts = []
+    while month <= last:
+        upper = _next_month(month)
+        parts.append(f"PARTITION p{month:%Y%m} VALUES LESS THAN (TO_DAYS('{upper:%Y-%m-%d}'))")
+        month = upper
+    parts.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+    op.execute(f"ALTER TABLE task_events PARTITION BY RANGE (TO_DAYS(ts)) ({', '.join(parts)})")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "mysql":
+        return
+    op.execute("ALTER TABLE task_events REMOVE PARTITIONING")
+    op.execute("ALTER TABLE task_events DROP PRIMARY KEY, ADD PRIMARY KEY (id)")
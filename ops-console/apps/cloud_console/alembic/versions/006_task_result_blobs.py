@@ -0,0 +1,39 @@
+"""task_blobs table and tasks.result_ref / result_size for out-of-row results
+
+Revision ID: 006_task_result_blobs
+Revises: 005_partition_task_events
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import mysql
+
+revision: str = "006_task_result_blobs"
+down_revision: Union[str, None] = "005_partition_task_events"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "task_blobs",
+        sa.Column("sha256", sa.String(64), primary_key=True),
+        sa.Column("codec", sa.String(16), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("data", sa.LargeBinary().with_variant(mysql.LONGBLOB(), "mysql"), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.text("CURRENT_TIMESTAMP")),
+    )
+    op.add_column("tasks", sa.Column("result_ref", sa.String(64), nullable=True))
+    op.add_column("tasks", sa.Column("result_size", sa.Integer(), nullable=True))
+    # 删除任务后回收不再被引用的 blob
+    op.create_index("ix_tasks_result_ref", "tasks", ["result_ref"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tasks_result_ref", table_name="tasks")
+    op.drop_column("tasks", "result_size")
+    op.drop_column("tasks", "result_ref")
+    op.drop_table("task_blobs")
@@ -0,0 +1,35 @@
+"""task_output_chunks table and tasks.output_bytes for streamed task output
+
+Revision ID: 007_task_output_chunks
+Revises: 006_task_result_blobs
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "007_task_output_chunks"
+down_revision: Union[str, None] = "006_task_result_blobs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "task_output_chunks",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, primary_key=True),
+        sa.Column("task_id", sa.String(64), nullable=False),
+        sa.Column("seq", sa.Integer(), nullable=False),
+        sa.Column("data", sa.Text(), nullable=False),
+        sa.Column("ts", sa.DateTime(), nullable=False, server_default=sa.text("CURRENT_TIMESTAMP")),
+        # 重传的同一片段被唯一键拒绝；tail 按 (task_id, seq) 顺序读取
+        sa.UniqueConstraint("task_id", "seq", name="uq_task_output_chunks_task_id_seq"),
+    )
+    op.add_column("tasks", sa.Column("output_bytes", sa.Integer(), nullable=False, server_default=sa.text("0")))
+
+
+def downgrade() -> None:
+    op.drop_column("tasks", "output_bytes")
+    op.drop_table("task_output_chunks")
@@ -0,0 +1,36 @@
+"""node_tokens table: hashed per-project / per-node agent tokens
+
+Revision ID: 008_node_tokens
+Revises: 007_task_output_chunks
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "008_node_tokens"
+down_revision: Union[str, None] = "007_task_output_chunks"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "node_tokens",
+        sa.Column("id", sa.String(32), primary_key=True),
+        sa.Column("project_key", sa.String(64), nullable=False),
+        sa.Column("node_id", sa.String(64), nullable=True),
+        sa.Column("secret_hash", sa.String(255), nullable=False),
+        sa.Column("description", sa.String(255), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.text("CURRENT_TIMESTAMP")),
+        sa.Column("rotated_at", sa.DateTime(), nullable=True),
+        sa.Column("revoked_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_node_tokens_project_key", "node_tokens", ["project_key"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_node_tokens_project_key", table_name="node_tokens")
+    op.drop_table("node_tokens")
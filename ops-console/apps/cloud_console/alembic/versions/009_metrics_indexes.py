@@ -0,0 +1,24 @@
+"""index for /metrics backlog gauges (task counts by state, per-node pending depth)
+
+Revision ID: 009_metrics_indexes
+Revises: 008_node_tokens
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "009_metrics_indexes"
+down_revision: Union[str, None] = "008_node_tokens"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 覆盖 state = ? GROUP BY node_id：只扫积压范围，不回表、不排序
+    op.create_index("ix_tasks_state_node_id", "tasks", ["state", "node_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tasks_state_node_id", table_name="tasks")
@@ -0,0 +1,55 @@
+"""normalize tasks.payload_json of pending tasks to valid JSON (pull response splices it verbatim)
+
+Revision ID: 010_task_payload_json
+Revises: 009_metrics_indexes
+Create Date: 2026-10-18
+
+"""
+import json
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "010_task_payload_json"
+down_revision: Union[str, None] = "009_metrics_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_tasks = sa.table(
+    "tasks",
+    sa.column("id", sa.String),
+    sa.column("state", sa.String),
+    sa.column("payload_json", sa.Text),
+)
+
+
+def upgrade() -> None:
+    # 旧接口 payload 为任意字符串（约定为已编码的 JSON 文档）；拉取接口现在把 payload_json 原样拼进响应，
+    # 待执行 / 执行中任务里不是合法 JSON 的 payload 改存为 JSON 字符串字面量（Agent 收到的仍是原字符串）。
+    # 只处理升级前按旧协议写入的行：升级后的写入由 rawjson.encode_document 编码，字符串值总是存为 JSON 字符串。
+    # 只扫 CREATED / RUNNING（走 ix_tasks_state_node_id），已结束任务不会再被拉取。
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.select(_tasks.c.id, _tasks.c.payload_json).where(_tasks.c.state.in_(("CREATED", "RUNNING")))
+    ).all()
+    fixes = []
+    for task_id, payload in rows:
+        if not payload:
+            # 空 payload 旧版 Agent 按 {} 处理
+            fixes.append({"b_id": task_id, "payload_json": "{}"})
+            continue
+        try:
+            json.loads(payload)
+        except ValueError:
+            fixes.append({"b_id": task_id, "payload_json": json.dumps(payload, ensure_ascii=False)})
+    if fixes:
+        conn.execute(
+            _tasks.update().where(_tasks.c.id == sa.bindparam("b_id")).values(payload_json=sa.bindparam("payload_json")),
+            fixes,
+        )
+
+
+def downgrade() -> None:
+    # 数据修正不可逆，也无需回滚：旧代码同样可以读取
+    pass
@@ -0,0 +1,34 @@
+"""tasks.priority / not_before and claim-order index
+
+Revision ID: 011_task_priority
+Revises: 010_task_payload_json
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "011_task_priority"
+down_revision: Union[str, None] = "010_task_payload_json"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("tasks", sa.Column("priority", sa.Integer(), nullable=False, server_default=sa.text("0")))
+    op.add_column("tasks", sa.Column("not_before", sa.DateTime(), nullable=True))
+    # 认领顺序 priority DESC, created_at, id 与索引顺序一致（MySQL 8 降序索引），无 filesort；
+    # not_before 放在末尾，过滤不回表
+    op.create_index(
+        "ix_tasks_node_id_state_priority_created_at",
+        "tasks",
+        ["node_id", "state", sa.text("priority DESC"), "created_at", "id", "not_before"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tasks_node_id_state_priority_created_at", table_name="tasks")
+    op.drop_column("tasks", "not_before")
+    op.drop_column("tasks", "priority")
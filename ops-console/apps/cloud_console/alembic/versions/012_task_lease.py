@@ -0,0 +1,46 @@
+"""tasks.lease_expires_at / attempts: claim leases reaped back to CREATED
+
+Revision ID: 012_task_lease
+Revises: 011_task_priority
+Create Date: 2026-10-18
+
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "012_task_lease"
+down_revision: Union[str, None] = "011_task_priority"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 升级时已在执行中的任务给一个租约，过期后由回收任务处理（不再永久停留在 RUNNING）
+_INITIAL_LEASE = timedelta(seconds=300)
+
+_tasks = sa.table(
+    "tasks",
+    sa.column("state", sa.String),
+    sa.column("lease_expires_at", sa.DateTime),
+    sa.column("attempts", sa.Integer),
+)
+
+
+def upgrade() -> None:
+    op.add_column("tasks", sa.Column("lease_expires_at", sa.DateTime(), nullable=True))
+    op.add_column("tasks", sa.Column("attempts", sa.Integer(), nullable=False, server_default=sa.text("0")))
+    op.create_index("ix_tasks_state_lease_expires_at", "tasks", ["state", "lease_expires_at"])
+    # 走 ix_tasks_state_lease_expires_at 的 state 前缀，只更新 RUNNING 行
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    op.execute(
+        _tasks.update()
+        .where(_tasks.c.state == "RUNNING")
+        .values(lease_expires_at=now + _INITIAL_LEASE, attempts=1)
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_tasks_state_lease_expires_at", table_name="tasks")
+    op.drop_column("tasks", "attempts")
+    op.drop_column("tasks", "lease_expires_at")
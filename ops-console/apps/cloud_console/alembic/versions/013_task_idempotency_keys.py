@@ -0,0 +1,32 @@
+"""task_idempotency_keys table for idempotent task creation
+
+Revision ID: 013_task_idempotency_keys
+Revises: 012_task_lease
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "013_task_idempotency_keys"
+down_revision: Union[str, None] = "012_task_lease"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "task_idempotency_keys",
+        # 主键即项目内唯一约束，重试按主键点查
+        sa.Column("project_key", sa.String(64), primary_key=True),
+        sa.Column("idempotency_key", sa.String(128), primary_key=True),
+        sa.Column("node_id", sa.String(64), nullable=False),
+        sa.Column("task_id", sa.String(64), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.text("CURRENT_TIMESTAMP")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("task_idempotency_keys")
@@ -0,0 +1,35 @@
+"""drop task indexes covered by other composite indexes
+
+Revision ID: 014_drop_redundant_task_indexes
+Revises: 013_task_idempotency_keys
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "014_drop_redundant_task_indexes"
+down_revision: Union[str, None] = "013_task_idempotency_keys"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (索引名, 列)，downgrade 原样重建
+_DROPPED = (
+    # node_id + state 的任务列表改走 ix_tasks_node_id_created_at（state 回表过滤）
+    ("ix_tasks_node_id_state_created_at", ["node_id", "state", "created_at", "id"]),
+    # 节点详情页最近任务改按 created_at 排序，与任务列表共用 ix_tasks_node_id_created_at
+    ("ix_tasks_node_id_updated_at", ["node_id", "updated_at"]),
+    # /metrics 积压计数改用 state 前缀的其他索引，每节点积压改用认领索引的 (node_id, state) 前缀
+    ("ix_tasks_state_node_id", ["state", "node_id"]),
+)
+
+
+def upgrade() -> None:
+    for name, _ in _DROPPED:
+        op.drop_index(name, table_name="tasks")
+
+
+def downgrade() -> None:
+    for name, columns in _DROPPED:
+        op.create_index(name, "tasks", columns)
@@ -0,0 +1,29 @@
+"""task_idempotency_keys.task_id index: keys are deleted with their node's tasks
+
+Revision ID: 015_task_idempotency_keys_task_id
+Revises: 014_drop_redundant_task_indexes
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "015_task_idempotency_keys_task_id"
+down_revision: Union[str, None] = "014_drop_redundant_task_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_keys = sa.table("task_idempotency_keys", sa.column("task_id", sa.String))
+_tasks = sa.table("tasks", sa.column("id", sa.String))
+
+
+def upgrade() -> None:
+    op.create_index("ix_task_idempotency_keys_task_id", "task_idempotency_keys", ["task_id"])
+    # 此前删除节点时遗留的幂等键指向已不存在的任务，带同一个键的重试会拿到失效的 task_id
+    op.execute(_keys.delete().where(~sa.exists().where(_tasks.c.id == _keys.c.task_id)))
+
+
+def downgrade() -> None:
+    op.drop_index("ix_task_idempotency_keys_task_id", table_name="task_idempotency_keys")
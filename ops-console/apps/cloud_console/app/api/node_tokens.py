@@ -0,0 +1,148 @@
+"""
+节点 Token 管理 API（admin）：签发、列表、轮换、吊销。明文 Token 只在签发 / 轮换的响应中出现一次。
+"""
+from datetime import datetime, timezone
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from packages.common.schemas import (
+    NodeTokenCreateRequest,
+    NodeTokenCreateResponse,
+    NodeTokenItem,
+    NodeTokenListResponse,
+    NodeTokenRevokeResponse,
+)
+
+from ..db import get_async_db
+from ..deps import require_admin_basic_auth
+from ..models import Node, NodeToken
+from ..node_tokens import new_secret, new_token_id, token_cache
+
+router = APIRouter()
+
+
+def _err(code: str, msg: str, status_code: int = 400):
+    raise HTTPException(
+        status_code=status_code,
+        detail={"ok": False, "error_code": code, "message": msg},
+    )
+
+
+def _now_utc() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _iso(ts: datetime | None) -> str | None:
+    return ts.isoformat() if ts else None
+
+
+@router.post(
+    "",
+    response_model=NodeTokenCreateResponse,
+    responses={401: {"description": "Authentication required"}, 404: {"description": "Node not found"}},
+)
+async def create_node_token(
+    body: NodeTokenCreateRequest,
+    _: Annotated[None, Depends(require_admin_basic_auth)],
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+):
+    """签发 Token：node_id 为空时为项目级 Token，否则只能以该节点身份访问（节点须已存在且属于该项目）。"""
+    if body.node_id is not None:
+        node = await db.get(Node, body.node_id)
+        if node is None or node.project_key != body.project_key:
+            _err("NODE_NOT_FOUND", "Node not found in project", status.HTTP_404_NOT_FOUND)
+    token_id = new_token_id()
+    token, secret_hash = new_secret(token_id)
+    db.add(
+        NodeToken(
+            id=token_id,
+            project_key=body.project_key,
+            node_id=body.node_id,
+            secret_hash=secret_hash,
+            description=body.description,
+            created_at=_now_utc(),
+        )
+    )
+    await db.commit()
+    return NodeTokenCreateResponse(token_id=token_id, token=token, project_key=body.project_key, node_id=body.node_id)
+
+
+@router.get(
+    "",
+    response_model=NodeTokenListResponse,
+    responses={401: {"description": "Authentication required"}},
+)
+async def list_node_tokens(
+    _: Annotated[None, Depends(require_admin_basic_auth)],
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    project_key: str | None = None,
+    include_revoked: bool = False,
+):
+    """Token 列表（不含哈希），可按 project_key 过滤。"""
+    stmt = select(NodeToken).order_by(NodeToken.created_at.desc(), NodeToken.id)
+    if project_key:
+        stmt = stmt.where(NodeToken.project_key == project_key)
+    if not include_revoked:
+        stmt = stmt.where(NodeToken.revoked_at.is_(None))
+    rows = (await db.execute(stmt)).scalars().all()
+    return NodeTokenListResponse(
+        tokens=[
+            NodeTokenItem(
+                token_id=t.id,
+                project_key=t.project_key,
+                node_id=t.node_id,
+                description=t.description,
+                created_at=t.created_at.isoformat(),
+                rotated_at=_iso(t.rotated_at),
+                revoked_at=_iso(t.revoked_at),
+            )
+            for t in rows
+        ]
+    )
+
+
+async def _active_token(db: AsyncSession, token_id: str) -> NodeToken:
+    row = await db.get(NodeToken, token_id, with_for_update=True)
+    if row is None or row.revoked_at is not None:
+        _err("TOKEN_NOT_FOUND", "Token not found or revoked", status.HTTP_404_NOT_FOUND)
+    return row
+
+
+@router.post(
+    "/{token_id}/rotate",
+    response_model=NodeTokenCreateResponse,
+    responses={401: {"description": "Authentication required"}, 404: {"description": "Token not found"}},
+)
+async def rotate_node_token(
+    token_id: str,
+    _: Annotated[None, Depends(require_admin_basic_auth)],
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+):
+    """轮换 secret：token_id 与绑定范围不变，旧 Token 立即失效（本进程缓存随即清除）。"""
+    row = await _active_token(db, token_id)
+    token, row.secret_hash = new_secret(token_id)
+    row.rotated_at = _now_utc()
+    await db.commit()
+    token_cache.invalidate(token_id)
+    return NodeTokenCreateResponse(token_id=token_id, token=token, project_key=row.project_key, node_id=row.node_id)
+
+
+@router.post(
+    "/{token_id}/revoke",
+    response_model=NodeTokenRevokeResponse,
+    responses={401: {"description": "Authentication required"}, 404: {"description": "Token not found"}},
+)
+async def revoke_node_token(
+    token_id: str,
+    _: Annotated[None, Depends(require_admin_basic_auth)],
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+):
+    """吊销 Token。"""
+    row = await _active_token(db, token_id)
+    row.revoked_at = _now_utc()
+    await db.commit()
+    token_cache.invalidate(token_id)
+    return NodeTokenRevokeResponse(token_id=token_id)
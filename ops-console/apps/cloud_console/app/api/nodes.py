@@ -1,28 +1,41 @@
 """
-节点 API：注册、心跳。
+节点 API：注册、心跳、节点列表、任务拉取。
 """
 import json
-from datetime import datetime, timezone
+import time
+from datetime import datetime, timedelta, timezone
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from packages.common.schemas import (
     NodeHeartbeatRequest,
     NodeHeartbeatResponse,
+    NodeListItem,
+    NodeListResponse,
     NodeRegisterRequest,
     NodeRegisterResponse,
-    TaskPullItem,
     TaskPullResponse,
 )
+from packages.common.rawjson import splice_object
 
-from ..db import get_db
-from ..deps import require_node_token
+from ..config import settings
+from ..db import get_async_db
+from ..deps import check_node_scope, node_scope, require_node_token
+from ..events import node_changed, task_changed
+from ..liveness import record_transitions
 from ..models import Node, Task, TaskEvent
+from ..presence import buffered, presence
+from ..queries import claim_candidates, nodes_by_last_seen
+from ..responses import FastJSONResponse
+from ..task_notify import task_waiters
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
+
+# GET /api/nodes 单次最多返回的节点数
+_NODE_LIST_MAX = 1000
 
 
 def _err(code: str, msg: str, status_code: int = 400):
@@ -45,18 +58,20 @@ def _now_utc() -> datetime:
     },
 )
 async def register_node(
+    request: Request,
     body: NodeRegisterRequest,
     project_key: Annotated[str, Depends(require_node_token)],
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_async_db)],
 ):
     """节点注册：校验 token 与 project_key，创建或更新节点。"""
     if body.project_key != project_key:
         _err("PROJECT_KEY_MISMATCH", "project_key does not match token", status.HTTP_403_FORBIDDEN)
+    check_node_scope(request, body.node_id)
 
     now = _now_utc()
     tags_json = json.dumps(body.tags)
 
-    node = db.get(Node, body.node_id)
+    node = await db.get(Node, body.node_id)
     if node is None:
         node = Node(
             id=body.node_id,
@@ -68,17 +83,22 @@ async def register_node(
             status="online",
         )
         db.add(node)
+        await record_transitions(db, [(body.node_id, None, "online")], now)
     else:
         if node.project_key != project_key:
             _err("FORBIDDEN", "Node belongs to another project", status.HTTP_403_FORBIDDEN)
+        if node.status != "online":
+            await record_transitions(db, [(node.id, node.status, "online")], now)
         node.name = body.name
         node.tags_json = tags_json
         node.version = body.version
         node.status = "online"
         node.last_seen = now
+    node_changed(db, body.node_id, "online", now)
 
-    db.commit()
-    db.refresh(node)
+    await db.commit()
+    await db.refresh(node)
+    presence.remember(node.id, node.project_key)
 
     return NodeRegisterResponse(
         ok=True,
@@ -87,70 +107,186 @@ async def register_node(
     )
 
 
+@router.get(
+    "",
+    response_model=NodeListResponse,
+    responses={401: {"description": "Invalid or missing token"}},
+)
+async def list_nodes(
+    request: Request,
+    project_key: Annotated[str, Depends(require_node_token)],
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    status_filter: Annotated[str | None, Query(alias="status")] = None,
+    limit: int = 100,
+):
+    """
+    本项目节点列表，按 last_seen 倒序；status 过滤走 ix_nodes_status_last_seen（在线状态由存活扫描维护）。
+    节点级 Token 只能看到自身。
+    """
+    limit = min(max(limit, 1), _NODE_LIST_MAX)
+    stmt = nodes_by_last_seen(status_filter).where(Node.project_key == project_key)
+    if node_scope(request) is not None:
+        stmt = stmt.where(Node.id == node_scope(request))
+    rows = (await db.execute(stmt.limit(limit))).scalars().all()
+    return NodeListResponse(
+        nodes=[
+            NodeListItem(
+                node_id=n.id,
+                name=n.name,
+                status=n.status,
+                version=n.version,
+                last_seen=n.last_seen.isoformat() if n.last_seen else None,
+            )
+            for n in rows
+        ]
+    )
+
+
 @router.post(
     "/{node_id}/heartbeat",
     response_model=NodeHeartbeatResponse,
     responses={401: {"description": "Invalid or missing token"}, 404: {"description": "Node not found"}},
 )
 async def heartbeat(
+    request: Request,
     node_id: str,
     body: NodeHeartbeatRequest,
     project_key: Annotated[str, Depends(require_node_token)],
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_async_db)],
 ):
-    """节点心跳：更新 last_seen 与 status。"""
-    node = db.execute(select(Node).where(Node.id == node_id, Node.project_key == project_key)).scalar_one_or_none()
+    """节点心跳：更新 last_seen 与 status。buffered 模式下只写 presence 表，由后台批量写回。"""
+    check_node_scope(request, node_id)
+    if buffered():
+        owner = presence.owner_of(node_id)
+        if owner is None:
+            node = await db.get(Node, node_id)
+            if node is not None:
+                owner = node.project_key
+                presence.remember(node_id, owner)
+        if owner != project_key:
+            _err("NODE_NOT_FOUND", "Node not found or access denied", status.HTTP_404_NOT_FOUND)
+        presence.record(node_id, body.status, _now_utc())
+        return NodeHeartbeatResponse(ok=True)
+
+    node = (
+        await db.execute(select(Node).where(Node.id == node_id, Node.project_key == project_key))
+    ).scalar_one_or_none()
     if node is None:
         _err("NODE_NOT_FOUND", "Node not found or access denied", status.HTTP_404_NOT_FOUND)
 
     now = _now_utc()
+    if node.status != body.status:
+        await record_transitions(db, [(node.id, node.status, body.status)], now)
     node.last_seen = now
     node.status = body.status
+    node_changed(db, node.id, body.status, now)
 
-    db.commit()
+    await db.commit()
 
     return NodeHeartbeatResponse(ok=True)
 
 
+async def _claim_tasks(db: AsyncSession, node_id: str, state: str, limit: int) -> list[bytes]:
+    """
+    在一个事务内认领节点最多 limit 个指定 state 的任务并置为 RUNNING，返回每个任务编码好的 JSON（TaskPullItem）。
+    并发的两次拉取不会领到同一任务：
+    - MySQL：SELECT ... FOR UPDATE SKIP LOCKED 锁定候选行，再按 id 批量 UPDATE；
+    - 支持 UPDATE ... RETURNING 的后端（SQLite / PostgreSQL）：单条 UPDATE 原子完成认领。
+    认领时 attempts 加 1 并设置 TASK_LEASE_SEC 秒的租约（到期未续租由 app/leases.py 回收）。
+    RUNNING 事件用一条多行 INSERT 写入。
+    payload 以库里的 JSON 文本原样拼入，不解析、不转义。
+    """
+    now = _now_utc()
+    lease_expires_at = now + timedelta(seconds=settings.TASK_LEASE_SEC)
+    columns = (Task.id, Task.node_id, Task.type, Task.payload_json, Task.priority, Task.attempts, Task.created_at)
+    candidates = claim_candidates(node_id, state, limit, now)
+    claim = (
+        update(Task)
+        .values(state="RUNNING", updated_at=now, lease_expires_at=lease_expires_at, attempts=Task.attempts + 1)
+        .execution_options(synchronize_session=False)
+    )
+    # RETURNING 返回更新后的 attempts，先查后改时读到的是更新前的值
+    returning = db.get_bind().dialect.update_returning
+    if returning:
+        rows = (
+            await db.execute(
+                claim.where(Task.id.in_(candidates.scalar_subquery()), Task.state == state).returning(*columns)
+            )
+        ).all()
+        # RETURNING 不保证顺序，按认领顺序重排
+        rows.sort(key=lambda r: (-r.priority, r.created_at, r.id))
+    else:
+        rows = (await db.execute(candidates.with_only_columns(*columns))).all()
+        if rows:
+            await db.execute(claim.where(Task.id.in_([r.id for r in rows])))
+
+    if rows:
+        await db.execute(
+            insert(TaskEvent),
+            [{"task_id": r.id, "state": "RUNNING", "message": None, "ts": now} for r in rows],
+        )
+        for r in rows:
+            task_changed(db, r.id, r.node_id, "RUNNING", now, r.type)
+    await db.commit()
+
+    updated_at = now.isoformat()
+    lease = lease_expires_at.isoformat()
+    return [
+        splice_object(
+            {
+                "task_id": r.id,
+                "node_id": r.node_id,
+                "type": r.type,
+                "priority": r.priority,
+                "state": "RUNNING",
+                "attempt": r.attempts if returning else r.attempts + 1,
+                "lease_expires_at": lease,
+                "created_at": r.created_at.isoformat(),
+                "updated_at": updated_at,
+            },
+            {"payload": r.payload_json or "{}"},
+        )
+        for r in rows
+    ]
+
+
 @router.get(
     "/{node_id}/tasks",
     response_model=TaskPullResponse,
     responses={401: {"description": "Invalid token"}, 404: {"description": "Node not found"}},
 )
 async def pull_tasks(
+    request: Request,
     node_id: str,
     project_key: Annotated[str, Depends(require_node_token)],
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_async_db)],
     state: str = "CREATED",
+    wait: float = 0,
+    limit: int | None = None,
 ):
-    """拉取节点任务：返回指定 state 的任务，并更新为 RUNNING。"""
-    node = db.execute(select(Node).where(Node.id == node_id, Node.project_key == project_key)).scalar_one_or_none()
+    """
+    拉取节点任务：按 priority 从高到低、同优先级先进先出，认领最多 limit 个（上限 TASK_PULL_MAX_BATCH）
+    指定 state 且已到 not_before 的任务，并更新为 RUNNING；每个任务带租约到期时间，需在此之前续租或回传。
+    wait > 0 时为长轮询：没有任务则挂起，直到有新任务创建或等待 wait 秒（上限 TASK_LONG_POLL_MAX_SEC）。
+    """
+    check_node_scope(request, node_id)
+    node = (
+        await db.execute(select(Node).where(Node.id == node_id, Node.project_key == project_key))
+    ).scalar_one_or_none()
     if node is None:
         _err("NODE_NOT_FOUND", "Node not found or access denied", status.HTTP_404_NOT_FOUND)
 
-    tasks = (
-        db.execute(select(Task).where(Task.node_id == node_id, Task.state == state))
-        .scalars()
-        .all()
-    )
-    now = _now_utc()
-    result = []
-    for t in tasks:
-        t.state = "RUNNING"
-        t.updated_at = now
-        ev = TaskEvent(task_id=t.id, state="RUNNING", message=None, ts=now)
-        db.add(ev)
-        result.append(
-            TaskPullItem(
-                task_id=t.id,
-                node_id=t.node_id,
-                type=t.type,
-                payload=t.payload_json or "{}",
-                state="RUNNING",
-                created_at=t.created_at.isoformat(),
-                updated_at=t.updated_at.isoformat(),
-            )
-        )
-    db.commit()
+    wait = min(max(wait, 0.0), float(settings.TASK_LONG_POLL_MAX_SEC))
+    limit = min(max(limit or settings.TASK_PULL_MAX_BATCH, 1), settings.TASK_PULL_MAX_BATCH)
+    deadline = time.monotonic() + wait
+    while True:
+        with task_waiters.listen(node_id) as arrived:
+            # _claim_tasks 已提交事务，等待期间不占用连接
+            result = await _claim_tasks(db, node_id, state, limit)
+            remaining = deadline - time.monotonic()
+            if result or remaining <= 0:
+                break
+            await task_waiters.wait(arrived, remaining)
 
-    return TaskPullResponse(tasks=result)
+    # 直接拼出 TaskPullResponse，绕过 response_model 的逐字段校验与序列化
+    return Response(b'{"tasks":[' + b",".join(result) + b"]}", media_type="application/json")
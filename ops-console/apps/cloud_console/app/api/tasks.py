@@ -1,26 +1,60 @@
 """
-任务 API：创建、拉取、回传。
+任务 API：创建、批量下发、流式输出、租约续期、回传、任务列表。
 """
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from packages.common.schemas import (
+    TaskBatchCreateItem,
+    TaskBatchCreateRequest,
+    TaskBatchCreateResponse,
     TaskCreateRequest,
     TaskCreateResponse,
+    TaskLeaseRenewRequest,
+    TaskLeaseRenewResponse,
+    TaskListItem,
+    TaskListResponse,
+    TaskOutputRequest,
+    TaskOutputResponse,
+    TaskReportBatchRequest,
+    TaskReportBatchResponse,
     TaskReportRequest,
     TaskReportResponse,
 )
+from packages.common.rawjson import encode_document
 
-from ..db import get_db
-from ..deps import require_node_token
-from ..models import Node, Task, TaskEvent
+from ..blobs import pack_result, store_blobs
+from ..config import settings
+from ..db import get_async_db
+from ..deps import check_node_scope, node_scope, require_admin_basic_auth, require_node_token
+from ..events import task_changed
+from ..models import (
+    TASK_PRIORITY_MAX,
+    TASK_PRIORITY_MIN,
+    Node,
+    Task,
+    TaskEvent,
+    TaskIdempotencyKey,
+    TaskOutputChunk,
+)
+from ..queries import decode_cursor, encode_cursor, task_page
+from ..responses import FastJSONResponse
+from ..task_notify import output_waiters, task_waiters
+
+router = APIRouter(default_response_class=FastJSONResponse)
 
-router = APIRouter()
+# GET /api/tasks 单页最多条数
+_TASK_LIST_MAX = 200
+# POST /api/tasks/renew 单次最多续租的任务数
+_RENEW_MAX = 1000
+# 幂等键最大长度（task_idempotency_keys.idempotency_key）
+_IDEMPOTENCY_KEY_MAX = 128
 
 
 def _err(code: str, msg: str, status_code: int = 400):
@@ -34,71 +68,497 @@ def _now_utc() -> datetime:
     return datetime.now(timezone.utc).replace(tzinfo=None)
 
 
-def _add_task_event(db: Session, task_id: str, state: str, message: str | None = None) -> None:
-    ev = TaskEvent(task_id=task_id, state=state, message=message, ts=_now_utc())
+def _new_task_id() -> str:
+    return f"task-{uuid.uuid4().hex[:12]}"
+
+
+def _schedule(priority: int, not_before: datetime | None) -> tuple[int, datetime | None]:
+    """校验优先级范围；not_before 统一为不带时区的 UTC（与库中时间一致）。"""
+    if not TASK_PRIORITY_MIN <= priority <= TASK_PRIORITY_MAX:
+        _err("INVALID_PRIORITY", f"priority must be between {TASK_PRIORITY_MIN} and {TASK_PRIORITY_MAX}")
+    if not_before is not None and not_before.tzinfo is not None:
+        not_before = not_before.astimezone(timezone.utc).replace(tzinfo=None)
+    return priority, not_before
+
+
+async def _idempotent_task(db: AsyncSession, project_key: str, key: str, node_id: str) -> str | None:
+    """按主键查幂等键，命中时返回首次创建的 task_id；同一个键已用于其他节点时返回 409。"""
+    row = await db.get(TaskIdempotencyKey, (project_key, key))
+    if row is None:
+        return None
+    if row.node_id != node_id:
+        _err("IDEMPOTENCY_KEY_REUSED", "idempotency_key was already used for another node", status.HTTP_409_CONFLICT)
+    return row.task_id
+
+
+def _add_task_event(db: AsyncSession, task: Task, state: str, message: str | None = None) -> None:
+    now = _now_utc()
+    ev = TaskEvent(task_id=task.id, state=state, message=message, ts=now)
     db.add(ev)
+    task_changed(db, task.id, task.node_id, state, now, task.type)
+
+
+@router.get(
+    "",
+    response_model=TaskListResponse,
+    responses={400: {"description": "Invalid cursor"}, 401: {"description": "Authentication required"}},
+)
+async def list_tasks(
+    _: Annotated[None, Depends(require_admin_basic_auth)],
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    node_id: str | None = None,
+    state: str | None = None,
+    type: str | None = None,
+    cursor: str | None = None,
+    limit: int = 50,
+):
+    """任务列表：按 created_at 倒序，可按 node_id / state / type 过滤；next_cursor 传回 cursor 取下一页。"""
+    limit = min(max(limit, 1), _TASK_LIST_MAX)
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            _err("INVALID_CURSOR", "cursor is malformed", status.HTTP_400_BAD_REQUEST)
+    # 多取一行判断是否还有下一页
+    rows = (
+        await db.execute(task_page(limit + 1, node_id=node_id, state=state, task_type=type, after=after))
+    ).scalars().all()
+    next_cursor = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+    return TaskListResponse(
+        tasks=[
+            TaskListItem(
+                task_id=t.id,
+                node_id=t.node_id,
+                type=t.type,
+                state=t.state,
+                priority=t.priority,
+                not_before=t.not_before.isoformat() if t.not_before else None,
+                attempts=t.attempts,
+                created_at=t.created_at.isoformat(),
+                updated_at=t.updated_at.isoformat(),
+            )
+            for t in rows[:limit]
+        ],
+        next_cursor=next_cursor,
+    )
 
 
 @router.post(
     "/create",
     response_model=TaskCreateResponse,
-    responses={401: {"description": "Invalid token"}, 404: {"description": "Node not found"}},
+    responses={
+        401: {"description": "Invalid token"},
+        404: {"description": "Node not found"},
+        409: {"description": "Idempotency key used for another node"},
+    },
 )
 async def create_task(
+    request: Request,
     body: TaskCreateRequest,
     project_key: Annotated[str, Depends(require_node_token)],
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_async_db)],
 ):
-    """创建任务，状态 CREATED。"""
-    node = db.execute(select(Node).where(Node.id == body.node_id, Node.project_key == project_key)).scalar_one_or_none()
+    """
+    创建任务，状态 CREATED。priority 越大越先被认领；not_before 之前不会被拉取。
+    带 idempotency_key 时先按 (project_key, idempotency_key) 主键查找，命中则直接返回首次创建的 task_id（duplicate=true）；
+    未命中时键与任务在同一事务内写入，并发的同键请求由主键冲突兜底。
+    """
+    check_node_scope(request, body.node_id)
+    priority, not_before = _schedule(body.priority, body.not_before)
+    key = body.idempotency_key or None
+    if key is not None:
+        if len(key) > _IDEMPOTENCY_KEY_MAX:
+            _err("INVALID_IDEMPOTENCY_KEY", f"idempotency_key must be at most {_IDEMPOTENCY_KEY_MAX} characters")
+        existing = await _idempotent_task(db, project_key, key, body.node_id)
+        if existing is not None:
+            return TaskCreateResponse(ok=True, task_id=existing, duplicate=True)
+    node = (
+        await db.execute(select(Node).where(Node.id == body.node_id, Node.project_key == project_key))
+    ).scalar_one_or_none()
     if node is None:
         _err("NODE_NOT_FOUND", "Node not found or access denied", status.HTTP_404_NOT_FOUND)
 
-    task_id = f"task-{uuid.uuid4().hex[:12]}"
+    task_id = _new_task_id()
     now = _now_utc()
 
     task = Task(
         id=task_id,
         node_id=body.node_id,
         type=body.type,
-        payload_json=body.payload,
+        payload_json=encode_document(body.payload),
         result_json=None,
         state="CREATED",
+        priority=priority,
+        not_before=not_before,
         created_at=now,
         updated_at=now,
     )
     db.add(task)
-    _add_task_event(db, task_id, "CREATED", None)
-    db.commit()
+    _add_task_event(db, task, "CREATED", None)
+    if key is not None:
+        db.add(
+            TaskIdempotencyKey(
+                project_key=project_key, idempotency_key=key, node_id=body.node_id, task_id=task_id, created_at=now
+            )
+        )
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 同一个键的并发请求先提交：回滚本次写入，返回对方创建的任务
+        await db.rollback()
+        existing = await _idempotent_task(db, project_key, key, body.node_id) if key is not None else None
+        if existing is None:
+            raise
+        return TaskCreateResponse(ok=True, task_id=existing, duplicate=True)
+    task_waiters.notify(body.node_id)
 
     return TaskCreateResponse(ok=True, task_id=task_id)
 
 
+# IN 列表分块大小，避免超长 SQL
+_IN_CHUNK = 1000
+
+
+@router.post(
+    "/create_batch",
+    response_model=TaskBatchCreateResponse,
+    responses={
+        400: {"description": "No targets or too many targets"},
+        401: {"description": "Invalid token"},
+        404: {"description": "Node not found"},
+    },
+)
+async def create_task_batch(
+    request: Request,
+    body: TaskBatchCreateRequest,
+    project_key: Annotated[str, Depends(require_node_token)],
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+):
+    """
+    批量下发：为 node_ids（或 all_nodes=true 时项目下全部节点）各创建一个任务。
+    所有 Task 与 CREATED 事件用多行 INSERT 在同一事务内写入，返回每个节点对应的 task_id。
+    节点级 Token 只能向自身下发。
+    """
+    scope = node_scope(request)
+    priority, not_before = _schedule(body.priority, body.not_before)
+    if body.all_nodes:
+        stmt = select(Node.id).where(Node.project_key == project_key).order_by(Node.id)
+        if scope is not None:
+            stmt = stmt.where(Node.id == scope)
+        if body.node_status:
+            stmt = stmt.where(Node.status == body.node_status)
+        node_ids = list((await db.execute(stmt)).scalars().all())
+    else:
+        node_ids = list(dict.fromkeys(body.node_ids))
+        for node_id in node_ids:
+            check_node_scope(request, node_id)
+        if len(node_ids) > settings.TASK_BATCH_MAX_NODES:
+            _err("TOO_MANY_TARGETS", f"at most {settings.TASK_BATCH_MAX_NODES} nodes per batch")
+        found: set[str] = set()
+        for i in range(0, len(node_ids), _IN_CHUNK):
+            chunk = node_ids[i:i + _IN_CHUNK]
+            found.update(
+                (await db.execute(select(Node.id).where(Node.id.in_(chunk), Node.project_key == project_key)))
+                .scalars()
+                .all()
+            )
+        missing = [n for n in node_ids if n not in found]
+        if missing:
+            _err(
+                "NODE_NOT_FOUND",
+                f"{len(missing)} node(s) not found or access denied: {', '.join(missing[:20])}",
+                status.HTTP_404_NOT_FOUND,
+            )
+    if not node_ids:
+        _err("NO_TARGETS", "no target nodes")
+    if len(node_ids) > settings.TASK_BATCH_MAX_NODES:
+        _err("TOO_MANY_TARGETS", f"at most {settings.TASK_BATCH_MAX_NODES} nodes per batch")
+
+    now = _now_utc()
+    payload_json = encode_document(body.payload)
+    pairs = [(node_id, _new_task_id()) for node_id in node_ids]
+    # 直接对 Table 做 executemany，跳过 ORM bulk 的逐行属性收集（驱动会合并为多行 INSERT）
+    await db.execute(
+        insert(Task.__table__),
+        [
+            {
+                "id": task_id,
+                "node_id": node_id,
+                "type": body.type,
+                "payload_json": payload_json,
+                "result_json": None,
+                "state": "CREATED",
+                "priority": priority,
+                "not_before": not_before,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for node_id, task_id in pairs
+        ],
+    )
+    await db.execute(
+        insert(TaskEvent.__table__),
+        [{"task_id": task_id, "state": "CREATED", "message": None, "ts": now} for _, task_id in pairs],
+    )
+    for node_id, task_id in pairs:
+        task_changed(db, task_id, node_id, "CREATED", now, body.type)
+    await db.commit()
+    for node_id in node_ids:
+        task_waiters.notify(node_id)
+
+    return TaskBatchCreateResponse(
+        ok=True,
+        tasks=[TaskBatchCreateItem(node_id=node_id, task_id=task_id) for node_id, task_id in pairs],
+    )
+
+
 @router.post(
     "/{task_id}/report",
     response_model=TaskReportResponse,
-    responses={401: {"description": "Invalid token"}, 404: {"description": "Task not found"}},
+    responses={
+        401: {"description": "Invalid token"},
+        404: {"description": "Task not found"},
+        409: {"description": "Task is not running or the claim attempt is stale"},
+    },
 )
 async def report_task(
+    request: Request,
     task_id: str,
     body: TaskReportRequest,
     project_key: Annotated[str, Depends(require_node_token)],
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_async_db)],
 ):
-    """任务回传：更新状态为 SUCCEEDED/FAILED，写入 task_events。"""
+    """
+    任务回传：更新状态为 SUCCEEDED/FAILED 并结束租约，写入 task_events；大结果压缩存入 task_blobs。
+    只接受 RUNNING 状态、且 attempt（若带）与当前认领次数一致的回传：租约过期后已被回收（重新入队 / 置为 FAILED）
+    或已被重新认领的任务，迟到的回传返回 409，不覆盖状态与结果。
+    """
     if body.status not in ("SUCCEEDED", "FAILED"):
         _err("INVALID_STATUS", "status must be SUCCEEDED or FAILED", status.HTTP_400_BAD_REQUEST)
 
-    task = db.execute(
-        select(Task).join(Node, Task.node_id == Node.id).where(Task.id == task_id, Node.project_key == project_key)
+    # 锁定任务行，与租约回收互斥
+    task = (
+        await db.execute(
+            select(Task)
+            .join(Node, Task.node_id == Node.id)
+            .where(Task.id == task_id, Node.project_key == project_key)
+            .with_for_update(of=Task)
+        )
     ).scalar_one_or_none()
-    if task is None:
+    if task is None or node_scope(request) not in (None, task.node_id):
         _err("TASK_NOT_FOUND", "Task not found or access denied", status.HTTP_404_NOT_FOUND)
+    if task.state != "RUNNING":
+        _err("TASK_NOT_RUNNING", "Task is not running", status.HTTP_409_CONFLICT)
+    if body.attempt is not None and body.attempt != task.attempts:
+        _err("STALE_ATTEMPT", f"Task has been claimed again (attempt {task.attempts})", status.HTTP_409_CONFLICT)
 
+    columns, blob = pack_result(encode_document(body.result))
+    if blob is not None:
+        await store_blobs(db, [blob])
     task.state = body.status
-    task.result_json = body.result
+    task.result_json = columns["result_json"]
+    task.result_ref = columns["result_ref"]
+    task.result_size = columns["result_size"]
+    task.lease_expires_at = None
     task.updated_at = _now_utc()
-    _add_task_event(db, task_id, body.status, None)
-    db.commit()
+    _add_task_event(db, task, body.status, None)
+    await db.commit()
+    output_waiters.notify(task_id)
 
     return TaskReportResponse(ok=True)
+
+
+@router.post(
+    "/renew",
+    response_model=TaskLeaseRenewResponse,
+    responses={400: {"description": "Too many items"}, 401: {"description": "Invalid token"}},
+)
+async def renew_task_leases(
+    request: Request,
+    body: TaskLeaseRenewRequest,
+    project_key: Annotated[str, Depends(require_node_token)],
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+):
+    """
+    租约续期：把本项目（节点级 Token 为本节点）RUNNING 状态任务的租约延长到当前时间 + TASK_LEASE_SEC。
+    按主键一条 UPDATE（不支持 RETURNING 的后端先锁定再更新）；不在 RUNNING 的任务放入 lost，
+    Agent 据此得知任务已结束或已被回收重新入队。
+    """
+    task_ids = list(dict.fromkeys(body.task_ids))
+    if len(task_ids) > _RENEW_MAX:
+        _err("TOO_MANY_ITEMS", f"at most {_RENEW_MAX} tasks per renew")
+
+    now = _now_utc()
+    lease_expires_at = now + timedelta(seconds=settings.TASK_LEASE_SEC)
+    renewed: set[str] = set()
+    if task_ids:
+        cond = [
+            Task.id.in_(task_ids),
+            Task.state == "RUNNING",
+            Task.node_id.in_(select(Node.id).where(Node.project_key == project_key)),
+        ]
+        if node_scope(request) is not None:
+            cond.append(Task.node_id == node_scope(request))
+        stmt = (
+            update(Task)
+            .where(*cond)
+            # 保持 updated_at 不变（onupdate 会刷新），它只反映状态变更
+            .values(lease_expires_at=lease_expires_at, updated_at=Task.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        if db.get_bind().dialect.update_returning:
+            renewed = set((await db.execute(stmt.returning(Task.id))).scalars())
+        else:
+            # 锁定后再更新，与租约回收并发时不会续上已被回收的任务
+            renewed = set((await db.execute(select(Task.id).where(*cond).with_for_update())).scalars())
+            if renewed:
+                await db.execute(stmt.where(Task.id.in_(renewed)))
+        await db.commit()
+
+    return TaskLeaseRenewResponse(
+        ok=True,
+        lease_expires_at=lease_expires_at.isoformat(),
+        renewed=[tid for tid in task_ids if tid in renewed],
+        lost=[tid for tid in task_ids if tid not in renewed],
+    )
+
+
+@router.post(
+    "/{task_id}/output",
+    response_model=TaskOutputResponse,
+    responses={
+        401: {"description": "Invalid token"},
+        404: {"description": "Task not found"},
+        409: {"description": "Task is not running"},
+        413: {"description": "Chunk too large"},
+    },
+)
+async def append_task_output(
+    request: Request,
+    task_id: str,
+    body: TaskOutputRequest,
+    project_key: Annotated[str, Depends(require_node_token)],
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+):
+    """
+    追加运行中任务的一段输出（只追加，按 seq 排序）。同一 seq 重传时返回 duplicate 而不重复保存。
+    单任务累计超过 TASK_OUTPUT_MAX_BYTES 的部分被截断丢弃，返回 truncated 提示 Agent 停止上传。
+    """
+    if body.seq < 0:
+        _err("INVALID_SEQ", "seq must be >= 0")
+    raw = body.data.encode("utf-8")
+    if len(raw) > settings.TASK_OUTPUT_CHUNK_MAX_BYTES:
+        _err(
+            "CHUNK_TOO_LARGE",
+            f"chunk exceeds {settings.TASK_OUTPUT_CHUNK_MAX_BYTES} bytes",
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+
+    # 锁定任务行，并发上传的片段依次累加 output_bytes，不会超出上限
+    task = (
+        await db.execute(
+            select(Task.node_id, Task.state, Task.output_bytes)
+            .join(Node, Task.node_id == Node.id)
+            .where(Task.id == task_id, Node.project_key == project_key)
+            .with_for_update(of=Task)
+        )
+    ).one_or_none()
+    if task is None or node_scope(request) not in (None, task.node_id):
+        _err("TASK_NOT_FOUND", "Task not found or access denied", status.HTTP_404_NOT_FOUND)
+    if task.state != "RUNNING":
+        _err("TASK_NOT_RUNNING", "Task is not running", status.HTTP_409_CONFLICT)
+
+    remaining = settings.TASK_OUTPUT_MAX_BYTES - task.output_bytes
+    if remaining <= 0:
+        await db.rollback()
+        return TaskOutputResponse(accepted_bytes=0, truncated=True)
+    truncated = len(raw) > remaining
+    if truncated:
+        # 截断到上限，丢弃被切开的不完整 UTF-8 字符
+        raw = raw[:remaining]
+        data = raw.decode("utf-8", errors="ignore")
+        raw = data.encode("utf-8")
+    else:
+        data = body.data
+
+    try:
+        await db.execute(insert(TaskOutputChunk).values(task_id=task_id, seq=body.seq, data=data, ts=_now_utc()))
+    except IntegrityError:
+        await db.rollback()
+        return TaskOutputResponse(accepted_bytes=0, duplicate=True)
+    await db.execute(
+        update(Task)
+        .where(Task.id == task_id)
+        # 保持 updated_at 不变（onupdate 会刷新），它只反映状态变更
+        .values(output_bytes=Task.output_bytes + len(raw), updated_at=Task.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    output_waiters.notify(task_id)
+    return TaskOutputResponse(accepted_bytes=len(raw), truncated=truncated)
+
+
+@router.post(
+    "/report_batch",
+    response_model=TaskReportBatchResponse,
+    responses={400: {"description": "Too many items"}, 401: {"description": "Invalid token"}},
+)
+async def report_task_batch(
+    request: Request,
+    body: TaskReportBatchRequest,
+    project_key: Annotated[str, Depends(require_node_token)],
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+):
+    """
+    批量回传：一次查询校验归属并锁定任务行，按主键批量 UPDATE tasks，多行 INSERT task_events。
+    不存在、无权限、status 非法、不在 RUNNING（租约过期已被回收）或 attempt 与当前认领次数不一致的条目放入 rejected，
+    不影响其余条目。
+    """
+    if len(body.items) > settings.TASK_REPORT_MAX_BATCH:
+        _err("TOO_MANY_ITEMS", f"at most {settings.TASK_REPORT_MAX_BATCH} items per batch")
+
+    # 同一 task_id 重复出现时以最后一条为准
+    items = {it.task_id: it for it in body.items}
+    rejected = [tid for tid, it in items.items() if it.status not in ("SUCCEEDED", "FAILED")]
+    candidates = [tid for tid, it in items.items() if it.status in ("SUCCEEDED", "FAILED")]
+
+    # task_id -> (node_id, type)，同时用于推送状态变更
+    owned: dict[str, tuple[str, str]] = {}
+    if candidates:
+        stmt = (
+            select(Task.id, Task.node_id, Task.type, Task.attempts)
+            .join(Node, Task.node_id == Node.id)
+            .where(Task.id.in_(candidates), Node.project_key == project_key, Task.state == "RUNNING")
+            # 锁定任务行，与租约回收互斥
+            .with_for_update(of=Task)
+        )
+        if node_scope(request) is not None:
+            stmt = stmt.where(Task.node_id == node_scope(request))
+        for r in await db.execute(stmt):
+            if items[r.id].attempt in (None, r.attempts):
+                owned[r.id] = (r.node_id, r.type)
+    accepted = [tid for tid in candidates if tid in owned]
+    rejected.extend(tid for tid in candidates if tid not in owned)
+
+    if accepted:
+        now = _now_utc()
+        rows, blobs = [], []
+        for tid in accepted:
+            columns, blob = pack_result(encode_document(items[tid].result))
+            rows.append({"id": tid, "state": items[tid].status, "lease_expires_at": None, "updated_at": now, **columns})
+            if blob is not None:
+                blobs.append(blob)
+        await store_blobs(db, blobs)
+        await db.execute(update(Task), rows)
+        await db.execute(
+            insert(TaskEvent.__table__),
+            [{"task_id": tid, "state": items[tid].status, "message": None, "ts": now} for tid in accepted],
+        )
+        for tid in accepted:
+            task_changed(db, tid, owned[tid][0], items[tid].status, now, owned[tid][1])
+        await db.commit()
+        for tid in accepted:
+            output_waiters.notify(tid)
+
+    return TaskReportBatchResponse(ok=True, accepted=accepted, rejected=rejected)
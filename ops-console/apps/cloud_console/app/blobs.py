@@ -0,0 +1,92 @@
+"""
+任务结果的行外存储。
+
+不超过 TASK_RESULT_INLINE_MAX_BYTES（UTF-8 字节）的结果仍写入 tasks.result_json；
+更大的结果 zlib 压缩后写入 task_blobs（主键为原文 sha256，相同内容只存一份），
+tasks 行只保留 result_ref / result_size。列表页不再读取结果，下载时按 _READ_CHUNK 分段读出（SUBSTR）、流式解压，
+不把整个 blob 读进内存。
+"""
+import hashlib
+import zlib
+from collections.abc import Iterator
+
+from sqlalchemy import delete, exists, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .db import SessionLocal
+from .models import Task, TaskBlob
+
+# 流式解压时每次处理的压缩数据字节数
+_STREAM_CHUNK = 64 * 1024
+# 下载时每次从库里读出的存储字节数
+_READ_CHUNK = 1024 * 1024
+
+
+def pack_result(result: str) -> tuple[dict, dict | None]:
+    """
+    返回 (tasks 列取值, task_blobs 行或 None)。
+    小结果内联；大结果计算 sha256 并压缩，压缩无收益时按 raw 保存。
+    """
+    raw = result.encode("utf-8")
+    if len(raw) <= settings.TASK_RESULT_INLINE_MAX_BYTES:
+        return {"result_json": result, "result_ref": None, "result_size": None}, None
+    digest = hashlib.sha256(raw).hexdigest()
+    packed = zlib.compress(raw, 6)
+    codec = "zlib"
+    if len(packed) >= len(raw):
+        packed, codec = raw, "raw"
+    columns = {"result_json": None, "result_ref": digest, "result_size": len(raw)}
+    return columns, {"sha256": digest, "codec": codec, "size": len(raw), "data": packed}
+
+
+async def store_blobs(db: AsyncSession, blobs: list[dict]) -> None:
+    """写入 blob（已存在的 sha256 跳过），在调用方事务内执行。"""
+    if not blobs:
+        return
+    unique = list({b["sha256"]: b for b in blobs}.values())
+    await db.execute(
+        insert(TaskBlob).prefix_with("IGNORE", dialect="mysql").prefix_with("OR IGNORE", dialect="sqlite"),
+        unique,
+    )
+
+
+def _read_blob(sha256: str) -> Iterator[bytes]:
+    """按 _READ_CHUNK 分段读出 blob 的存储内容；每段一个短会话，下载慢时不占用连接池。"""
+    offset = 1
+    while True:
+        with SessionLocal() as db:
+            piece = db.execute(
+                select(func.substr(TaskBlob.data, offset, _READ_CHUNK)).where(TaskBlob.sha256 == sha256)
+            ).scalar()
+        if not piece:
+            return
+        yield bytes(piece)
+        offset += len(piece)
+
+
+def iter_blob(sha256: str, codec: str) -> Iterator[bytes]:
+    """分段读出并按块解压 blob，供 StreamingResponse 使用（在生成器内读库）。"""
+    d = zlib.decompressobj() if codec != "raw" else None
+    for data in _read_blob(sha256):
+        for i in range(0, len(data), _STREAM_CHUNK):
+            piece = data[i:i + _STREAM_CHUNK]
+            out = piece if d is None else d.decompress(piece)
+            if out:
+                yield out
+    if d is not None:
+        tail = d.flush()
+        if tail:
+            yield tail
+
+
+def delete_orphan_blobs(db: Session, refs: set[str]) -> None:
+    """删除任务后回收 refs 中已不被任何任务引用的 blob（同步会话，UI 删除节点时调用）。"""
+    if not refs:
+        return
+    db.execute(
+        delete(TaskBlob)
+        .where(TaskBlob.sha256.in_(refs), ~exists(select(Task.id).where(Task.result_ref == TaskBlob.sha256)))
+        .execution_options(synchronize_session=False)
+    )
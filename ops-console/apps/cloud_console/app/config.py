@@ -6,6 +6,10 @@ from urllib.parse import quote_plus
 
 from pydantic import computed_field
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from sqlalchemy.engine import make_url
+
+# 同步驱动 -> 异步驱动（生产 aiomysql，测试 / 压测 aiosqlite）
+_ASYNC_DRIVERS = {"mysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite"}
 
 
 class Settings(BaseSettings):
@@ -35,10 +39,14 @@ class Settings(BaseSettings):
     DB_NAME: str = "cloud_console"
     DB_USER: str = "root"
     DB_PASSWORD: str = "password"
+    # 可选：完整数据库 URL（测试 / 压测指向 SQLite），设置后忽略上面的 DB_*
+    DB_URL: str = ""
 
     @computed_field
     @property
     def DATABASE_URL(self) -> str:
+        if self.DB_URL:
+            return self.DB_URL
         user = quote_plus(self.DB_USER)
         password = quote_plus(self.DB_PASSWORD)
         return (
@@ -46,12 +54,99 @@ class Settings(BaseSettings):
             f"?charset=utf8mb4"
         )
 
-    # 节点鉴权（MVP 仅 project_a）
+    @computed_field
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        """DATABASE_URL 对应的异步驱动 URL，供 AsyncEngine 使用。"""
+        url = make_url(self.DATABASE_URL)
+        return url.set(drivername=_ASYNC_DRIVERS[url.get_backend_name()]).render_as_string(hide_password=False)
+
+    # 节点鉴权：node_tokens 表中的 Token（/api/node_tokens 签发）；
+    # NODE_TOKEN_PROJECT_A 为旧的共享 Token，映射到 PROJECT_KEY_DEFAULT，置空即停用
     PROJECT_KEY_DEFAULT: str = "project_a"
     NODE_TOKEN_PROJECT_A: str = "changeme_node_token_project_a"
+    # 校验结果缓存：有效 Token 缓存 TTL 秒（慢哈希每个 Token 每个 TTL 最多算一次），无效 Token 缓存较短时间；
+    # 吊销 / 轮换立即清除本进程缓存，其他进程最迟 TTL 后生效
+    NODE_TOKEN_CACHE_TTL_SEC: float = 300.0
+    NODE_TOKEN_NEGATIVE_TTL_SEC: float = 10.0
+    NODE_TOKEN_CACHE_MAX: int = 10000
+    NODE_TOKEN_HASH_ITERATIONS: int = 200000
 
     # Console 公网/内网访问地址，用于展示给 Agent 的 CONSOLE_BASE_URL
     CONSOLE_PUBLIC_URL: str = ""
 
+    # 心跳写入模式：sync（每次心跳直接写库）/ buffered（先写内存 presence 表，定期批量写回）
+    HEARTBEAT_MODE: str = "sync"
+    HEARTBEAT_FLUSH_INTERVAL_SEC: float = 2.0
+    # buffered 模式下单条多行 UPDATE 最多覆盖的节点数
+    HEARTBEAT_FLUSH_CHUNK: int = 500
+
+    # 节点存活：last_seen 超过阈值的节点由后台扫描统一置为 offline；扫描间隔为 0 时关闭扫描
+    NODE_OFFLINE_THRESHOLD_SEC: int = 30
+    LIVENESS_SWEEP_INTERVAL_SEC: float = 10.0
+
+    # task_events 保留：超过保留天数的事件归档（设置了 ARCHIVE_DIR 时导出 gzip JSONL）后删除，0 为永久保留。
+    # MySQL 上按月分区（迁移 005），过期分区整体 DROP；RETENTION_INTERVAL_SEC > 0 时由 lifespan 定期执行，
+    # 否则用 scripts/task_events_retention.py 由 cron 执行
+    TASK_EVENTS_RETENTION_DAYS: int = 90
+    TASK_EVENTS_ARCHIVE_DIR: str = ""
+    TASK_EVENTS_PARTITIONS_AHEAD: int = 3
+    RETENTION_INTERVAL_SEC: float = 0
+
+    # 任务结果超过该字节数时压缩存入 task_blobs，tasks 行只保留引用
+    TASK_RESULT_INLINE_MAX_BYTES: int = 4096
+
+    # 任务流式输出：单任务累计上限与单个片段上限（字节），超出单任务上限的部分丢弃
+    TASK_OUTPUT_MAX_BYTES: int = 1048576
+    TASK_OUTPUT_CHUNK_MAX_BYTES: int = 65536
+
+    # 实时推送（GET /ui/events，SSE）：最大连接数、保活注释间隔、两次推送的最小间隔（合并期间的变化），
+    # 单连接最多积压的待发送对象数（超过则通知页面整页刷新）
+    SSE_MAX_CLIENTS: int = 100
+    SSE_KEEPALIVE_SEC: float = 15.0
+    SSE_MIN_INTERVAL_SEC: float = 0.5
+    SSE_MAX_PENDING: int = 5000
+
+    # /metrics：查库类指标（积压任务数、每节点队列深度、心跳间隔分布）的后台刷新间隔，0 为不刷新；
+    # 每节点队列深度最多导出的节点数；METRICS_TOKEN 非空时抓取需带 Authorization: Bearer <token>
+    METRICS_REFRESH_INTERVAL_SEC: float = 15.0
+    METRICS_NODE_QUEUE_MAX_SERIES: int = 1000
+    METRICS_TOKEN: str = ""
+
+    # 日志：JSON 经有界队列由后台线程写 stdout，队列满时丢弃（/health 的 logging.dropped 计数）；
+    # LOG_SAMPLE_RATES 形如 "cloud_console.request=0.01"，按 logger 名前缀对 WARNING 以下的日志采样
+    LOG_LEVEL: str = "INFO"
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_SAMPLE_RATES: str = ""
+
+    # 请求剖析（JSON 日志，logger cloud_console.request）：超过耗时 / SQL 条数预算的请求记 WARNING 并附语句列表，0 为不检查；
+    # 同一语句在一个请求内执行达到 N 次视为 N+1；语句列表最多记录的条数；是否为每个请求输出摘要
+    PROFILE_SLOW_REQUEST_MS: float = 500.0
+    PROFILE_MAX_QUERIES: int = 20
+    PROFILE_N_PLUS_ONE_THRESHOLD: int = 10
+    PROFILE_STATEMENT_LOG_MAX: int = 50
+    PROFILE_LOG_ALL_REQUESTS: bool = False
+    # 单请求 cProfile：请求头 PROFILE_DEBUG_HEADER 等于 PROFILE_DEBUG_TOKEN（空则关闭）时启用；
+    # PROFILE_DUMP_DIR 非空时写 <request_id>.prof，否则把统计摘要写入日志
+    PROFILE_DEBUG_HEADER: str = "X-Debug-Profile"
+    PROFILE_DEBUG_TOKEN: str = ""
+    PROFILE_DUMP_DIR: str = ""
+
+    # 任务长轮询：GET /api/nodes/{node_id}/tasks?wait=N 最多挂起的秒数
+    TASK_LONG_POLL_MAX_SEC: int = 30
+    # 单次拉取最多认领的任务数（Agent 可用 limit 参数再调小）
+    TASK_PULL_MAX_BATCH: int = 100
+    # 任务租约：认领后 TASK_LEASE_SEC 秒内未续租（POST /api/tasks/renew）或回传即视为丢失，
+    # 由后台回收重新入队，累计认领 TASK_MAX_ATTEMPTS 次仍丢失则置为 FAILED；
+    # 回收间隔为 0 时关闭回收，单轮每批最多处理 TASK_LEASE_REAP_BATCH 个任务
+    TASK_LEASE_SEC: int = 300
+    TASK_MAX_ATTEMPTS: int = 3
+    TASK_LEASE_REAP_INTERVAL_SEC: float = 15.0
+    TASK_LEASE_REAP_BATCH: int = 500
+    # 批量下发单次最多目标节点数
+    TASK_BATCH_MAX_NODES: int = 10000
+    # 批量回传单次最多条目数
+    TASK_REPORT_MAX_BATCH: int = 500
+
 
 settings = Settings()
@@ -1,7 +1,9 @@
 """
 SQLAlchemy 2.0：engine / sessionmaker / DeclarativeBase / get_db / ping_db。
+节点侧 API 使用 async_engine / get_async_db，查询不阻塞事件循环；UI 与迁移仍走同步 engine。
 """
 from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 
 from .config import settings
@@ -14,6 +16,15 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    echo=settings.debug,
+)
+
+# expire_on_commit=False：提交后仍可读取属性，避免在异步会话中触发隐式 IO
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 
 class Base(DeclarativeBase):
     pass
@@ -28,14 +39,20 @@ def get_db():
         db.close()
 
 
-def ping_db() -> tuple[bool, str]:
+async def get_async_db():
+    """依赖注入：获取异步数据库会话（yield AsyncSession）。"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def ping_db() -> tuple[bool, str]:
     """
     执行 SELECT 1 检测数据库连通性。
     返回 (成功与否, 错误信息；成功时错误信息为空字符串)。
     """
     try:
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
         return True, ""
     except Exception as e:
         return False, str(e)
@@ -3,10 +3,11 @@
 """
 from typing import Annotated
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBasic, HTTPBasicCredentials, HTTPBearer
 
 from .config import settings
+from .node_tokens import token_cache
 
 node_security = HTTPBearer(auto_error=False)
 basic_auth = HTTPBasic(auto_error=False)
@@ -30,22 +31,22 @@ async def require_admin_basic_auth(
         )
 
 
-def verify_node_token(token: str) -> str | None:
+async def verify_node_token(token: str) -> tuple[str, str | None] | None:
     """
-    校验节点 Token，返回 project_key；不匹配返回 None。
-    MVP：仅 project_a 可用 NODE_TOKEN_PROJECT_A。
+    校验节点 Token，返回 (project_key, node_id)；node_id 为 None 表示项目级 Token。不匹配返回 None。
+    node_tokens 表中的 Token 经 TokenCache 校验，大部分请求不查库；旧的 NODE_TOKEN_PROJECT_A 仍可用。
     """
-    if token == settings.NODE_TOKEN_PROJECT_A:
-        return settings.PROJECT_KEY_DEFAULT
-    return None
+    return await token_cache.verify(token)
 
 
 async def require_node_token(
+    request: Request,
     credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(node_security)],
 ) -> str:
     """
     FastAPI 依赖：要求有效 Bearer Token，返回 project_key。
-    否则抛出 401，返回统一错误结构。
+    否则抛出 401，返回统一错误结构。节点级 Token 绑定的 node_id 记在 request.state.node_scope，
+    由各接口用 check_node_scope 校验。
     """
     if credentials is None:
         raise HTTPException(
@@ -53,15 +54,31 @@ async def require_node_token(
             detail={"ok": False, "error_code": "MISSING_TOKEN", "message": "Authorization header required"},
         )
     token = credentials.credentials
-    project_key = verify_node_token(token)
-    if project_key is None:
+    identity = await verify_node_token(token)
+    if identity is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail={"ok": False, "error_code": "INVALID_TOKEN", "message": "Invalid or expired token"},
         )
+    project_key, request.state.node_scope = identity
     return project_key
 
 
+def node_scope(request: Request) -> str | None:
+    """当前请求 Token 绑定的 node_id；项目级 Token 返回 None。"""
+    return getattr(request.state, "node_scope", None)
+
+
+def check_node_scope(request: Request, node_id: str) -> None:
+    """节点级 Token 只能以自身 node_id 访问，否则 403。"""
+    scope = node_scope(request)
+    if scope is not None and scope != node_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail={"ok": False, "error_code": "NODE_SCOPE_MISMATCH", "message": "Token is bound to another node"},
+        )
+
+
 # Admin 管理端（MVP 未实现）
 async def get_admin_session():
     return None
@@ -0,0 +1,168 @@
+"""
+控制台实时事件（Server-Sent Events）。
+
+写库路径（心跳 / presence 写回 / 存活扫描 / 写 task_events 的各处）调用 node_changed / task_changed，
+事件先登记在会话上，事务提交后才发布给订阅者，回滚则丢弃，页面不会看到未落库的状态。
+每个订阅者（一个 /ui/events 连接）按 (类型, id) 合并待发送事件，只保留最新值：
+积压量以变化的节点 / 任务数为上限，超过 SSE_MAX_PENDING 时清空并让页面整页刷新。
+仅在本进程内生效；多 worker 部署时各进程只推送自己处理的写入。
+"""
+import asyncio
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterator
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .config import settings
+
+# Session.info 中暂存待发布事件的键
+_INFO_KEY = "ui_events"
+
+
+class Subscriber:
+    """一个 SSE 连接的待发送事件，只在所属事件循环内读写。"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, node_id: str | None) -> None:
+        self.loop = loop
+        self.node_id = node_id
+        self.pending: dict[tuple[str, str], dict] = {}
+        self.overflowed = False
+        self.wakeup = asyncio.Event()
+
+    def _offer(self, items: list[tuple[str, str, dict]]) -> None:
+        for kind, key, data in items:
+            if self.node_id is not None and data.get("node_id") != self.node_id:
+                continue
+            k = (kind, key)
+            merged = self.pending.pop(k, None)
+            self.pending[k] = {**merged, **data} if merged else data
+        if len(self.pending) > settings.SSE_MAX_PENDING:
+            self.pending.clear()
+            self.overflowed = True
+        if self.pending or self.overflowed:
+            self.wakeup.set()
+
+    def offer(self, items: list[tuple[str, str, dict]]) -> None:
+        """可在任意线程调用：不在订阅者的事件循环内时转交该循环执行。"""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self._offer(items)
+        else:
+            try:
+                self.loop.call_soon_threadsafe(self._offer, items)
+            except RuntimeError:
+                # 事件循环已关闭：连接已断开，忽略
+                pass
+
+    async def next(self, timeout: float) -> tuple[list[tuple[str, dict]], bool] | None:
+        """等待并取走待发送事件，返回 (事件列表, 是否溢出)；超时返回 None。"""
+        if not (self.pending or self.overflowed):
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        self.wakeup.clear()
+        items = [(kind, data) for (kind, _), data in self.pending.items()]
+        overflowed = self.overflowed
+        self.pending = {}
+        self.overflowed = False
+        return items, overflowed
+
+
+class EventBus:
+    """进程内发布订阅：发布方不等待订阅者，慢连接只会积压合并后的最新状态。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subscribers: set[Subscriber] = set()
+        # 同步钩子（如 /metrics 计数），在发布线程内调用
+        self._hooks: list[Callable[[list[tuple[str, str, dict]]], None]] = []
+        self.published_total = 0
+        self.overflows_total = 0
+
+    def clients(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    @contextmanager
+    def subscribe(self, node_id: str | None = None) -> Iterator[Subscriber]:
+        """登记一个订阅者（需在事件循环内调用）；node_id 非空时只接收该节点及其任务的事件。"""
+        sub = Subscriber(asyncio.get_running_loop(), node_id)
+        with self._lock:
+            self._subscribers.add(sub)
+        try:
+            yield sub
+        finally:
+            with self._lock:
+                self._subscribers.discard(sub)
+
+    def add_hook(self, hook: Callable[[list[tuple[str, str, dict]]], None]) -> None:
+        self._hooks.append(hook)
+
+    def publish(self, items: list[tuple[str, str, dict]]) -> None:
+        """发布 (类型, id, 数据) 列表，线程安全。"""
+        if not items:
+            return
+        for hook in self._hooks:
+            hook(items)
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self.published_total += len(items)
+        for sub in subscribers:
+            sub.offer(items)
+
+    def stats(self) -> dict:
+        return {
+            "clients": self.clients(),
+            "published_total": self.published_total,
+            "overflows_total": self.overflows_total,
+        }
+
+
+event_bus = EventBus()
+
+
+def _iso(ts: datetime | None) -> str | None:
+    return ts.isoformat() if ts else None
+
+
+def emit(db, kind: str, key: str, data: dict) -> None:
+    """登记一条事件，db（Session 或 AsyncSession）提交后发布。同一事务内同一对象只保留合并后的最新值。"""
+    data = {k: v for k, v in data.items() if v is not None}
+    pending: dict = db.info.setdefault(_INFO_KEY, {})
+    pending[(kind, key)] = {**pending.get((kind, key), {}), **data}
+
+
+def node_changed(db, node_id: str, status: str, last_seen: datetime | None = None) -> None:
+    """节点状态 / last_seen 变化（心跳、注册、存活扫描）。"""
+    emit(db, "node", node_id, {"node_id": node_id, "status": status, "last_seen": _iso(last_seen)})
+
+
+def task_changed(
+    db, task_id: str, node_id: str, state: str, updated_at: datetime, task_type: str | None = None
+) -> None:
+    """任务状态变化，与写入 task_events 的代码路径一同调用。"""
+    emit(
+        db,
+        "task",
+        task_id,
+        {"task_id": task_id, "node_id": node_id, "state": state, "updated_at": _iso(updated_at), "type": task_type},
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_after_commit(session: Session) -> None:
+    pending = session.info.pop(_INFO_KEY, None)
+    if pending:
+        event_bus.publish([(kind, key, data) for (kind, key), data in pending.items()])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_INFO_KEY, None)
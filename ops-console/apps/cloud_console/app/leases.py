@@ -0,0 +1,168 @@
+"""
+任务租约回收。
+
+pull_tasks 认领任务时设置 lease_expires_at（TASK_LEASE_SEC 秒），Agent 执行期间经 POST /api/tasks/renew 续租，
+回传时清除。Agent 崩溃、回传失败或网络中断时租约到期，后台任务每 TASK_LEASE_REAP_INTERVAL_SEC 执行一次：
+- attempts 未达 TASK_MAX_ATTEMPTS 的任务置回 CREATED（保留优先级与创建时间，下次拉取优先被认领），并唤醒长轮询；
+  上一次认领已上传的输出片段删除、output_bytes 清零，重试的输出从 seq 0 重新上传，不会被当作重复片段丢弃；
+- 已达上限的任务置为 FAILED，结果为 {"error": "lease expired"}；
+两种变更都写一条 TaskEvent。候选行用 SELECT ... FOR UPDATE SKIP LOCKED 锁定，多进程部署时互不重复处理。
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from packages.common.rawjson import dumps
+
+from .config import settings
+from .db import AsyncSessionLocal
+from .events import task_changed
+from .models import Task, TaskEvent, TaskOutputChunk
+from .queries import expired_leases
+from .task_notify import output_waiters, task_waiters
+
+logger = logging.getLogger(__name__)
+
+
+def _now_utc() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class TaskLeaseReaper:
+    """把租约过期的 RUNNING 任务重新入队，或在认领次数用尽时置为 FAILED。"""
+
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+        self._stop: asyncio.Event | None = None
+        self.reaps_total = 0
+        self.requeued_total = 0
+        self.failed_total = 0
+        self.reap_errors_total = 0
+        self.last_reaped = 0
+        self.last_reap_duration_sec = 0.0
+
+    async def _reap_batch(self, db: AsyncSession, now: datetime) -> tuple[list, list]:
+        """在调用方事务内处理一批过期租约，返回 (重新入队的行, 置为 FAILED 的行)。"""
+        rows = (await db.execute(expired_leases(now, settings.TASK_LEASE_REAP_BATCH))).all()
+        requeue = [r for r in rows if r.attempts < settings.TASK_MAX_ATTEMPTS]
+        fail = [r for r in rows if r.attempts >= settings.TASK_MAX_ATTEMPTS]
+        if requeue:
+            requeue_ids = [r.id for r in requeue]
+            await db.execute(
+                update(Task)
+                .where(Task.id.in_(requeue_ids))
+                .values(state="CREATED", lease_expires_at=None, output_bytes=0, updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            # uq_task_output_chunks_task_id_seq 前缀，按 task_id 范围删除
+            await db.execute(
+                delete(TaskOutputChunk)
+                .where(TaskOutputChunk.task_id.in_(requeue_ids))
+                .execution_options(synchronize_session=False)
+            )
+        if fail:
+            await db.execute(
+                update(Task)
+                .where(Task.id.in_([r.id for r in fail]))
+                .values(
+                    state="FAILED",
+                    lease_expires_at=None,
+                    result_json=dumps({"error": "lease expired"}).decode("utf-8"),
+                    result_ref=None,
+                    result_size=None,
+                    updated_at=now,
+                )
+                .execution_options(synchronize_session=False)
+            )
+        if rows:
+            events = [
+                {
+                    "task_id": r.id,
+                    "state": "CREATED",
+                    "message": f"lease expired, requeued (attempt {r.attempts}/{settings.TASK_MAX_ATTEMPTS})",
+                    "ts": now,
+                }
+                for r in requeue
+            ] + [
+                {"task_id": r.id, "state": "FAILED", "message": f"lease expired after {r.attempts} attempt(s)", "ts": now}
+                for r in fail
+            ]
+            await db.execute(insert(TaskEvent), events)
+            for r in requeue:
+                task_changed(db, r.id, r.node_id, "CREATED", now, r.type)
+            for r in fail:
+                task_changed(db, r.id, r.node_id, "FAILED", now, r.type)
+        return requeue, fail
+
+    async def reap(self, now: datetime | None = None) -> tuple[list[str], list[str]]:
+        """执行一轮回收（逐批直到没有过期租约），返回 (重新入队的 task_id, 置为 FAILED 的 task_id)。"""
+        now = now or _now_utc()
+        started = time.monotonic()
+        requeued: list[str] = []
+        failed: list[str] = []
+        while True:
+            async with AsyncSessionLocal() as db, db.begin():
+                requeue, fail = await self._reap_batch(db, now)
+            requeued.extend(r.id for r in requeue)
+            failed.extend(r.id for r in fail)
+            # 提交后再唤醒：节点的长轮询立即领回重新入队的任务，输出 tail 得知任务已结束
+            for node_id in {r.node_id for r in requeue}:
+                task_waiters.notify(node_id)
+            for r in fail:
+                output_waiters.notify(r.id)
+            if len(requeue) + len(fail) < settings.TASK_LEASE_REAP_BATCH:
+                break
+
+        self.reaps_total += 1
+        self.requeued_total += len(requeued)
+        self.failed_total += len(failed)
+        self.last_reaped = len(requeued) + len(failed)
+        self.last_reap_duration_sec = time.monotonic() - started
+        if requeued or failed:
+            logger.warning("lease reap: %d task(s) requeued, %d failed", len(requeued), len(failed))
+        return requeued, failed
+
+    def stats(self) -> dict:
+        return {
+            "reaps_total": self.reaps_total,
+            "requeued_total": self.requeued_total,
+            "failed_total": self.failed_total,
+            "reap_errors_total": self.reap_errors_total,
+            "last_reaped": self.last_reaped,
+            "last_reap_duration_sec": round(self.last_reap_duration_sec, 3),
+        }
+
+    # --- 后台任务 ---
+    async def _run(self) -> None:
+        assert self._stop is not None
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=settings.TASK_LEASE_REAP_INTERVAL_SEC)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.reap()
+            except Exception:
+                self.reap_errors_total += 1
+                logger.exception("lease reap failed")
+
+    def start(self) -> None:
+        """启动后台回收（lifespan 启动时调用）；TASK_LEASE_REAP_INTERVAL_SEC <= 0 时不启动。"""
+        if self._task is None and settings.TASK_LEASE_REAP_INTERVAL_SEC > 0:
+            self._stop = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop.set()
+        await self._task
+        self._task = None
+
+
+lease_reaper = TaskLeaseReaper()
@@ -0,0 +1,123 @@
+"""
+节点存活扫描。
+
+后台任务每 LIVENESS_SWEEP_INTERVAL_SEC 执行一次：last_seen 超过 NODE_OFFLINE_THRESHOLD_SEC 的节点
+用一条集合 UPDATE 置为 offline，并为每个被置为 offline 的节点写一条 NodeEvent。
+节点恢复 online 的变更由心跳写入路径（同步心跳 / presence 写回 / 注册）记录。
+列表页与 API 直接按已索引的 nodes.status 过滤，不再逐行计算在线状态。
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .db import AsyncSessionLocal
+from .events import node_changed
+from .models import Node, NodeEvent
+from .queries import stale_nodes
+
+logger = logging.getLogger(__name__)
+
+
+def _now_utc() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def record_transitions(db: AsyncSession, transitions: list[tuple[str, str | None, str]], now: datetime) -> None:
+    """在调用方事务内写入状态变更：transitions 为 (node_id, from_status, to_status)，提交后推送到控制台页面。"""
+    if transitions:
+        await db.execute(
+            insert(NodeEvent),
+            [{"node_id": nid, "from_status": old, "to_status": new, "ts": now} for nid, old, new in transitions],
+        )
+        for nid, _, new in transitions:
+            node_changed(db, nid, new)
+
+
+class LivenessSweeper:
+    """把心跳超时的节点批量置为 offline。"""
+
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+        self._stop: asyncio.Event | None = None
+        self.sweeps_total = 0
+        self.marked_offline_total = 0
+        self.sweep_errors_total = 0
+        self.last_marked = 0
+        self.last_sweep_duration_sec = 0.0
+
+    async def sweep(self, now: datetime | None = None) -> list[str]:
+        """执行一次扫描，返回本次置为 offline 的节点 id。"""
+        now = now or _now_utc()
+        cutoff = now - timedelta(seconds=settings.NODE_OFFLINE_THRESHOLD_SEC)
+        started = time.monotonic()
+        async with AsyncSessionLocal() as db, db.begin():
+            # 先锁定候选行取得变更前状态；UPDATE 再次带上超时条件，期间收到心跳的节点不会被误置
+            rows = (await db.execute(stale_nodes(cutoff))).all()
+            marked: list[str] = []
+            if rows:
+                stmt = (
+                    update(Node)
+                    .where(Node.id.in_([r.id for r in rows]), Node.status != "offline", Node.last_seen < cutoff)
+                    .values(status="offline")
+                    .execution_options(synchronize_session=False)
+                )
+                if db.get_bind().dialect.update_returning:
+                    marked = list((await db.execute(stmt.returning(Node.id))).scalars())
+                else:
+                    await db.execute(stmt)
+                    marked = [r.id for r in rows]
+                previous = {r.id: r.status for r in rows}
+                await record_transitions(db, [(nid, previous[nid], "offline") for nid in marked], now)
+
+        self.sweeps_total += 1
+        self.marked_offline_total += len(marked)
+        self.last_marked = len(marked)
+        self.last_sweep_duration_sec = time.monotonic() - started
+        if marked:
+            logger.info("liveness sweep: %d node(s) marked offline", len(marked))
+        return marked
+
+    def stats(self) -> dict:
+        return {
+            "sweeps_total": self.sweeps_total,
+            "marked_offline_total": self.marked_offline_total,
+            "sweep_errors_total": self.sweep_errors_total,
+            "last_marked": self.last_marked,
+            "last_sweep_duration_sec": round(self.last_sweep_duration_sec, 3),
+        }
+
+    # --- 后台任务 ---
+    async def _run(self) -> None:
+        assert self._stop is not None
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=settings.LIVENESS_SWEEP_INTERVAL_SEC)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.sweep()
+            except Exception:
+                self.sweep_errors_total += 1
+                logger.exception("liveness sweep failed")
+
+    def start(self) -> None:
+        """启动后台扫描（lifespan 启动时调用）；LIVENESS_SWEEP_INTERVAL_SEC <= 0 时不启动。"""
+        if self._task is None and settings.LIVENESS_SWEEP_INTERVAL_SEC > 0:
+            self._stop = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop.set()
+        await self._task
+        self._task = None
+
+
+sweeper = LivenessSweeper()
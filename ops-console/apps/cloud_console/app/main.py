@@ -10,20 +10,51 @@ _ops_root = Path(__file__).resolve().parent.parent.parent.parent
 if str(_ops_root) not in sys.path:
     sys.path.insert(0, str(_ops_root))
 
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 
-from .db import ping_db
-
-from .api import nodes, tasks
+from packages.common.logging import logging_stats, parse_sample_rates, setup_json_logging, stop_json_logging
+
+from .config import settings
+from .db import async_engine, engine, ping_db
+from .events import event_bus
+from .leases import lease_reaper
+from .liveness import sweeper
+from .metrics import MetricsMiddleware, collector, instrument_engine, record_committed_events, render_metrics
+from .node_tokens import token_cache
+from .presence import buffered, presence
+from .profiling import ProfilingMiddleware
+from .profiling import instrument_engine as instrument_engine_sql
+from .retention import retention_job
+
+from .api import node_tokens, nodes, tasks
 from .ui import views as ui_views
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期：启动/关闭。"""
+    setup_json_logging(
+        level=settings.LOG_LEVEL.upper(),
+        queue_size=settings.LOG_QUEUE_SIZE,
+        sample_rates=parse_sample_rates(settings.LOG_SAMPLE_RATES),
+    )
+    if buffered():
+        presence.start()
+    sweeper.start()
+    lease_reaper.start()
+    retention_job.start()
+    collector.start()
     yield
+    await collector.stop()
+    await retention_job.stop()
+    await lease_reaper.stop()
+    await sweeper.stop()
+    # 关闭时把内存中尚未写回的心跳落库
+    await presence.stop()
+    # 最后写完队列中的日志
+    stop_json_logging()
 
 
 app = FastAPI(
@@ -31,6 +62,14 @@ app = FastAPI(
     description="云端 Web Console 控制多节点 Clawdbot - 控制面",
     lifespan=lifespan,
 )
+app.add_middleware(MetricsMiddleware)
+# 后添加的在外层：request_id 与计时覆盖 MetricsMiddleware
+app.add_middleware(ProfilingMiddleware)
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+instrument_engine_sql(engine)
+instrument_engine_sql(async_engine.sync_engine)
+event_bus.add_hook(record_committed_events)
 
 
 @app.exception_handler(Exception)
@@ -50,6 +89,7 @@ async def unhandled_exception_handler(request, exc):
 
 app.include_router(nodes.router, prefix="/api/nodes", tags=["nodes"])
 app.include_router(tasks.router, prefix="/api/tasks", tags=["tasks"])
+app.include_router(node_tokens.router, prefix="/api/node_tokens", tags=["node_tokens"])
 app.include_router(ui_views.router, prefix="/ui", tags=["ui"])
 _static_dir = _ops_root / "apps" / "cloud_console" / "static"
 app.mount("/static", StaticFiles(directory=str(_static_dir)), name="static")
@@ -64,9 +104,20 @@ def index():
 @app.get("/health")
 async def health():
     """健康检查：含 DB 检测。"""
-    ok, err = ping_db()
+    ok, err = await ping_db()
     if ok:
-        return {"ok": True, "db": "ok"}
+        body = {
+            "ok": True,
+            "db": "ok",
+            "liveness": sweeper.stats(),
+            "task_leases": lease_reaper.stats(),
+            "live_events": event_bus.stats(),
+            "token_cache": token_cache.stats(),
+            "logging": logging_stats(),
+        }
+        if buffered():
+            body["heartbeat_buffer"] = presence.stats()
+        return body
     error_msg = err[:200] if len(err) > 200 else err
     return JSONResponse(
         status_code=500,
@@ -74,6 +125,17 @@ async def health():
     )
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Prometheus 抓取：只读内存中的指标与后台刷新的快照，不查库。"""
+    if settings.METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {settings.METRICS_TOKEN}":
+        return JSONResponse(
+            status_code=401,
+            content={"ok": False, "error_code": "INVALID_TOKEN", "message": "metrics token required"},
+        )
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
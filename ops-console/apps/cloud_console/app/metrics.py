@@ -0,0 +1,368 @@
+"""
+/metrics：Prometheus 文本格式指标。
+
+- 请求耗时：纯 ASGI 中间件按 方法 + 路由模板 + 状态码类别 记录直方图（未匹配路由归为 <unmatched>，label 数量有界）；
+- 连接池：取连接耗时（含等待空闲连接与新建连接）与持有时长直方图，抓取时读取当前占用 / 溢出数；
+- 任务状态转换计数：随事务提交发布的任务事件累加（进程内计数器，重启清零，按 rate() 使用）；
+- 积压与心跳：CREATED / RUNNING 任务数、每节点待执行队列深度、节点心跳间隔分布由 MetricsCollector
+  每 METRICS_REFRESH_INTERVAL_SEC 用索引查询刷新一次，抓取只读内存快照，不查库；
+- 心跳写回（HEARTBEAT_MODE=buffered）：待写回数、最近一批大小 / 延迟 / 耗时与写回次数、错误计数，读 presence.stats()。
+"""
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+from .db import AsyncSessionLocal
+from .presence import buffered, presence
+from .queries import heartbeat_age_buckets, pending_by_node, task_state_counts
+
+logger = logging.getLogger(__name__)
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_POOL_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0)
+HEARTBEAT_AGE_BUCKETS = (5.0, 10.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+# 积压类状态：数量有界，可用索引范围计数；终态只提供转换计数器
+ACTIVE_STATES = ("CREATED", "RUNNING")
+
+
+def _now_utc() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name, self.help, self.labelnames = name, help_text, labelnames
+        self._lock = threading.Lock()
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple[float, ...], labelnames: tuple[str, ...] = ()) -> None:
+        self.name, self.help, self.labelnames = name, help_text, labelnames
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # labels -> [各桶计数..., 总数, 总和]
+        self._values: dict[tuple, list[float]] = {}
+
+    def observe(self, labels: tuple, value: float) -> None:
+        with self._lock:
+            v = self._values.get(labels)
+            if v is None:
+                v = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    v[i] += 1
+            v[-2] += 1
+            v[-1] += value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        les = [f'le="{_fmt(b)}"' for b in self.buckets] + ['le="+Inf"']
+        for k, v in items:
+            for le, n in zip(les, v[:-1]):
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, k, le)} {n}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, k)} {v[-2]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, k)} {_fmt(v[-1])}")
+        return lines
+
+
+def _gauge(name: str, help_text: str, samples: list[tuple[str, float]]) -> list[str]:
+    """samples 为 (label 串, 值)。"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    lines += [f"{name}{labels} {_fmt(v)}" for labels, v in samples]
+    return lines
+
+
+def _counter(name: str, help_text: str, value: float) -> list[str]:
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} counter", f"{name} {_fmt(value)}"]
+
+
+REQUEST_LATENCY = Histogram(
+    "console_http_request_duration_seconds",
+    "HTTP request latency by route template (long-poll and SSE routes include wait time)",
+    _LATENCY_BUCKETS,
+    ("method", "route", "status"),
+)
+POOL_CHECKOUT = Histogram(
+    "console_db_pool_checkout_seconds",
+    "Time to obtain a connection from the pool, including waiting for a free slot and opening new connections",
+    _POOL_BUCKETS,
+    ("pool",),
+)
+POOL_HOLD = Histogram(
+    "console_db_pool_hold_seconds",
+    "Time a connection stays checked out of the pool",
+    _LATENCY_BUCKETS,
+    ("pool",),
+)
+TASK_TRANSITIONS = Counter(
+    "console_task_transitions_total",
+    "Committed task state transitions handled by this process",
+    ("state",),
+)
+
+_pools: dict[str, object] = {}
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """为 engine 的连接池挂上取连接耗时与持有时长统计（异步 engine 传 async_engine.sync_engine）。"""
+    pool = engine.pool
+    _pools[name] = pool
+    do_get = pool._do_get
+
+    # Pool 没有"开始取连接"事件，包装 _do_get 计时：覆盖排队等待与新建连接
+    def _timed_do_get():
+        started = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            POOL_CHECKOUT.observe((name,), time.perf_counter() - started)
+
+    pool._do_get = _timed_do_get
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_conn, record, proxy):
+        record.info["metrics_checkout_at"] = time.perf_counter()
+
+    @event.listens_for(pool, "checkin")
+    def _on_checkin(dbapi_conn, record):
+        started = record.info.pop("metrics_checkout_at", None)
+        if started is not None:
+            POOL_HOLD.observe((name,), time.perf_counter() - started)
+
+
+def _pool_gauges() -> list[str]:
+    checked_out, size, overflow = [], [], []
+    for name, pool in sorted(_pools.items()):
+        label = f'{{pool="{name}"}}'
+        if hasattr(pool, "checkedout"):
+            checked_out.append((label, pool.checkedout()))
+        if hasattr(pool, "size"):
+            size.append((label, pool.size()))
+        if hasattr(pool, "overflow"):
+            overflow.append((label, pool.overflow()))
+    return (
+        _gauge("console_db_pool_checked_out", "Connections currently checked out", checked_out)
+        + _gauge("console_db_pool_size", "Configured pool size", size)
+        + _gauge("console_db_pool_overflow", "Current overflow connections (negative while below pool size)", overflow)
+    )
+
+
+def record_committed_events(items: list[tuple[str, str, dict]]) -> None:
+    """事件总线钩子：统计已提交的任务状态转换。"""
+    for kind, _, data in items:
+        if kind == "task" and "state" in data:
+            TASK_TRANSITIONS.inc((data["state"],))
+
+
+class MetricsMiddleware:
+    """纯 ASGI 中间件：不包装响应体，SSE / 流式下载不受影响。"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status_code = 500
+
+        async def _send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            REQUEST_LATENCY.observe(
+                (scope["method"], route_template(scope), f"{status_code // 100}xx"), time.perf_counter() - started
+            )
+
+
+def route_template(scope) -> str:
+    """
+    匹配到的路由模板（如 /api/nodes/{node_id}/heartbeat）。部分 FastAPI 版本中 include_router 的路由只带
+    子路由自身的 path，此时用路由正则匹配实际路径的后缀，补回前面的静态前缀。
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        root = scope.get("root_path") or ""
+        # StaticFiles 等 Mount 子应用
+        return f"{root}/{{path}}" if root and scope["path"].startswith(root) else "<unmatched>"
+    path = scope["path"]
+    regex = getattr(route, "path_regex", None)
+    if regex is None or regex.match(path):
+        return template
+    # i == len(path)：子路由 path 为空（如 prefix 下的 ""）
+    for i in range(1, len(path) + 1):
+        if (i == len(path) or path[i] == "/") and regex.match(path[i:]):
+            return path[:i] + template
+    return template
+
+
+class MetricsCollector:
+    """定期刷新需要查库的指标；抓取 /metrics 只读 snapshot。"""
+
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+        self._stop: asyncio.Event | None = None
+        self.state_counts: dict[str, int] = {}
+        self.pending_by_node: list[tuple[str, int]] = []
+        self.heartbeat_age: tuple[int, list[int]] | None = None
+        self.last_refresh_at = 0.0
+        self.last_refresh_duration_sec = 0.0
+        self.refresh_errors_total = 0
+
+    async def refresh(self) -> None:
+        started = time.monotonic()
+        async with AsyncSessionLocal() as db:
+            states = dict((await db.execute(task_state_counts(ACTIVE_STATES))).all())
+            pending = (await db.execute(pending_by_node())).all()
+            ages = (await db.execute(heartbeat_age_buckets(_now_utc(), HEARTBEAT_AGE_BUCKETS))).one()
+        self.state_counts = {s: int(states.get(s, 0)) for s in ACTIVE_STATES}
+        # 只导出积压最多的 METRICS_NODE_QUEUE_MAX_SERIES 个节点，控制时间序列数量
+        pending = sorted(((r[0], int(r[1])) for r in pending), key=lambda r: -r[1])
+        self.pending_by_node = pending[: settings.METRICS_NODE_QUEUE_MAX_SERIES]
+        self.heartbeat_age = (int(ages[0]), [int(n) for n in ages[1:]])
+        self.last_refresh_at = time.time()
+        self.last_refresh_duration_sec = time.monotonic() - started
+
+    def render(self) -> list[str]:
+        lines = _gauge(
+            "console_tasks",
+            "Tasks currently in a backlog state (CREATED / RUNNING)",
+            [(f'{{state="{s}"}}', n) for s, n in sorted(self.state_counts.items())],
+        )
+        lines += _gauge(
+            "console_node_pending_tasks",
+            "CREATED tasks waiting per node (nodes with an empty queue are omitted)",
+            [(f'{{node_id="{_escape(nid)}"}}', n) for nid, n in self.pending_by_node],
+        )
+        if self.heartbeat_age is not None:
+            total, counts = self.heartbeat_age
+            name = "console_node_heartbeat_age_seconds"
+            lines += [f"# HELP {name} Seconds since each node's last heartbeat", f"# TYPE {name} histogram"]
+            lines += [f'{name}_bucket{{le="{_fmt(b)}"}} {n}' for b, n in zip(HEARTBEAT_AGE_BUCKETS, counts)]
+            lines += [f'{name}_bucket{{le="+Inf"}} {total}', f"{name}_count {total}"]
+        lines += _gauge(
+            "console_metrics_refresh_timestamp_seconds",
+            "Unix time of the last successful database-backed metrics refresh",
+            [("", self.last_refresh_at)],
+        )
+        lines += _gauge(
+            "console_metrics_refresh_duration_seconds",
+            "Duration of the last database-backed metrics refresh",
+            [("", self.last_refresh_duration_sec)],
+        )
+        lines += _counter(
+            "console_metrics_refresh_errors_total",
+            "Failed database-backed metrics refreshes",
+            self.refresh_errors_total,
+        )
+        return lines
+
+    # --- 后台任务 ---
+    async def _run(self) -> None:
+        assert self._stop is not None
+        while not self._stop.is_set():
+            try:
+                await self.refresh()
+            except Exception:
+                self.refresh_errors_total += 1
+                logger.exception("metrics refresh failed")
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=settings.METRICS_REFRESH_INTERVAL_SEC)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """METRICS_REFRESH_INTERVAL_SEC <= 0 时不启动，/metrics 只输出进程内指标。"""
+        if self._task is None and settings.METRICS_REFRESH_INTERVAL_SEC > 0:
+            self._stop = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop.set()
+        await self._task
+        self._task = None
+
+
+collector = MetricsCollector()
+
+
+def _heartbeat_buffer_metrics() -> list[str]:
+    """HEARTBEAT_MODE=buffered 时的心跳写回指标（进程内，重启清零）。"""
+    s = presence.stats()
+    lines = _gauge("console_heartbeat_buffer_pending", "Heartbeats waiting to be flushed to nodes", [("", s["pending"])])
+    lines += _gauge(
+        "console_heartbeat_flush_batch_size", "Nodes written by the last heartbeat flush", [("", s["last_batch_size"])]
+    )
+    lines += _gauge(
+        "console_heartbeat_flush_lag_seconds",
+        "Age of the oldest heartbeat in the last flush when it was committed",
+        [("", s["last_flush_lag_sec"])],
+    )
+    lines += _gauge(
+        "console_heartbeat_flush_duration_seconds",
+        "Duration of the last heartbeat flush",
+        [("", s["last_flush_duration_sec"])],
+    )
+    lines += _counter("console_heartbeat_flushes_total", "Successful heartbeat flushes", s["flushes_total"])
+    lines += _counter(
+        "console_heartbeat_flushed_rows_total", "Node rows written by heartbeat flushes", s["rows_flushed_total"]
+    )
+    lines += _counter("console_heartbeat_flush_errors_total", "Failed heartbeat flushes", s["flush_errors_total"])
+    return lines
+
+
+def render_metrics() -> str:
+    lines: list[str] = []
+    for metric in (REQUEST_LATENCY, POOL_CHECKOUT, POOL_HOLD, TASK_TRANSITIONS):
+        lines += metric.render()
+    lines += _pool_gauges()
+    lines += collector.render()
+    if buffered():
+        lines += _heartbeat_buffer_metrics()
+    return "\n".join(lines) + "\n"
@@ -1,7 +1,20 @@
 """
-SQLAlchemy ORM 模型：Node / Task / TaskEvent。
+SQLAlchemy ORM 模型：Node / NodeEvent / NodeToken / Task / TaskEvent / TaskIdempotencyKey / TaskBlob / TaskOutputChunk。
 """
-from sqlalchemy import BigInteger, Column, DateTime, String, Text, func, text
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    UniqueConstraint,
+    func,
+    text,
+)
+from sqlalchemy.dialects import mysql
 from sqlalchemy.orm import foreign, relationship
 
 from .db import Base
@@ -18,21 +31,100 @@ class Node(Base):
     last_seen = Column(DateTime, nullable=True)
     status = Column(String(32), nullable=False, server_default=text("'offline'"))
 
+    # ix_nodes_status_last_seen：存活扫描（status + last_seen 范围）与按状态过滤的节点列表
+    __table_args__ = (
+        Index("ix_nodes_last_seen", "last_seen"),
+        Index("ix_nodes_status_last_seen", "status", "last_seen"),
+    )
+
     tasks = relationship("Task", back_populates="node", primaryjoin="Node.id == foreign(Task.node_id)")
 
 
+class NodeEvent(Base):
+    """节点状态变更记录（online / offline 等），由心跳写入与存活扫描产生。"""
+
+    __tablename__ = "node_events"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    node_id = Column(String(64), nullable=False)
+    from_status = Column(String(32), nullable=True)
+    to_status = Column(String(32), nullable=False)
+    ts = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (Index("ix_node_events_node_id_ts", "node_id", "ts"),)
+
+
+class NodeToken(Base):
+    """
+    节点 Token：明文为 nt_<id>_<secret>，只保存 secret 的 PBKDF2 哈希。
+    node_id 为空时可用于项目内任意节点，否则只能以该节点身份访问；revoked_at 非空即失效。
+    """
+
+    __tablename__ = "node_tokens"
+
+    id = Column(String(32), primary_key=True)
+    project_key = Column(String(64), nullable=False)
+    node_id = Column(String(64), nullable=True)
+    secret_hash = Column(String(255), nullable=False)
+    description = Column(String(255), nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    rotated_at = Column(DateTime, nullable=True)
+    revoked_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (Index("ix_node_tokens_project_key", "project_key"),)
+
+
+# Task.priority 取值范围（创建接口校验）
+TASK_PRIORITY_MIN = -1000
+TASK_PRIORITY_MAX = 1000
+
+
 class Task(Base):
     __tablename__ = "tasks"
 
     id = Column(String(64), primary_key=True)
-    node_id = Column(String(64), nullable=False, index=True)
+    node_id = Column(String(64), nullable=False)
     type = Column(String(32), nullable=False)
     payload_json = Column(Text, nullable=False, default="{}")
     result_json = Column(Text, nullable=True)
+    # 超过 TASK_RESULT_INLINE_MAX_BYTES 的结果压缩存入 task_blobs，此处只存 sha256 与原始字节数（见 app/blobs.py）
+    result_ref = Column(String(64), nullable=True)
+    result_size = Column(Integer, nullable=True)
+    # 已接收的流式输出字节数，上限 TASK_OUTPUT_MAX_BYTES（见 task_output_chunks）
+    output_bytes = Column(Integer, nullable=False, server_default=text("0"))
     state = Column(String(32), nullable=False, server_default=text("'CREATED'"))
+    # 认领顺序：priority 大的先认领，同优先级按创建顺序；not_before 非空时此前不会被拉取
+    priority = Column(Integer, nullable=False, server_default=text("0"))
+    not_before = Column(DateTime, nullable=True)
+    # 认领租约：RUNNING 期间 Agent 定期续租，过期由 app/leases.py 的后台任务重新入队；attempts 为已认领次数
+    lease_expires_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, server_default=text("0"))
     created_at = Column(DateTime, nullable=False, server_default=func.now())
     updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
 
+    # 与热点查询对应，见 app/queries.py；node_id 单列索引已由复合索引前缀覆盖。
+    # 每个索引都拖慢写入，只保留不能互相替代的（迁移 014 删除了被覆盖的三个）
+    __table_args__ = (
+        # pull_tasks 认领：按 priority DESC, created_at, id 顺序扫描，not_before 在索引内过滤；
+        # (node_id, state) 前缀兼做 /metrics 每节点积压计数
+        Index(
+            "ix_tasks_node_id_state_priority_created_at",
+            "node_id", "state", priority.desc(), "created_at", "id", "not_before",
+        ),
+        # 任务列表（无过滤）的键集分页
+        Index("ix_tasks_created_at", "created_at", "id"),
+        # 按节点的任务列表（含 node_id + state，state 回表过滤）与节点详情页最近任务
+        Index("ix_tasks_node_id_created_at", "node_id", "created_at", "id"),
+        # 按状态的任务列表；state 前缀兼做 /metrics 积压计数
+        Index("ix_tasks_state_created_at", "state", "created_at", "id"),
+        # 租约回收：state = RUNNING 且 lease_expires_at 已过期
+        Index("ix_tasks_state_lease_expires_at", "state", "lease_expires_at"),
+        # 按类型的任务列表
+        Index("ix_tasks_type_created_at", "type", "created_at", "id"),
+        # 结果 blob 的引用计数与清理（app/blobs.py）
+        Index("ix_tasks_result_ref", "result_ref"),
+    )
+
     node = relationship("Node", back_populates="tasks", primaryjoin="foreign(Task.node_id) == Node.id")
     events = relationship("TaskEvent", back_populates="task", primaryjoin="Task.id == foreign(TaskEvent.task_id)")
 
@@ -40,10 +132,51 @@ class Task(Base):
 class TaskEvent(Base):
     __tablename__ = "task_events"
 
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
     task_id = Column(String(64), nullable=False, index=True)
     state = Column(String(32), nullable=False)
     message = Column(Text, nullable=True)
     ts = Column(DateTime, nullable=False, server_default=func.now())
 
     task = relationship("Task", back_populates="events", primaryjoin="foreign(TaskEvent.task_id) == Task.id")
+
+
+class TaskIdempotencyKey(Base):
+    """创建任务的幂等键：(project_key, idempotency_key) 为主键，重试按主键查到首次创建的任务。"""
+
+    __tablename__ = "task_idempotency_keys"
+
+    project_key = Column(String(64), primary_key=True)
+    idempotency_key = Column(String(128), primary_key=True)
+    node_id = Column(String(64), nullable=False)
+    task_id = Column(String(64), nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    # 删除节点时按 task_id 清理其任务的幂等键
+    __table_args__ = (Index("ix_task_idempotency_keys_task_id", "task_id"),)
+
+
+class TaskBlob(Base):
+    """大结果内容，按 sha256 内容寻址去重；codec 为 zlib（压缩无收益时为 raw）。"""
+
+    __tablename__ = "task_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    codec = Column(String(16), nullable=False)
+    size = Column(Integer, nullable=False)
+    data = Column(LargeBinary().with_variant(mysql.LONGBLOB(), "mysql"), nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
+class TaskOutputChunk(Base):
+    """任务运行中流式上传的输出片段，(task_id, seq) 唯一，按 seq 顺序拼接即为完整输出。"""
+
+    __tablename__ = "task_output_chunks"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    task_id = Column(String(64), nullable=False)
+    seq = Column(Integer, nullable=False)
+    data = Column(Text, nullable=False)
+    ts = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (UniqueConstraint("task_id", "seq", name="uq_task_output_chunks_task_id_seq"),)
@@ -0,0 +1,184 @@
+"""
+节点 Token：签发、哈希与带缓存的校验。
+
+Token 明文格式为 nt_<id>_<secret>：id 是 node_tokens 主键，按主键取一行即可定位；
+secret 只以 PBKDF2-SHA256 哈希保存。PBKDF2 有意做慢，因此校验结果按 Token 的 sha256 缓存：
+- 有效 Token 缓存 NODE_TOKEN_CACHE_TTL_SEC，每个 Token 每个 TTL 最多查一次库、算一次哈希；
+- 同一 Token 并发未命中时只有一个请求去校验，其余等待其结果；
+- 无效 Token 缓存 NODE_TOKEN_NEGATIVE_TTL_SEC，错误 Token 的重试不会反复打到库上；
+- 吊销 / 轮换时 invalidate(token_id) 立即清除本进程缓存，其他进程最迟 TTL 后生效。
+旧的共享 Token NODE_TOKEN_PROJECT_A 仍可用（映射到 PROJECT_KEY_DEFAULT），不查库。
+"""
+import asyncio
+import hashlib
+import hmac
+import secrets
+import time
+
+from sqlalchemy import select
+
+from .config import settings
+from .db import AsyncSessionLocal
+from .models import NodeToken
+
+TOKEN_PREFIX = "nt_"
+_HASH_SCHEME = "pbkdf2_sha256"
+
+# 校验结果：(project_key, node_id)，node_id 为 None 表示项目级 Token
+Identity = tuple[str, str | None]
+
+
+def hash_secret(secret: str, iterations: int | None = None) -> str:
+    """返回 pbkdf2_sha256$<iterations>$<salt>$<hash>。"""
+    iterations = iterations or settings.NODE_TOKEN_HASH_ITERATIONS
+    salt = secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac("sha256", secret.encode(), bytes.fromhex(salt), iterations).hex()
+    return f"{_HASH_SCHEME}${iterations}${salt}${digest}"
+
+
+def check_secret(secret: str, encoded: str) -> bool:
+    try:
+        scheme, iterations, salt, digest = encoded.split("$")
+    except ValueError:
+        return False
+    if scheme != _HASH_SCHEME:
+        return False
+    actual = hashlib.pbkdf2_hmac("sha256", secret.encode(), bytes.fromhex(salt), int(iterations)).hex()
+    return hmac.compare_digest(actual, digest)
+
+
+def new_token_id() -> str:
+    return secrets.token_hex(8)
+
+
+def new_secret(token_id: str) -> tuple[str, str]:
+    """生成 secret，返回 (明文 Token, secret 哈希)。"""
+    secret = secrets.token_urlsafe(32)
+    return f"{TOKEN_PREFIX}{token_id}_{secret}", hash_secret(secret)
+
+
+def parse_token(token: str) -> tuple[str, str] | None:
+    """nt_<id>_<secret> -> (id, secret)；格式不符返回 None。"""
+    if not token.startswith(TOKEN_PREFIX):
+        return None
+    token_id, sep, secret = token[len(TOKEN_PREFIX):].partition("_")
+    if not sep or not token_id or not secret or len(token_id) > 32:
+        return None
+    return token_id, secret
+
+
+async def _load(token: str) -> tuple[Identity | None, str | None]:
+    """查库并校验哈希，返回 (身份或 None, token_id)。"""
+    parsed = parse_token(token)
+    if parsed is None:
+        return None, None
+    token_id, secret = parsed
+    async with AsyncSessionLocal() as db:
+        row = (
+            await db.execute(
+                select(NodeToken.project_key, NodeToken.node_id, NodeToken.secret_hash, NodeToken.revoked_at).where(
+                    NodeToken.id == token_id
+                )
+            )
+        ).one_or_none()
+    if row is None or row.revoked_at is not None:
+        return None, token_id
+    # PBKDF2 放到线程里算，不阻塞事件循环
+    if not await asyncio.to_thread(check_secret, secret, row.secret_hash):
+        return None, token_id
+    return (row.project_key, row.node_id), token_id
+
+
+class TokenCache:
+    """Token 校验缓存：sha256(token) -> (过期时间, 身份或 None, token_id)。"""
+
+    def __init__(self) -> None:
+        self._entries: dict[str, tuple[float, Identity | None, str | None]] = {}
+        self._by_token_id: dict[str, set[str]] = {}
+        self._inflight: dict[str, asyncio.Future] = {}
+        # 每次 invalidate 递增；校验期间发生过吊销则不缓存这次结果，避免把吊销前读到的行缓存下来
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.verifications = 0
+
+    async def verify(self, token: str) -> Identity | None:
+        """返回 (project_key, node_id)，无效返回 None。"""
+        legacy = settings.NODE_TOKEN_PROJECT_A
+        if legacy and hmac.compare_digest(token.encode(), legacy.encode()):
+            return settings.PROJECT_KEY_DEFAULT, None
+
+        key = hashlib.sha256(token.encode()).hexdigest()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.hits += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        generation = self._generation
+        try:
+            self.verifications += 1
+            identity, token_id = await _load(token)
+        except BaseException as e:
+            fut.set_exception(e)
+            # 没有并发等待方时避免 "exception was never retrieved" 告警
+            fut.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        if generation == self._generation:
+            ttl = settings.NODE_TOKEN_CACHE_TTL_SEC if identity else settings.NODE_TOKEN_NEGATIVE_TTL_SEC
+            self._store(key, identity, token_id, ttl)
+        fut.set_result(identity)
+        return identity
+
+    def _store(self, key: str, identity: Identity | None, token_id: str | None, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        now = time.monotonic()
+        if len(self._entries) >= settings.NODE_TOKEN_CACHE_MAX:
+            for k in [k for k, e in self._entries.items() if e[0] <= now]:
+                self._drop(k)
+            while len(self._entries) >= settings.NODE_TOKEN_CACHE_MAX:
+                self._drop(next(iter(self._entries)))
+        self._drop(key)
+        self._entries[key] = (now + ttl, identity, token_id)
+        if token_id is not None:
+            self._by_token_id.setdefault(token_id, set()).add(key)
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry[2] is not None:
+            keys = self._by_token_id.get(entry[2])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_token_id[entry[2]]
+
+    def invalidate(self, token_id: str) -> None:
+        """吊销 / 轮换后调用：清除该 Token 的缓存结果。"""
+        self._generation += 1
+        for key in list(self._by_token_id.get(token_id, ())):
+            self._drop(key)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+        self._by_token_id.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "verifications": self.verifications,
+        }
+
+
+token_cache = TokenCache()
@@ -0,0 +1,164 @@
+"""
+心跳写回缓冲（write-behind）。
+
+HEARTBEAT_MODE=buffered 时，心跳只写入进程内 presence 表并立即应答；
+后台任务每 HEARTBEAT_FLUSH_INTERVAL_SEC 把积累的心跳合并成多行 UPDATE 写回 nodes，
+关闭时由 lifespan 做最后一次 flush。
+"""
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import case, select, update
+
+from .config import settings
+from .db import AsyncSessionLocal
+from .events import node_changed
+from .liveness import record_transitions
+from .models import Node
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceTable:
+    """节点在线表：node_id -> 最近一次心跳（last_seen, status）。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # node_id -> (last_seen, status, 记录时的 monotonic 时间)
+        self._pending: dict[str, tuple[datetime, str, float]] = {}
+        # node_id -> project_key，避免每次心跳都查 nodes
+        self._owners: dict[str, str] = {}
+        self._task: asyncio.Task | None = None
+        self._stop: asyncio.Event | None = None
+        self.flushes_total = 0
+        self.rows_flushed_total = 0
+        self.flush_errors_total = 0
+        self.last_batch_size = 0
+        self.last_flush_lag_sec = 0.0
+        self.last_flush_duration_sec = 0.0
+
+    # --- 节点归属缓存 ---
+    def owner_of(self, node_id: str) -> str | None:
+        return self._owners.get(node_id)
+
+    def remember(self, node_id: str, project_key: str) -> None:
+        self._owners[node_id] = project_key
+
+    def forget(self, node_id: str) -> None:
+        """节点被删除或改归属时调用，丢弃缓存与未写回的心跳。"""
+        with self._lock:
+            self._owners.pop(node_id, None)
+            self._pending.pop(node_id, None)
+
+    # --- 心跳写入 / 写回 ---
+    def record(self, node_id: str, status: str, now: datetime) -> None:
+        with self._lock:
+            self._pending[node_id] = (now, status, time.monotonic())
+
+    def _drain(self) -> dict[str, tuple[datetime, str, float]]:
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        return batch
+
+    def _restore(self, batch: dict[str, tuple[datetime, str, float]]) -> None:
+        """写回失败时放回未被新心跳覆盖的条目，下次 flush 重试。"""
+        with self._lock:
+            for node_id, entry in batch.items():
+                self._pending.setdefault(node_id, entry)
+
+    async def flush(self) -> int:
+        """把积累的心跳写回 nodes，返回写回的节点数。"""
+        batch = self._drain()
+        if not batch:
+            self.last_batch_size = 0
+            return 0
+        started = time.monotonic()
+        flushed_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        oldest = min(entry[2] for entry in batch.values())
+        node_ids = list(batch)
+        chunk = max(1, settings.HEARTBEAT_FLUSH_CHUNK)
+        try:
+            async with AsyncSessionLocal() as db, db.begin():
+                for i in range(0, len(node_ids), chunk):
+                    ids = node_ids[i:i + chunk]
+                    new_status = case({nid: batch[nid][1] for nid in ids}, value=Node.id)
+                    # 只取状态将发生变化的行（通常是被存活扫描置为 offline 后恢复的节点），用于记录变更
+                    changed = (
+                        await db.execute(select(Node.id, Node.status).where(Node.id.in_(ids), Node.status != new_status))
+                    ).all()
+                    await db.execute(
+                        update(Node)
+                        .where(Node.id.in_(ids))
+                        .values(
+                            last_seen=case({nid: batch[nid][0] for nid in ids}, value=Node.id),
+                            status=new_status,
+                        )
+                        .execution_options(synchronize_session=False)
+                    )
+                    await record_transitions(db, [(r.id, r.status, batch[r.id][1]) for r in changed], flushed_at)
+                    # 只为状态变化的节点发布实时事件；单纯刷新 last_seen 不推送，避免每次写回都广播整批节点
+                    for r in changed:
+                        node_changed(db, r.id, batch[r.id][1], batch[r.id][0])
+        except Exception:
+            self.flush_errors_total += 1
+            self._restore(batch)
+            raise
+
+        finished = time.monotonic()
+        self.flushes_total += 1
+        self.rows_flushed_total += len(batch)
+        self.last_batch_size = len(batch)
+        self.last_flush_lag_sec = finished - oldest
+        self.last_flush_duration_sec = finished - started
+        return len(batch)
+
+    def stats(self) -> dict:
+        """写回指标：待写回数量、最近一批大小与延迟（最老心跳到写回完成的秒数）。"""
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_lag_sec": round(self.last_flush_lag_sec, 3),
+            "last_flush_duration_sec": round(self.last_flush_duration_sec, 3),
+            "flushes_total": self.flushes_total,
+            "rows_flushed_total": self.rows_flushed_total,
+            "flush_errors_total": self.flush_errors_total,
+        }
+
+    # --- 后台任务 ---
+    async def _run(self) -> None:
+        assert self._stop is not None
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=settings.HEARTBEAT_FLUSH_INTERVAL_SEC)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("heartbeat flush failed")
+
+    def start(self) -> None:
+        """启动后台写回任务（lifespan 启动时调用）。"""
+        if self._task is None:
+            self._stop = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台任务并做最后一次 flush（lifespan 关闭时调用）。"""
+        if self._task is None:
+            return
+        self._stop.set()
+        await self._task
+        self._task = None
+
+
+presence = PresenceTable()
+
+
+def buffered() -> bool:
+    return settings.HEARTBEAT_MODE == "buffered"
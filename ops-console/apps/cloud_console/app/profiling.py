@@ -0,0 +1,195 @@
+"""
+请求级性能剖析。
+
+ProfilingMiddleware 为每个请求分配 request_id（沿用请求头 X-Request-ID，并写回响应头），计时，
+并通过 engine 的 before/after_cursor_execute 事件统计本请求执行的 SQL 条数与耗时（按 contextvar 归属到请求）。
+结果经 packages.common.logging.JSONFormatter 输出（logger: cloud_console.request）：
+- 超出 PROFILE_MAX_QUERIES 条 SQL 或 PROFILE_SLOW_REQUEST_MS 的请求以 WARNING 记录，附带语句列表；
+- 同一语句（按占位符归一化）执行次数达到 PROFILE_N_PLUS_ONE_THRESHOLD 时标记 n_plus_one，
+  典型如逐行触发 Node.tasks / Task.events 的懒加载；
+- PROFILE_LOG_ALL_REQUESTS=true 时其余请求以 INFO 输出摘要。
+请求头 PROFILE_DEBUG_HEADER 的值等于 PROFILE_DEBUG_TOKEN 时，对该请求启用 cProfile：写入 PROFILE_DUMP_DIR/<request_id>.prof，
+未设置目录则把按累计耗时排序的前 30 行附在日志中。cProfile 作用于整个线程，同一事件循环上并发的其他请求也会计入，
+仅用于排查。
+"""
+import cProfile
+import io
+import logging
+import pstats
+import re
+import time
+import uuid
+from contextvars import ContextVar
+from pathlib import Path
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+from .metrics import route_template
+
+logger = logging.getLogger("cloud_console.request")
+
+# 长轮询 / SSE 的耗时主要是等待，只检查 SQL 条数，不检查耗时
+SLOW_EXEMPT_ROUTES = frozenset({"/api/nodes/{node_id}/tasks", "/ui/tasks/{task_id}/output", "/ui/events"})
+
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+# 展开的 IN 列表 / 多行 VALUES 归一为一个占位符，便于按语句形状计数
+_PLACEHOLDER_LIST_RE = re.compile(r"\((?:\s*(?:\?|%s|:\w+)\s*,)+\s*(?:\?|%s|:\w+)\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class RequestProfile:
+    """单个请求的剖析数据。"""
+
+    def __init__(self, request_id: str) -> None:
+        self.request_id = request_id
+        self.sql_count = 0
+        self.sql_time = 0.0
+        # (语句, 耗时秒)，最多保留 PROFILE_STATEMENT_LOG_MAX 条
+        self.statements: list[tuple[str, float]] = []
+        self.shapes: dict[str, int] = {}
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.sql_count += 1
+        self.sql_time += elapsed
+        shape = _PLACEHOLDER_LIST_RE.sub("(?)", _WHITESPACE_RE.sub(" ", statement).strip())
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+        if len(self.statements) < settings.PROFILE_STATEMENT_LOG_MAX:
+            self.statements.append((shape, elapsed))
+
+    def repeated(self) -> list[dict]:
+        """执行次数达到 N+1 阈值的语句形状。"""
+        threshold = settings.PROFILE_N_PLUS_ONE_THRESHOLD
+        return [
+            {"statement": shape, "count": n}
+            for shape, n in sorted(self.shapes.items(), key=lambda kv: -kv[1])
+            if threshold > 0 and n >= threshold
+        ]
+
+
+_current: ContextVar[RequestProfile | None] = ContextVar("request_profile", default=None)
+
+
+def current_request_id() -> str | None:
+    profile = _current.get()
+    return profile.request_id if profile else None
+
+
+def instrument_engine(engine: Engine) -> None:
+    """为 engine 挂上 SQL 计数（异步 engine 传 async_engine.sync_engine）；请求之外的语句（后台任务）不计。"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        profile = _current.get()
+        started = conn.info.get("profile_started")
+        if profile is not None and started:
+            profile.record(statement, time.perf_counter() - started.pop())
+
+
+class ProfilingMiddleware:
+    """纯 ASGI 中间件，放在最外层，使 request_id 覆盖整个请求（包括其他中间件）。"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or ())
+        incoming = headers.get(b"x-request-id", b"").decode("latin-1")
+        request_id = incoming if _REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex[:16]
+        profile = RequestProfile(request_id)
+        token = _current.set(profile)
+
+        profiler = None
+        debug_token = settings.PROFILE_DEBUG_TOKEN
+        if debug_token:
+            value = headers.get(settings.PROFILE_DEBUG_HEADER.lower().encode("latin-1"), b"").decode("latin-1")
+            if value == debug_token:
+                profiler = cProfile.Profile()
+
+        status_code = 500
+
+        async def _send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+
+        started = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            try:
+                _report(scope, profile, status_code, elapsed, profiler)
+            except Exception:
+                logger.exception("request profile report failed")
+
+
+def _report(scope, profile: RequestProfile, status_code: int, elapsed: float, profiler) -> None:
+    route = route_template(scope)
+    path_params = scope.get("path_params") or {}
+    elapsed_ms = elapsed * 1000
+    repeated = profile.repeated()
+    problems = []
+    if settings.PROFILE_MAX_QUERIES > 0 and profile.sql_count > settings.PROFILE_MAX_QUERIES:
+        problems.append("query_budget")
+    if (
+        settings.PROFILE_SLOW_REQUEST_MS > 0
+        and elapsed_ms > settings.PROFILE_SLOW_REQUEST_MS
+        and route not in SLOW_EXEMPT_ROUTES
+    ):
+        problems.append("latency_budget")
+    if repeated:
+        problems.append("n_plus_one")
+    if not problems and profiler is None and not settings.PROFILE_LOG_ALL_REQUESTS:
+        return
+
+    fields = {
+        "method": scope["method"],
+        "route": route,
+        "status": status_code,
+        "duration_ms": round(elapsed_ms, 2),
+        "sql_count": profile.sql_count,
+        "sql_ms": round(profile.sql_time * 1000, 2),
+    }
+    if problems:
+        fields["problems"] = problems
+        fields["statements"] = [{"sql": s, "ms": round(t * 1000, 3)} for s, t in profile.statements]
+        if profile.sql_count > len(profile.statements):
+            fields["statements_omitted"] = profile.sql_count - len(profile.statements)
+    if repeated:
+        fields["repeated_statements"] = repeated
+    if profiler is not None:
+        if settings.PROFILE_DUMP_DIR:
+            path = Path(settings.PROFILE_DUMP_DIR) / f"{profile.request_id}.prof"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(str(path))
+            fields["profile_file"] = str(path)
+        else:
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(30)
+            fields["profile"] = out.getvalue()
+
+    extra = {"request_id": profile.request_id, "fields": fields}
+    if "node_id" in path_params:
+        extra["node_id"] = path_params["node_id"]
+    if "task_id" in path_params:
+        extra["task_id"] = path_params["task_id"]
+    level = logging.WARNING if problems else logging.INFO
+    logger.log(level, "%s %s %d %.1fms sql=%d", scope["method"], route, status_code, elapsed_ms, profile.sql_count,
+               extra=extra)
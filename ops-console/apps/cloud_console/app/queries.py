@@ -0,0 +1,160 @@
+"""
+热点查询：由 API / UI 与 scripts/check_query_plans.py 共用，保证被 EXPLAIN 检查的就是线上执行的语句。
+每条查询都应命中 models 中声明的复合索引。
+"""
+import base64
+from datetime import datetime, timedelta
+
+from sqlalchemy import Select, and_, case, func, or_, select
+from sqlalchemy.orm import defer
+
+from .models import Node, NodeEvent, Task
+
+# 列表查询不读取 payload / 结果正文，避免大字段随每一行传输；结果按需经下载接口读取
+_TASK_LIST_DEFERRED = (defer(Task.payload_json), defer(Task.result_json))
+
+
+def claim_candidates(node_id: str, state: str, limit: int, now: datetime) -> Select:
+    """
+    pull_tasks 认领候选：priority 高的先出，同优先级按 (created_at, id) 先进先出，跳过 not_before 未到的任务。
+    ix_tasks_node_id_state_priority_created_at 按索引顺序扫描，无额外排序；not_before 在索引内过滤。
+    """
+    return (
+        select(Task.id)
+        .where(
+            Task.node_id == node_id,
+            Task.state == state,
+            or_(Task.not_before.is_(None), Task.not_before <= now),
+        )
+        .order_by(Task.priority.desc(), Task.created_at, Task.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def encode_cursor(created_at: datetime, task_id: str) -> str:
+    """任务列表游标：上一页最后一行的 (created_at, id)，URL 安全 base64。"""
+    raw = f"{created_at.isoformat()}|{task_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """解析 encode_cursor 生成的游标；格式错误抛 ValueError。"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except Exception as e:
+        raise ValueError("malformed cursor") from e
+    created_at, sep, task_id = raw.partition("|")
+    if not sep or not task_id:
+        raise ValueError("malformed cursor")
+    return datetime.fromisoformat(created_at), task_id
+
+
+def task_page(
+    limit: int,
+    node_id: str | None = None,
+    state: str | None = None,
+    task_type: str | None = None,
+    after: tuple[datetime, str] | None = None,
+) -> Select:
+    """
+    ui_tasks / GET /api/tasks 任务列表：按 (created_at, id) 倒序的键集分页，after 为上一页最后一行。
+    游标条件写成 created_at <= c AND (created_at < c OR id < i)，MySQL 可据此在索引上做范围扫描，
+    任意深度的翻页都只读 limit 行。各过滤组合对应的索引：
+    - 无过滤：ix_tasks_created_at
+    - node_id（+ state）：ix_tasks_node_id_created_at，state 在索引顺序扫描中回表过滤（不额外排序，
+      认领索引 ix_tasks_node_id_state_priority_created_at 的 priority 列夹在中间，不能提供 created_at 顺序）
+    - state / type：ix_tasks_state_created_at / ix_tasks_type_created_at（同时给出时按 state 索引扫描、type 回表过滤）
+    """
+    stmt = select(Task).options(*_TASK_LIST_DEFERRED)
+    if node_id:
+        stmt = stmt.where(Task.node_id == node_id)
+    if state:
+        stmt = stmt.where(Task.state == state)
+    if task_type:
+        stmt = stmt.where(Task.type == task_type)
+    if after is not None:
+        created_at, task_id = after
+        stmt = stmt.where(
+            and_(Task.created_at <= created_at, or_(Task.created_at < created_at, Task.id < task_id))
+        )
+    return stmt.order_by(Task.created_at.desc(), Task.id.desc()).limit(limit)
+
+
+def node_recent_tasks(node_id: str, limit: int) -> Select:
+    """ui_node_detail 节点最近创建的任务：与 task_page 共用 ix_tasks_node_id_created_at。"""
+    return (
+        select(Task)
+        .options(*_TASK_LIST_DEFERRED)
+        .where(Task.node_id == node_id)
+        .order_by(Task.created_at.desc(), Task.id.desc())
+        .limit(limit)
+    )
+
+
+def nodes_by_last_seen(status: str | None = None) -> Select:
+    """
+    ui_nodes / GET /api/nodes 节点列表：ix_nodes_last_seen（DESC 时 NULL 排在最后，MySQL / SQLite 一致）；
+    按 status 过滤时走 ix_nodes_status_last_seen。
+    """
+    stmt = select(Node)
+    if status:
+        stmt = stmt.where(Node.status == status)
+    return stmt.order_by(Node.last_seen.desc())
+
+
+def node_page(limit: int, status: str | None = None, offset: int = 0) -> Select:
+    """ui_nodes 节点列表分页：nodes_by_last_seen 加 LIMIT / OFFSET（节点数有限，按页码翻页）。"""
+    return nodes_by_last_seen(status).limit(limit).offset(offset)
+
+
+def node_recent_events(node_id: str, limit: int) -> Select:
+    """ui_node_detail 最近状态变更：ix_node_events_node_id_ts。"""
+    return select(NodeEvent).where(NodeEvent.node_id == node_id).order_by(NodeEvent.ts.desc()).limit(limit)
+
+
+def stale_nodes(cutoff: datetime) -> Select:
+    """存活扫描：last_seen 早于 cutoff 且尚未 offline 的节点，ix_nodes_status_last_seen 范围扫描。"""
+    return (
+        select(Node.id, Node.status)
+        .where(Node.status != "offline", Node.last_seen < cutoff)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def expired_leases(now: datetime, limit: int) -> Select:
+    """租约回收：RUNNING 且租约已过期的任务，ix_tasks_state_lease_expires_at 范围扫描；跳过其他进程已锁定的行。"""
+    return (
+        select(Task.id, Task.node_id, Task.type, Task.attempts)
+        .where(Task.state == "RUNNING", Task.lease_expires_at < now)
+        .order_by(Task.lease_expires_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def task_state_counts(states: tuple[str, ...]) -> Select:
+    """/metrics：指定状态的任务数，state 前缀的覆盖索引范围计数（只用于 CREATED / RUNNING 等积压状态）。"""
+    return select(Task.state, func.count()).where(Task.state.in_(states)).group_by(Task.state)
+
+
+def pending_by_node(state: str = "CREATED") -> Select:
+    """
+    /metrics：每节点待执行任务数。按 nodes 主键顺序分组（无额外排序），每个节点在认领索引
+    ix_tasks_node_id_state_priority_created_at 的 (node_id, state) 前缀上做覆盖范围计数；没有积压的节点不返回。
+    """
+    return (
+        select(Node.id, func.count())
+        .join(Task, and_(Task.node_id == Node.id, Task.state == state))
+        .group_by(Node.id)
+    )
+
+
+def heartbeat_age_buckets(now: datetime, bounds: tuple[float, ...]) -> Select:
+    """
+    /metrics：心跳间隔累计分布，一条语句返回 (有心跳的节点数, age <= b 的节点数...)，
+    ix_nodes_last_seen 覆盖索引范围扫描。
+    """
+    counts = [func.count(case((Node.last_seen >= now - timedelta(seconds=b), 1))) for b in bounds]
+    return select(func.count(), *counts).select_from(Node).where(Node.last_seen.is_not(None))
+
@@ -0,0 +1,13 @@
+"""
+节点接口的响应类。
+"""
+from fastapi.responses import JSONResponse
+
+from packages.common.rawjson import dumps
+
+
+class FastJSONResponse(JSONResponse):
+    """orjson 序列化（未安装时退回标准库 json）的 JSONResponse，节点接口调用量大，序列化放在热路径上。"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
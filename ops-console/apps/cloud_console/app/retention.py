@@ -0,0 +1,201 @@
+"""
+task_events 保留与归档。
+
+MySQL（已执行 005 迁移，task_events 按 TO_DAYS(ts) 月度 RANGE 分区，分区名 pYYYYMM + pmax）：
+- 从 pmax 拆出未来 TASK_EVENTS_PARTITIONS_AHEAD 个月的分区（pmax 为空，REORGANIZE 只改元数据）；
+- 上界不晚于 now - TASK_EVENTS_RETENTION_DAYS 的分区整体过期：先流式导出为 gzip JSONL
+  （设置了 TASK_EVENTS_ARCHIVE_DIR 时），再 DROP PARTITION。
+其他方言（SQLite 开发库）：按 ts 分批导出并 DELETE。
+
+运行方式：scripts/task_events_retention.py（cron），或设置 RETENTION_INTERVAL_SEC 由 lifespan 定期执行。
+多实例部署时只应在一个实例上开启 lifespan 执行。
+"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.engine import Connection
+
+from .config import settings
+from .db import engine
+from .models import TaskEvent
+
+logger = logging.getLogger(__name__)
+
+TABLE = "task_events"
+# 非分区库每批删除的行数
+_DELETE_CHUNK = 5000
+
+
+def _now_utc() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _next_month(d: date) -> date:
+    return date(d.year + (d.month == 12), d.month % 12 + 1, 1)
+
+
+def _to_days(d: date) -> int:
+    """与 MySQL TO_DAYS() 一致的天数。"""
+    return d.toordinal() + 365
+
+
+def list_partitions(conn: Connection) -> list[tuple[str, int | None]]:
+    """task_events 的分区 (名称, TO_DAYS 上界)，按顺序；MAXVALUE 分区上界为 None，未分区返回空列表。"""
+    rows = conn.execute(
+        text(
+            "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION"
+        ),
+        {"t": TABLE},
+    ).all()
+    return [(name, None if desc == "MAXVALUE" else int(desc)) for name, desc in rows]
+
+
+def ensure_future_partitions(conn: Connection, partitions: list[tuple[str, int | None]], months_ahead: int) -> list[str]:
+    """把 pmax 拆分出直到 当前月 + months_ahead 的月度分区，返回新建的分区名。"""
+    bounded = [upper for _, upper in partitions if upper is not None]
+    if not bounded or partitions[-1][1] is not None:
+        return []
+    target = _now_utc().date().replace(day=1)
+    for _ in range(months_ahead):
+        target = _next_month(target)
+    month = date.fromordinal(max(bounded) - 365)
+    created, parts = [], []
+    while month <= target:
+        upper = _next_month(month)
+        name = f"p{month:%Y%m}"
+        parts.append(f"PARTITION {name} VALUES LESS THAN (TO_DAYS('{upper:%Y-%m-%d}'))")
+        created.append(name)
+        month = upper
+    if parts:
+        parts.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+        conn.exec_driver_sql(f"ALTER TABLE {TABLE} REORGANIZE PARTITION pmax INTO ({', '.join(parts)})")
+    return created
+
+
+def _write_archive(path: Path, rows) -> int:
+    """把事件行写成 gzip JSONL：先写临时文件，完成后改名，中途失败不会留下半个归档。"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    n = 0
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        for r in rows:
+            f.write(json.dumps(
+                {"id": r.id, "task_id": r.task_id, "state": r.state, "message": r.message, "ts": r.ts.isoformat()},
+                ensure_ascii=False,
+            ))
+            f.write("\n")
+            n += 1
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return n
+
+
+def _drop_expired_partitions(conn: Connection, partitions, cutoff: datetime, archive_dir: Path | None) -> dict:
+    limit = _to_days(cutoff.date())
+    expired = [name for name, upper in partitions if upper is not None and upper <= limit]
+    # 至少保留一个有上界的分区，REORGANIZE pmax 需要它来推算下一个月
+    if len(expired) == len([1 for _, upper in partitions if upper is not None]):
+        expired = expired[:-1]
+    archived_rows = 0
+    for name in expired:
+        if archive_dir is not None:
+            rows = conn.exec_driver_sql(
+                f"SELECT id, task_id, state, message, ts FROM {TABLE} PARTITION ({name}) ORDER BY id",
+                execution_options={"stream_results": True},
+            )
+            archived_rows += _write_archive(archive_dir / f"{TABLE}_{name}.jsonl.gz", rows)
+        conn.exec_driver_sql(f"ALTER TABLE {TABLE} DROP PARTITION {name}")
+        logger.info("task_events partition %s dropped", name)
+    return {"dropped_partitions": expired, "archived_rows": archived_rows}
+
+
+def _delete_expired_rows(conn: Connection, cutoff: datetime, archive_dir: Path | None) -> dict:
+    """未分区的库：按 id 分批导出并删除 ts < cutoff 的事件，每批单独提交。"""
+    deleted = archived = 0
+    batch_no = 0
+    while True:
+        rows = conn.execute(
+            select(TaskEvent.id, TaskEvent.task_id, TaskEvent.state, TaskEvent.message, TaskEvent.ts)
+            .where(TaskEvent.ts < cutoff)
+            .order_by(TaskEvent.id)
+            .limit(_DELETE_CHUNK)
+        ).all()
+        if not rows:
+            break
+        if archive_dir is not None:
+            name = f"{TABLE}_before_{cutoff:%Y%m%d}_{_now_utc():%Y%m%d%H%M%S}_{batch_no:04d}.jsonl.gz"
+            archived += _write_archive(archive_dir / name, rows)
+        conn.execute(delete(TaskEvent).where(TaskEvent.id.in_([r.id for r in rows])))
+        conn.commit()
+        deleted += len(rows)
+        batch_no += 1
+    return {"dropped_partitions": [], "archived_rows": archived, "deleted_rows": deleted}
+
+
+def run_retention(now: datetime | None = None) -> dict:
+    """执行一次维护：补建未来分区，按保留期归档并清理过期事件。返回本次操作摘要。"""
+    now = now or _now_utc()
+    archive_dir = Path(settings.TASK_EVENTS_ARCHIVE_DIR) if settings.TASK_EVENTS_ARCHIVE_DIR else None
+    summary: dict = {"created_partitions": [], "dropped_partitions": [], "archived_rows": 0}
+    with engine.connect() as conn:
+        partitions = list_partitions(conn) if conn.dialect.name == "mysql" else []
+        if partitions:
+            summary["created_partitions"] = ensure_future_partitions(
+                conn, partitions, settings.TASK_EVENTS_PARTITIONS_AHEAD
+            )
+            if summary["created_partitions"]:
+                partitions = list_partitions(conn)
+        if settings.TASK_EVENTS_RETENTION_DAYS > 0:
+            cutoff = now - timedelta(days=settings.TASK_EVENTS_RETENTION_DAYS)
+            if partitions:
+                summary.update(_drop_expired_partitions(conn, partitions, cutoff, archive_dir))
+            else:
+                summary.update(_delete_expired_rows(conn, cutoff, archive_dir))
+        conn.commit()
+    return summary
+
+
+class RetentionJob:
+    """lifespan 中定期执行 run_retention（在线程中运行，不阻塞事件循环）。"""
+
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+        self._stop: asyncio.Event | None = None
+
+    async def _run(self) -> None:
+        assert self._stop is not None
+        while not self._stop.is_set():
+            try:
+                summary = await asyncio.to_thread(run_retention)
+                logger.info("task_events retention: %s", summary)
+            except Exception:
+                logger.exception("task_events retention failed")
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=settings.RETENTION_INTERVAL_SEC)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """RETENTION_INTERVAL_SEC <= 0 时不启动（由 cron 执行脚本）。"""
+        if self._task is None and settings.RETENTION_INTERVAL_SEC > 0:
+            self._stop = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop.set()
+        await self._task
+        self._task = None
+
+
+retention_job = RetentionJob()
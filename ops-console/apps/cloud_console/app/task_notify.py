@@ -0,0 +1,49 @@
+"""
+任务到达通知：长轮询中的 pull_tasks 在此等待，创建任务的代码路径写库后唤醒对应节点。
+output_waiters 以 task_id 为键，供任务输出 tail 长轮询等待新片段。
+仅在本进程内生效；多 worker 部署时其他进程的等待方靠超时兜底。
+"""
+import asyncio
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class TaskWaiters:
+    """key（node_id / task_id）-> 正在等待的 asyncio.Event 集合。"""
+
+    def __init__(self) -> None:
+        self._events: dict[str, set[asyncio.Event]] = {}
+
+    @contextmanager
+    def listen(self, node_id: str) -> Iterator[asyncio.Event]:
+        """
+        先登记再查询：在查库之前进入，避免「查询为空」与「开始等待」之间创建的任务被漏掉。
+        """
+        ev = asyncio.Event()
+        self._events.setdefault(node_id, set()).add(ev)
+        try:
+            yield ev
+        finally:
+            waiters = self._events.get(node_id)
+            if waiters is not None:
+                waiters.discard(ev)
+                if not waiters:
+                    del self._events[node_id]
+
+    @staticmethod
+    async def wait(ev: asyncio.Event, timeout: float) -> bool:
+        """等待唤醒；超时返回 False。"""
+        try:
+            await asyncio.wait_for(ev.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def notify(self, node_id: str) -> None:
+        """节点有新任务：唤醒该节点所有等待中的拉取请求。"""
+        for ev in self._events.get(node_id, ()):
+            ev.set()
+
+
+task_waiters = TaskWaiters()
+output_waiters = TaskWaiters()
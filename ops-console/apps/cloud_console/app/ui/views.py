@@ -1,37 +1,72 @@
 """
 Web Operator Console：节点与任务管理页面。
 """
+import asyncio
+import json
+import time
 import uuid
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Annotated
+from urllib.parse import urlencode
 
 from fastapi import APIRouter, Depends, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from packages.common.schemas import TaskOutputChunkItem, TaskOutputTailResponse
+
+from ..blobs import delete_orphan_blobs, iter_blob
 from ..config import settings
-from ..db import get_db
+from ..db import get_async_db, get_db
 from ..deps import require_admin_basic_auth
-from ..models import Node, Task, TaskEvent
+from ..events import event_bus, task_changed
+from ..models import (
+    TASK_PRIORITY_MAX,
+    TASK_PRIORITY_MIN,
+    Node,
+    NodeEvent,
+    Task,
+    TaskBlob,
+    TaskEvent,
+    TaskIdempotencyKey,
+    TaskOutputChunk,
+)
+from ..presence import presence
+from ..queries import (
+    decode_cursor,
+    encode_cursor,
+    node_recent_events,
+    node_page,
+    node_recent_tasks,
+    task_page,
+)
+from ..task_notify import output_waiters, task_waiters
 
 router = APIRouter()
 _templates_dir = Path(__file__).resolve().parent.parent.parent / "templates"
 templates = Jinja2Templates(directory=str(_templates_dir))
 
-OFFLINE_THRESHOLD_SEC = 30
+# 节点列表每页条数
+NODE_PAGE_SIZE = 50
 
+# 任务列表每页条数与可选的 state 过滤
+TASK_PAGE_SIZE = 50
+TASK_STATES = ("CREATED", "RUNNING", "SUCCEEDED", "FAILED")
 
-def _now_utc() -> datetime:
-    return datetime.now(timezone.utc).replace(tzinfo=None)
+# 输出 tail：单次最多返回的片段数、长轮询最长等待秒数
+OUTPUT_TAIL_MAX_CHUNKS = 200
+OUTPUT_TAIL_MAX_WAIT_SEC = 25
 
+# 节点列表可用的状态过滤（nodes.status 由心跳与存活扫描维护，见 app/liveness.py）
+NODE_STATUS_FILTERS = ("online", "offline")
 
-def _is_offline(last_seen: datetime | None) -> bool:
-    if last_seen is None:
-        return True
-    return (_now_utc() - last_seen).total_seconds() > OFFLINE_THRESHOLD_SEC
+
+def _now_utc() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 
 TOKEN_DEFAULT = "changeme_node_token_project_a"
@@ -65,24 +100,37 @@ async def ui_nodes(
     request: Request,
     db: Annotated[Session, Depends(get_db)],
     _: Annotated[None, Depends(require_admin_basic_auth)],
+    status: str | None = None,
+    page: int = 1,
 ):
-    """节点列表：id / name / project_key / status / last_seen。last_seen 超 30 秒显示 offline。"""
-    rows = db.execute(
-        select(Node).order_by(Node.last_seen.isnot(None).desc(), Node.last_seen.desc())
-    ).scalars().all()
-    nodes = []
-    for n in rows:
-        display_status = "offline" if _is_offline(n.last_seen) else (n.status or "online")
-        nodes.append({
+    """节点列表：id / name / project_key / status / last_seen，可按 status 过滤，每页 50 条按页码翻页。"""
+    if status not in NODE_STATUS_FILTERS:
+        status = None
+    page = max(page, 1)
+    rows = db.execute(node_page(NODE_PAGE_SIZE + 1, status, (page - 1) * NODE_PAGE_SIZE)).scalars().all()
+    query = {"status": status} if status else {}
+    prev_url = f"/ui/nodes?{urlencode({**query, 'page': page - 1})}" if page > 1 else None
+    next_url = f"/ui/nodes?{urlencode({**query, 'page': page + 1})}" if len(rows) > NODE_PAGE_SIZE else None
+    nodes = [
+        {
             "id": n.id,
             "name": n.name,
             "project_key": n.project_key,
-            "status": display_status,
+            "status": n.status,
             "last_seen": n.last_seen.isoformat() if n.last_seen else None,
-        })
+        }
+        for n in rows[:NODE_PAGE_SIZE]
+    ]
     return templates.TemplateResponse(
         "ui_nodes.html",
-        {"request": request, "nodes": nodes},
+        {
+            "request": request,
+            "nodes": nodes,
+            "status": status,
+            "status_filters": NODE_STATUS_FILTERS,
+            "prev_url": prev_url,
+            "next_url": next_url,
+        },
     )
 
 
@@ -151,15 +199,12 @@ async def ui_node_detail(
     db: Annotated[Session, Depends(get_db)],
     _: Annotated[None, Depends(require_admin_basic_auth)],
 ):
-    """节点详情：基本信息 + 最近 20 条 tasks。"""
+    """节点详情：基本信息 + 最近 10 次状态变更 + 最近 20 条 tasks。"""
     node = db.get(Node, node_id)
     if node is None:
         return templates.TemplateResponse("ui_error.html", {"request": request, "message": "Node not found"}, status_code=404)
-    tasks = (
-        db.execute(select(Task).where(Task.node_id == node_id).order_by(Task.updated_at.desc()).limit(20))
-        .scalars()
-        .all()
-    )
+    tasks = db.execute(node_recent_tasks(node_id, 20)).scalars().all()
+    node_events = db.execute(node_recent_events(node_id, 10)).scalars().all()
     connection_info = _build_connection_info(request, node)
     return templates.TemplateResponse(
         "ui_node_detail.html",
@@ -167,6 +212,7 @@ async def ui_node_detail(
             "request": request,
             "node": node,
             "tasks": tasks,
+            "node_events": node_events,
             "connection_info": connection_info,
         },
     )
@@ -206,6 +252,7 @@ async def ui_nodes_edit_post(
     node.name = name or node.name
     node.project_key = project_key or node.project_key
     db.commit()
+    presence.forget(node_id)
     return RedirectResponse(url=f"/ui/nodes/{node_id}", status_code=303)
 
 
@@ -216,16 +263,23 @@ async def ui_nodes_delete_post(
     db: Annotated[Session, Depends(get_db)],
     _: Annotated[None, Depends(require_admin_basic_auth)],
 ):
-    """删除节点（级联删除任务及事件）。"""
+    """删除节点（同一事务内级联删除任务、事件、输出片段与幂等键）。"""
     node = db.get(Node, node_id)
     if node is None:
         return templates.TemplateResponse("ui_error.html", {"request": request, "message": "Node not found"}, status_code=404)
-    task_ids = [r.id for r in db.execute(select(Task.id).where(Task.node_id == node_id)).scalars().all()]
+    rows = db.execute(select(Task.id, Task.result_ref).where(Task.node_id == node_id)).all()
+    task_ids = [r.id for r in rows]
     if task_ids:
         db.execute(delete(TaskEvent).where(TaskEvent.task_id.in_(task_ids)))
+        db.execute(delete(TaskOutputChunk).where(TaskOutputChunk.task_id.in_(task_ids)))
+        # 否则带同一幂等键的重试会拿到已删除任务的 task_id
+        db.execute(delete(TaskIdempotencyKey).where(TaskIdempotencyKey.task_id.in_(task_ids)))
     db.execute(delete(Task).where(Task.node_id == node_id))
+    delete_orphan_blobs(db, {r.result_ref for r in rows if r.result_ref})
+    db.execute(delete(NodeEvent).where(NodeEvent.node_id == node_id))
     db.delete(node)
     db.commit()
+    presence.forget(node_id)
     return RedirectResponse(url="/ui/nodes", status_code=303)
 
 
@@ -235,11 +289,11 @@ async def ui_tasks_new_get(
     db: Annotated[Session, Depends(get_db)],
     _: Annotated[None, Depends(require_admin_basic_auth)],
 ):
-    """创建任务表单：node_id 下拉、task_type 固定 PING。"""
+    """创建任务表单：node_id 下拉、task_type 固定 PING、优先级与最早执行时间（UTC）。"""
     rows = db.execute(select(Node).order_by(Node.id)).scalars().all()
     return templates.TemplateResponse(
         "ui_tasks_new.html",
-        {"request": request, "nodes": rows},
+        {"request": request, "nodes": rows, "priority_range": (TASK_PRIORITY_MIN, TASK_PRIORITY_MAX)},
     )
 
 
@@ -253,18 +307,37 @@ async def ui_tasks_new_post(
     form = await request.form()
     node_id = form.get("node_id", "").strip()
     task_type = form.get("task_type", "PING").strip() or "PING"
+    priority_raw = form.get("priority", "").strip() or "0"
+    not_before_raw = form.get("not_before", "").strip()
     all_nodes = db.execute(select(Node).order_by(Node.id)).scalars().all()
-    if not node_id:
+    priority_range = (TASK_PRIORITY_MIN, TASK_PRIORITY_MAX)
+
+    def _form_error(msg: str):
         return templates.TemplateResponse(
             "ui_tasks_new.html",
-            {"request": request, "nodes": all_nodes, "error": "node_id required"},
+            {"request": request, "nodes": all_nodes, "priority_range": priority_range, "error": msg},
         )
+
+    if not node_id:
+        return _form_error("node_id required")
+    try:
+        priority = int(priority_raw)
+    except ValueError:
+        priority = None
+    if priority is None or not TASK_PRIORITY_MIN <= priority <= TASK_PRIORITY_MAX:
+        return _form_error(f"priority must be an integer between {TASK_PRIORITY_MIN} and {TASK_PRIORITY_MAX}")
+    not_before = None
+    if not_before_raw:
+        try:
+            # datetime-local 不带时区，按 UTC 处理
+            not_before = datetime.fromisoformat(not_before_raw)
+        except ValueError:
+            return _form_error("not_before is not a valid datetime")
+        if not_before.tzinfo is not None:
+            not_before = not_before.astimezone(timezone.utc).replace(tzinfo=None)
     node = db.get(Node, node_id)
     if node is None:
-        return templates.TemplateResponse(
-            "ui_tasks_new.html",
-            {"request": request, "nodes": all_nodes, "error": "Node not found"},
-        )
+        return _form_error("Node not found")
     task_id = f"task-{uuid.uuid4().hex[:12]}"
     now = _now_utc()
     task = Task(
@@ -274,13 +347,17 @@ async def ui_tasks_new_post(
         payload_json="{}",
         result_json=None,
         state="CREATED",
+        priority=priority,
+        not_before=not_before,
         created_at=now,
         updated_at=now,
     )
     db.add(task)
     ev = TaskEvent(task_id=task_id, state="CREATED", message=None, ts=now)
     db.add(ev)
+    task_changed(db, task_id, node_id, "CREATED", now, task_type)
     db.commit()
+    task_waiters.notify(node_id)
     return RedirectResponse(url=f"/ui/tasks", status_code=303)
 
 
@@ -289,14 +366,173 @@ async def ui_tasks(
     request: Request,
     db: Annotated[Session, Depends(get_db)],
     _: Annotated[None, Depends(require_admin_basic_auth)],
+    node_id: str = "",
+    state: str = "",
+    type: str = "",
+    cursor: str = "",
 ):
-    """任务列表：最近 50 条，展示 state / node_id / type / created_at。"""
-    rows = (
-        db.execute(select(Task).order_by(Task.created_at.desc()).limit(50))
-        .scalars()
-        .all()
-    )
+    """任务列表：每页 50 条，按 created_at 倒序键集分页，可按 node_id / state / type 过滤。"""
+    filters = {"node_id": node_id.strip(), "state": state.strip(), "type": type.strip()}
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            after = None
+    rows = db.execute(
+        task_page(
+            TASK_PAGE_SIZE + 1,
+            node_id=filters["node_id"] or None,
+            state=filters["state"] or None,
+            task_type=filters["type"] or None,
+            after=after,
+        )
+    ).scalars().all()
+    next_url = None
+    if len(rows) > TASK_PAGE_SIZE:
+        last = rows[TASK_PAGE_SIZE - 1]
+        query = {k: v for k, v in filters.items() if v}
+        query["cursor"] = encode_cursor(last.created_at, last.id)
+        next_url = f"/ui/tasks?{urlencode(query)}"
+    first_url = "/ui/tasks" + (f"?{urlencode({k: v for k, v in filters.items() if v})}" if any(filters.values()) else "")
     return templates.TemplateResponse(
         "ui_tasks.html",
-        {"request": request, "tasks": rows},
+        {
+            "request": request,
+            "tasks": rows[:TASK_PAGE_SIZE],
+            "filters": filters,
+            "states": TASK_STATES,
+            "is_first_page": after is None,
+            "first_url": first_url,
+            "next_url": next_url,
+        },
+    )
+
+
+@router.get("/tasks/{task_id}/result")
+def ui_task_result(
+    request: Request,
+    task_id: str,
+    db: Annotated[Session, Depends(get_db)],
+    _: Annotated[None, Depends(require_admin_basic_auth)],
+):
+    """下载任务结果：内联结果直接返回，task_blobs 中的结果边解压边输出。"""
+    row = db.execute(
+        select(Task.result_json, Task.result_ref, Task.result_size).where(Task.id == task_id)
+    ).one_or_none()
+    if row is None:
+        return templates.TemplateResponse("ui_error.html", {"request": request, "message": "Task not found"}, status_code=404)
+    headers = {"Content-Disposition": f'attachment; filename="{task_id}.json"'}
+    if row.result_ref is None:
+        return Response(row.result_json or "", media_type="application/json", headers=headers)
+    # 只读 codec / size，data 在响应生成器内分段读出
+    blob = db.execute(
+        select(TaskBlob.codec, TaskBlob.size).where(TaskBlob.sha256 == row.result_ref)
+    ).one_or_none()
+    if blob is None:
+        return templates.TemplateResponse("ui_error.html", {"request": request, "message": "Result blob missing"}, status_code=404)
+    headers["Content-Length"] = str(blob.size)
+    return StreamingResponse(iter_blob(row.result_ref, blob.codec), media_type="application/json", headers=headers)
+
+
+@router.get("/tasks/{task_id}/tail", response_class=HTMLResponse)
+async def ui_task_tail(
+    request: Request,
+    task_id: str,
+    db: Annotated[Session, Depends(get_db)],
+    _: Annotated[None, Depends(require_admin_basic_auth)],
+):
+    """任务输出实时查看页：页面脚本长轮询 /ui/tasks/{task_id}/output 追加新片段。"""
+    task = db.get(Task, task_id)
+    if task is None:
+        return templates.TemplateResponse("ui_error.html", {"request": request, "message": "Task not found"}, status_code=404)
+    return templates.TemplateResponse("ui_task_tail.html", {"request": request, "task": task})
+
+
+@router.get("/tasks/{task_id}/output", response_model=TaskOutputTailResponse)
+async def ui_task_output(
+    task_id: str,
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    _: Annotated[None, Depends(require_admin_basic_auth)],
+    after_seq: int = -1,
+    wait: float = 0,
+):
+    """
+    读取 seq > after_seq 的输出片段（按 seq 顺序）。wait > 0 且任务仍在运行时长轮询，
+    有新片段或任务结束时立即返回。
+    """
+    deadline = time.monotonic() + min(max(wait, 0.0), float(OUTPUT_TAIL_MAX_WAIT_SEC))
+    while True:
+        with output_waiters.listen(task_id) as arrived:
+            task = (
+                await db.execute(select(Task.state, Task.output_bytes).where(Task.id == task_id))
+            ).one_or_none()
+            if task is None:
+                return JSONResponse(
+                    status_code=404,
+                    content={"ok": False, "error_code": "TASK_NOT_FOUND", "message": "Task not found"},
+                )
+            chunks = (
+                await db.execute(
+                    select(TaskOutputChunk.seq, TaskOutputChunk.data)
+                    .where(TaskOutputChunk.task_id == task_id, TaskOutputChunk.seq > after_seq)
+                    .order_by(TaskOutputChunk.seq)
+                    .limit(OUTPUT_TAIL_MAX_CHUNKS)
+                )
+            ).all()
+            # 结束事务，等待期间不占用连接与快照
+            await db.rollback()
+            done = task.state in ("SUCCEEDED", "FAILED")
+            remaining = deadline - time.monotonic()
+            if chunks or done or remaining <= 0:
+                break
+            await output_waiters.wait(arrived, remaining)
+    return TaskOutputTailResponse(
+        state=task.state,
+        chunks=[TaskOutputChunkItem(seq=c.seq, data=c.data) for c in chunks],
+        last_seq=chunks[-1].seq if chunks else after_seq,
+        output_bytes=task.output_bytes,
+        done=done and len(chunks) < OUTPUT_TAIL_MAX_CHUNKS,
+    )
+
+
+@router.get("/events")
+async def ui_events(
+    request: Request,
+    _: Annotated[None, Depends(require_admin_basic_auth)],
+    node_id: str | None = None,
+):
+    """
+    实时事件流（SSE）：event: node（node_id / status / last_seen）与 event: task（task_id / node_id / state /
+    updated_at / type），页面据此原地更新表格行。node_id 非空时只推送该节点及其任务。
+    两次推送至少间隔 SSE_MIN_INTERVAL_SEC，期间同一对象的多次变化合并为最新值；积压溢出时推送 event: reset。
+    """
+    if event_bus.clients() >= settings.SSE_MAX_CLIENTS:
+        return JSONResponse(
+            status_code=503,
+            content={"ok": False, "error_code": "TOO_MANY_CLIENTS", "message": "too many live connections"},
+        )
+
+    async def stream():
+        with event_bus.subscribe(node_id or None) as sub:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                got = await sub.next(settings.SSE_KEEPALIVE_SEC)
+                if got is None:
+                    yield ": keepalive\n\n"
+                    continue
+                items, overflowed = got
+                if overflowed:
+                    event_bus.overflows_total += 1
+                    yield "event: reset\ndata: {}\n\n"
+                    continue
+                yield "".join(
+                    f"event: {kind}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n" for kind, data in items
+                )
+                await asyncio.sleep(settings.SSE_MIN_INTERVAL_SEC)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
@@ -0,0 +1,139 @@
+"""
+阻塞 vs 异步数据库路径的并发吞吐对比（心跳接口）。
+
+- blocking：原实现，async def 内直接调用同步 SessionLocal，查询期间事件循环被阻塞；
+- async：当前实现，AsyncSession + aiosqlite（生产为 aiomysql）。
+
+两者使用同一个临时 SQLite 文件库。每条 SQL 通过 sqlite trace 回调注入 --latency-ms 毫秒延迟，
+模拟到 MySQL 的网络往返；回调运行在执行语句的线程中，阻塞路径因此卡住事件循环，异步路径只占用驱动线程。
+
+用法（在 apps/cloud_console 目录下，需要 httpx）：
+    python scripts/bench_async_db.py --requests 500 --concurrency 50 --latency-ms 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Annotated
+
+_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_root))
+_db_file = Path(tempfile.mkdtemp()) / "bench_async_db.sqlite"
+os.environ["DB_URL"] = f"sqlite:///{_db_file}"
+
+import httpx  # noqa: E402
+from fastapi import Depends, FastAPI  # noqa: E402
+from sqlalchemy import event, insert, select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app import db as app_db  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Base, Node  # noqa: E402
+from packages.common.schemas import NodeHeartbeatRequest  # noqa: E402
+
+N_NODES = 200
+
+blocking_app = FastAPI()
+
+
+@blocking_app.post("/api/nodes/{node_id}/heartbeat")
+async def heartbeat_blocking(
+    node_id: str,
+    body: NodeHeartbeatRequest,
+    db: Annotated[Session, Depends(app_db.get_db)],
+):
+    """改造前的心跳实现：同步会话直接在事件循环线程上执行。"""
+    node = db.execute(
+        select(Node).where(Node.id == node_id, Node.project_key == settings.PROJECT_KEY_DEFAULT)
+    ).scalar_one_or_none()
+    node.last_seen = datetime.utcnow()
+    node.status = body.status
+    db.commit()
+    return {"ok": True}
+
+
+def _install_latency(latency_sec: float) -> None:
+    def _sleep(_statement):
+        time.sleep(latency_sec)
+
+    @event.listens_for(app_db.engine, "connect")
+    def _sync_connect(dbapi_conn, _record):
+        dbapi_conn.execute("PRAGMA journal_mode=WAL")
+        dbapi_conn.execute("PRAGMA busy_timeout=30000")
+        dbapi_conn.set_trace_callback(_sleep)
+
+    @event.listens_for(app_db.async_engine.sync_engine, "connect")
+    def _async_connect(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA busy_timeout=30000")
+        cursor.close()
+        dbapi_conn.run_async(lambda conn: conn.set_trace_callback(_sleep))
+
+
+def _setup() -> None:
+    Base.metadata.create_all(app_db.engine)
+    with app_db.engine.begin() as conn:
+        conn.execute(
+            insert(Node),
+            [
+                {"id": f"bench-{i}", "project_key": settings.PROJECT_KEY_DEFAULT, "name": f"bench-{i}",
+                 "tags_json": "[]", "status": "online"}
+                for i in range(N_NODES)
+            ],
+        )
+
+
+async def _run(target: FastAPI, n_requests: int, concurrency: int) -> dict:
+    headers = {"Authorization": f"Bearer {settings.NODE_TOKEN_PROJECT_A}"}
+    latencies: list[float] = []
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=target)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        async def one(i: int) -> None:
+            nonlocal errors
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.post(f"/api/nodes/bench-{i % N_NODES}/heartbeat", json={"status": "online"}, headers=headers)
+                latencies.append(time.perf_counter() - t0)
+                if r.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(n_requests)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": n_requests,
+        "errors": errors,
+        "elapsed_sec": round(elapsed, 3),
+        "throughput_rps": round(n_requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="每条 SQL 注入的往返延迟")
+    args = parser.parse_args()
+
+    settings.HEARTBEAT_MODE = "sync"
+    _install_latency(args.latency_ms / 1000)
+    _setup()
+
+    for name, target in (("blocking", blocking_app), ("async", app)):
+        result = asyncio.run(_run(target, args.requests, args.concurrency))
+        print(f"{name:9s} " + " ".join(f"{k}={v}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+日志调用方开销对比：每次 logger.info 在业务线程内花费的时间。
+
+- sync-json：原实现，StreamHandler + JSONFormatter（标准库 json），格式化与写出都在调用线程；
+- queue：当前实现 setup_json_logging，调用线程只入队，格式化（orjson，若已安装）与写出在监听线程；
+- queue-sampled：queue 基础上对该 logger 按 --sample-rate 采样（模拟心跳摘要）。
+
+写出目标是 /dev/null，--sink-delay-us 给每次 write 加延迟，模拟 stdout 管道满 / 采集端慢时的背压。
+结果中 drain 为 stop 时等待队列写完的时间（不计入调用方开销）。
+
+用法（在 apps/cloud_console 目录下）：
+    python scripts/bench_logging.py --calls 20000 --sink-delay-us 50
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_root.parent.parent))
+
+import packages.common.logging as jlog  # noqa: E402
+
+
+class SlowSink:
+    """写到 /dev/null，每次 write 额外等待 delay 秒。"""
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self._f = open(os.devnull, "w")
+
+    def write(self, s: str) -> int:
+        if self.delay:
+            time.sleep(self.delay)
+        return self._f.write(s)
+
+    def flush(self) -> None:
+        self._f.flush()
+
+
+def _emit(logger: logging.Logger, calls: int) -> list[float]:
+    durations = []
+    for i in range(calls):
+        t0 = time.perf_counter_ns()
+        logger.info(
+            "POST %s 200 %.1fms sql=%d",
+            "/api/nodes/{node_id}/heartbeat",
+            1.25,
+            2,
+            extra={
+                "request_id": f"req{i:08d}",
+                "node_id": f"node-{i % 500}",
+                "fields": {"method": "POST", "status": 200, "duration_ms": 1.25, "sql_count": 2, "sql_ms": 0.4},
+            },
+        )
+        durations.append(time.perf_counter_ns() - t0)
+    return durations
+
+
+def _report(name: str, durations: list[float], drain: float | None) -> None:
+    ordered = sorted(durations)
+    p99 = ordered[int(len(ordered) * 0.99) - 1]
+    drain_text = f"  drain={drain * 1000:8.1f}ms" if drain is not None else ""
+    print(
+        f"{name:14s} mean={statistics.fmean(durations) / 1000:8.2f}us  p50={ordered[len(ordered) // 2] / 1000:8.2f}us"
+        f"  p99={p99 / 1000:8.2f}us  total={sum(durations) / 1e6:8.1f}ms{drain_text}"
+    )
+
+
+def run_sync(calls: int, delay: float) -> None:
+    logger = logging.getLogger("bench.sync")
+    logger.propagate = False
+    handler = logging.StreamHandler(SlowSink(delay))
+    handler.setFormatter(jlog.JSONFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    saved, jlog.orjson = jlog.orjson, None
+    try:
+        _report("sync-json", _emit(logger, calls), None)
+    finally:
+        jlog.orjson = saved
+        logger.removeHandler(handler)
+
+
+def run_queue(name: str, calls: int, delay: float, queue_size: int, sample_rate: float | None) -> None:
+    logger_name = f"bench.{name}"
+    logger = logging.getLogger(logger_name)
+    logger.propagate = False
+    rates = {logger_name: sample_rate} if sample_rate is not None else None
+    jlog.setup_json_logging(
+        logger_name=logger_name, queue_size=queue_size, sample_rates=rates, stream=SlowSink(delay)
+    )
+    durations = _emit(logger, calls)
+    dropped = jlog.logging_stats()["dropped"]
+    t0 = time.perf_counter()
+    jlog.stop_json_logging(logger)
+    _report(name, durations, time.perf_counter() - t0)
+    if dropped:
+        print(f"{'':14s} dropped={dropped}（队列满）")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--sink-delay-us", type=float, default=0.0, help="每次写出的额外延迟（微秒）")
+    parser.add_argument("--queue-size", type=int, default=100000)
+    parser.add_argument("--sample-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    delay = args.sink_delay_us / 1e6
+    print(f"calls={args.calls} sink_delay={args.sink_delay_us}us orjson={'yes' if jlog.orjson else 'no'}")
+    run_sync(args.calls, delay)
+    run_queue("queue", args.calls, delay, args.queue_size, None)
+    run_queue("queue-sampled", args.calls, delay, args.queue_size, args.sample_rate)
+
+
+if __name__ == "__main__":
+    main()
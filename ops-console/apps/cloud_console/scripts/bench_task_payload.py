@@ -0,0 +1,128 @@
+"""
+拉取任务响应的序列化开销：每个任务的编码（Console）与解码（Agent）耗时。
+
+- string：原实现，payload 以 JSON 字符串放在 TaskPullItem 中，经 response_model 校验、jsonable 转换、json.dumps
+  （内层文档整体转义一遍）；Agent 解析外层后再 json.loads 一次 payload；
+- raw：当前实现，库里的 payload_json（经 rawjson.encode_document 写入）由 rawjson.splice_object 原样拼进响应
+  （orjson >= 3.9 时用 orjson.Fragment，否则手工拼接），Agent 只解析一次。
+
+用法（在 apps/cloud_console 目录下）：
+    python scripts/bench_task_payload.py --tasks 100 --payload-kb 64 --rounds 20
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_root.parent.parent))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import BaseModel  # noqa: E402
+
+from packages.common import rawjson  # noqa: E402
+
+
+class _StringPullItem(BaseModel):
+    task_id: str
+    node_id: str
+    type: str
+    payload: str
+    state: str
+    created_at: str
+    updated_at: str
+
+
+class _StringPullResponse(BaseModel):
+    tasks: list[_StringPullItem]
+
+
+def _payload(kb: int) -> str:
+    """约 kb KB 的 JSON 文档：带引号、反斜杠与中文，字符串转义有实际开销。"""
+    item = {"path": "C:\\data\\日志\\app.log", "msg": 'line "quoted" 文本', "n": 12345, "ok": True}
+    one = len(json.dumps(item, ensure_ascii=False).encode())
+    # 与创建接口相同的写入路径
+    return rawjson.encode_document({"items": [item] * max(1, kb * 1024 // one)})
+
+
+def _rows(n: int, payload: str) -> list[dict]:
+    now = datetime(2026, 1, 1).isoformat()
+    return [
+        {"task_id": f"task-{i:012x}", "node_id": "node-1", "type": "ECHO", "payload_json": payload,
+         "created_at": now, "updated_at": now}
+        for i in range(n)
+    ]
+
+
+def encode_string(rows: list[dict]) -> bytes:
+    items = [
+        {"task_id": r["task_id"], "node_id": r["node_id"], "type": r["type"], "payload": r["payload_json"],
+         "state": "RUNNING", "created_at": r["created_at"], "updated_at": r["updated_at"]}
+        for r in rows
+    ]
+    # FastAPI 的 response_model 路径：校验 -> jsonable_encoder -> JSONResponse(json.dumps)
+    validated = _StringPullResponse.model_validate({"tasks": items})
+    content = jsonable_encoder(validated)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode_raw(rows: list[dict]) -> bytes:
+    parts = [
+        rawjson.splice_object(
+            {"task_id": r["task_id"], "node_id": r["node_id"], "type": r["type"], "state": "RUNNING",
+             "created_at": r["created_at"], "updated_at": r["updated_at"]},
+            {"payload": r["payload_json"]},
+        )
+        for r in rows
+    ]
+    return b'{"tasks":[' + b",".join(parts) + b"]}"
+
+
+def decode_string(body: bytes) -> list[dict]:
+    tasks = json.loads(body)["tasks"]
+    for t in tasks:
+        t["payload"] = json.loads(t["payload"])
+    return tasks
+
+
+def decode_raw(body: bytes) -> list[dict]:
+    # Agent 用 requests / httpx 的 .json()，即标准库 json
+    return json.loads(body)["tasks"]
+
+
+def _time(fn, arg, rounds: int) -> tuple[float, object]:
+    samples, out = [], None
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        out = fn(arg)
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples), out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=100, help="每次拉取的任务数")
+    parser.add_argument("--payload-kb", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = _rows(args.tasks, _payload(args.payload_kb))
+    splice = "fragment" if rawjson._Fragment is not None else "manual"
+    print(f"tasks={args.tasks} payload={args.payload_kb}KB orjson={'yes' if rawjson.orjson else 'no'} splice={splice}")
+    results = {}
+    for name, enc, dec in (("string", encode_string, decode_string), ("raw", encode_raw, decode_raw)):
+        enc_t, body = _time(enc, rows, args.rounds)
+        dec_t, tasks = _time(dec, body, args.rounds)
+        results[name] = tasks
+        print(
+            f"{name:7s} encode={enc_t / args.tasks * 1e6:9.1f}us/task  decode={dec_t / args.tasks * 1e6:9.1f}us/task"
+            f"  body={len(body) / args.tasks / 1024:7.1f}KB/task"
+        )
+    assert results["string"] == results["raw"], "两种编码解析结果不一致"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+任务认领并发检查：同一节点的多个拉取并发执行时，任何任务都不会被认领两次。
+
+临时 SQLite 文件库（Base.metadata.create_all 建表）灌入 --tasks 个 CREATED 任务，
+--pullers 个并发拉取方（一半经 httpx.ASGITransport 调用 GET /api/nodes/{node_id}/tasks，
+一半直接调用 _claim_tasks，各自独立会话）每次最多认领 --limit 个，循环直到取空。检查：
+- 认领到的 task_id 无重复，并集等于灌入的任务集合；
+- 每个任务恰好一条 RUNNING TaskEvent，且状态均为 RUNNING。
+失败时退出码 1。也可由 pytest 收集执行（test_no_task_claimed_twice）。
+
+用法（在 apps/cloud_console 目录下，需要 httpx、aiosqlite）：
+    python scripts/check_claim_concurrency.py --tasks 500 --pullers 16 --limit 7
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_root))
+_db_file = Path(tempfile.mkdtemp()) / "check_claim_concurrency.sqlite"
+os.environ["DB_URL"] = f"sqlite:///{_db_file}"
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+import httpx  # noqa: E402
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from app.main import app  # noqa: E402  先导入：把 ops-console 根加入 path，供 packages.common 使用
+from app import db as app_db  # noqa: E402
+from app.api.nodes import _claim_tasks  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.models import Base, Node, Task, TaskEvent  # noqa: E402
+from packages.common import rawjson  # noqa: E402
+
+NODE_ID = "claim-node"
+
+
+def seed(n_tasks: int) -> set[str]:
+    """建表并写入一个节点与 n_tasks 个 CREATED 任务，返回任务 id 集合。"""
+    Base.metadata.drop_all(app_db.engine)
+    Base.metadata.create_all(app_db.engine)
+    now = datetime.utcnow()
+    ids = [f"task-{uuid.uuid4().hex[:12]}" for _ in range(n_tasks)]
+    with app_db.engine.begin() as conn:
+        conn.execute(
+            insert(Node),
+            [{"id": NODE_ID, "project_key": settings.PROJECT_KEY_DEFAULT, "name": NODE_ID, "tags_json": "[]",
+              "last_seen": now, "status": "online"}],
+        )
+        conn.execute(
+            insert(Task),
+            [
+                {"id": task_id, "node_id": NODE_ID, "type": "PING", "payload_json": "{}", "state": "CREATED",
+                 "created_at": now - timedelta(seconds=n_tasks - i), "updated_at": now}
+                for i, task_id in enumerate(ids)
+            ],
+        )
+    return set(ids)
+
+
+async def _pull_http(client: httpx.AsyncClient, limit: int) -> list[str]:
+    r = await client.get(f"/api/nodes/{NODE_ID}/tasks", params={"limit": limit})
+    r.raise_for_status()
+    return [t["task_id"] for t in r.json()["tasks"]]
+
+
+async def _pull_direct(limit: int) -> list[str]:
+    async with app_db.AsyncSessionLocal() as db:
+        return [rawjson.loads(item)["task_id"] for item in await _claim_tasks(db, NODE_ID, "CREATED", limit)]
+
+
+async def claim_concurrently(pullers: int, limit: int) -> list[str]:
+    """pullers 个拉取方并发循环认领直到取空，返回按认领先后拼接的 task_id 列表（含可能的重复）。"""
+    claimed: list[str] = []
+    headers = {"Authorization": f"Bearer {settings.NODE_TOKEN_PROJECT_A}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://console", headers=headers) as client:
+
+        async def worker(i: int) -> None:
+            while True:
+                batch = await (_pull_http(client, limit) if i % 2 == 0 else _pull_direct(limit))
+                if not batch:
+                    return
+                claimed.extend(batch)
+
+        await asyncio.gather(*(worker(i) for i in range(pullers)))
+    await app_db.async_engine.dispose()
+    return claimed
+
+
+def verify(seeded: set[str], claimed: list[str]) -> list[str]:
+    """返回问题列表，空表示通过。"""
+    problems = []
+    duplicates = [task_id for task_id, n in Counter(claimed).items() if n > 1]
+    if duplicates:
+        problems.append(f"{len(duplicates)} task(s) claimed more than once: {duplicates[:10]}")
+    if set(claimed) != seeded:
+        problems.append(
+            f"claimed set differs from seeded: missing={len(seeded - set(claimed))} extra={len(set(claimed) - seeded)}"
+        )
+    with app_db.engine.connect() as conn:
+        events = dict(
+            conn.execute(
+                select(TaskEvent.task_id, func.count()).where(TaskEvent.state == "RUNNING").group_by(TaskEvent.task_id)
+            ).all()
+        )
+        states = Counter(conn.execute(select(Task.state)).scalars())
+    bad_events = {task_id: events.get(task_id, 0) for task_id in seeded if events.get(task_id, 0) != 1}
+    if bad_events:
+        problems.append(f"{len(bad_events)} task(s) without exactly one RUNNING event: {list(bad_events.items())[:10]}")
+    if states != Counter({"RUNNING": len(seeded)}):
+        problems.append(f"unexpected task states: {dict(states)}")
+    return problems
+
+
+def run(n_tasks: int, pullers: int, limit: int) -> list[str]:
+    seeded = seed(n_tasks)
+    claimed = asyncio.run(claim_concurrently(pullers, limit))
+    return verify(seeded, claimed)
+
+
+def test_no_task_claimed_twice():
+    problems = run(300, 12, 7)
+    assert not problems, problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=500)
+    parser.add_argument("--pullers", type=int, default=16)
+    parser.add_argument("--limit", type=int, default=7, help="每次拉取最多认领的任务数")
+    args = parser.parse_args()
+
+    problems = run(args.tasks, args.pullers, args.limit)
+    print(f"tasks={args.tasks} pullers={args.pullers} limit={args.limit}: {'FAIL' if problems else 'ok'}")
+    for p in problems:
+        print(f"   !! {p}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
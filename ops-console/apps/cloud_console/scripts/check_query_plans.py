@@ -0,0 +1,161 @@
+"""
+热点查询执行计划检查：对 app/queries.py 中的每条热点查询执行 EXPLAIN 并打印计划，
+出现全表扫描或额外排序（filesort / temp b-tree）即判定回归，退出码 1。
+
+用法（在 apps/cloud_console 目录下）：
+    python scripts/check_query_plans.py                        # 内存 SQLite：按 models 建表并灌入样本数据
+    python scripts/check_query_plans.py --url <DATABASE_URL>   # 对已执行 alembic upgrade head 的库检查
+    python scripts/check_query_plans.py --url <DATABASE_URL> --seed 20000   # 先写入样本数据（会提交，仅限测试库）
+"""
+import argparse
+import re
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_root))
+
+from sqlalchemy import create_engine, insert, text  # noqa: E402
+from sqlalchemy.engine import Connection  # noqa: E402
+
+from app.models import Base, Node, NodeEvent, Task  # noqa: E402
+from app.metrics import ACTIVE_STATES, HEARTBEAT_AGE_BUCKETS  # noqa: E402
+from app.queries import (  # noqa: E402
+    claim_candidates,
+    expired_leases,
+    heartbeat_age_buckets,
+    node_recent_events,
+    node_recent_tasks,
+    node_page,
+    pending_by_node,
+    stale_nodes,
+    task_page,
+    task_state_counts,
+)
+
+SEED_NODES = 50
+STATES = ("CREATED", "RUNNING", "SUCCEEDED", "SUCCEEDED", "FAILED")
+
+
+def hot_queries():
+    """(名称, 语句)。与视图执行的语句一致（同一查询函数、同样的 LIMIT / OFFSET）。"""
+    cursor_at = datetime.utcnow() - timedelta(hours=1)
+    return [
+        ("pull_tasks 认领候选", claim_candidates("node-1", "CREATED", 100, datetime.utcnow())),
+        ("ui_tasks 最近任务", task_page(51)),
+        ("ui_tasks 深页（游标）", task_page(51, after=(cursor_at, "task-ffffffffffff"))),
+        ("ui_tasks 按 node_id", task_page(51, node_id="node-1", after=(cursor_at, "task-ffffffffffff"))),
+        ("ui_tasks 按 node_id + state", task_page(51, node_id="node-1", state="FAILED")),
+        ("ui_tasks 按 state", task_page(51, state="FAILED", after=(cursor_at, "task-ffffffffffff"))),
+        ("ui_tasks 按 type", task_page(51, task_type="PING")),
+        ("ui_node_detail 节点最近任务", node_recent_tasks("node-1", 20)),
+        ("ui_nodes 按 last_seen 排序", node_page(51)),
+        ("ui_nodes 按 status 过滤（第 2 页）", node_page(51, "offline", 50)),
+        ("ui_node_detail 最近状态变更", node_recent_events("node-1", 10)),
+        ("liveness 存活扫描", stale_nodes(datetime.utcnow() - timedelta(seconds=30))),
+        ("leases 过期租约回收", expired_leases(datetime.utcnow(), 500)),
+        ("metrics 积压任务数", task_state_counts(ACTIVE_STATES)),
+        ("metrics 每节点待执行", pending_by_node()),
+        ("metrics 心跳间隔分布", heartbeat_age_buckets(datetime.utcnow(), HEARTBEAT_AGE_BUCKETS)),
+    ]
+
+
+def seed(conn: Connection, n_tasks: int) -> None:
+    now = datetime.utcnow()
+    conn.execute(
+        insert(Node),
+        [
+            {
+                "id": f"node-{i}",
+                "project_key": "project_a",
+                "name": f"node-{i}",
+                "tags_json": "[]",
+                "last_seen": now - timedelta(seconds=i) if i % 5 else None,
+                "status": "online" if i % 3 else "offline",
+            }
+            for i in range(SEED_NODES)
+        ],
+    )
+    conn.execute(
+        insert(NodeEvent),
+        [
+            {"node_id": f"node-{i % SEED_NODES}", "from_status": "online", "to_status": "offline",
+             "ts": now - timedelta(minutes=i)}
+            for i in range(SEED_NODES * 20)
+        ],
+    )
+    rows = []
+    for i in range(n_tasks):
+        ts = now - timedelta(seconds=n_tasks - i)
+        rows.append({
+            "id": f"task-{uuid.uuid4().hex[:12]}",
+            "node_id": f"node-{i % SEED_NODES}",
+            "type": "PING",
+            "payload_json": "{}",
+            "state": STATES[i % len(STATES)],
+            "priority": (0, 0, 0, 10, -5)[i % 7 % 5],
+            "not_before": ts + timedelta(hours=1) if i % 11 == 0 else None,
+            "lease_expires_at": ts + timedelta(minutes=5) if STATES[i % len(STATES)] == "RUNNING" else None,
+            "attempts": 0 if STATES[i % len(STATES)] == "CREATED" else 1,
+            "created_at": ts,
+            "updated_at": ts,
+        })
+    conn.execute(insert(Task), rows)
+    conn.execute(text("ANALYZE" if conn.dialect.name == "sqlite" else "ANALYZE TABLE nodes, node_events, tasks"))
+
+
+def explain(conn: Connection, sql: str) -> tuple[list[str], list[str]]:
+    """返回 (计划文本行, 问题列表)。"""
+    plan, problems = [], []
+    if conn.dialect.name == "sqlite":
+        for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"):
+            detail = row[-1]
+            plan.append(detail)
+            if re.fullmatch(r"SCAN \w+", detail):
+                problems.append(f"full scan: {detail}")
+            if "USE TEMP B-TREE" in detail:
+                problems.append(f"extra sort: {detail}")
+    else:
+        result = conn.exec_driver_sql(f"EXPLAIN {sql}")
+        keys = list(result.keys())
+        for row in result:
+            r = dict(zip(keys, row))
+            plan.append(" ".join(f"{k}={r[k]}" for k in ("table", "type", "key", "rows", "Extra")))
+            if r.get("type") == "ALL":
+                problems.append(f"full scan on {r.get('table')}")
+            if "Using filesort" in (r.get("Extra") or ""):
+                problems.append(f"filesort on {r.get('table')}")
+    return plan, problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="数据库 URL；省略时使用内存 SQLite")
+    parser.add_argument("--seed", type=int, default=None, help="写入的样本任务数（SQLite 默认 20000）")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url or "sqlite://")
+    n_seed = args.seed if args.seed is not None else (0 if args.url else 20000)
+    failed = False
+    with engine.connect() as conn:
+        if not args.url:
+            Base.metadata.create_all(conn)
+        if n_seed:
+            seed(conn, n_seed)
+        for name, stmt in hot_queries():
+            sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+            plan, problems = explain(conn, sql)
+            print(f"== {name}: {'FAIL' if problems else 'ok'}")
+            for line in plan:
+                print(f"   {line}")
+            for p in problems:
+                print(f"   !! {p}")
+            failed = failed or bool(problems)
+        conn.commit()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,372 @@
+"""
+节点规模压测：模拟 N 个 Agent 按配置的频率注册、心跳、拉取任务、回传结果，同时按固定速率下发任务。
+
+请求体与路径复用 ops-node-agent/agent（register_body / heartbeat_body、拉取参数、批量回传格式），
+任务用 agent.task_executor.execute_async 执行（默认 PING，不占线程）。
+
+默认在进程内经 httpx.ASGITransport 直接调用 app（含 lifespan 后台任务），数据库为临时 SQLite 文件；
+--db-url 可指向 MySQL 测试库（需已 alembic upgrade head）。进程内模式按接口统计 SQL 条数
+（客户端与 app 在同一个 asyncio 任务上下文，按 contextvar 归属；后台任务的 SQL 记为 background）。
+--url 压测已启动的 Console（真实网络，不统计 SQL）。Console 侧配置（HEARTBEAT_MODE 等）通过环境变量传入。
+
+输出每个接口的吞吐、p50 / p99 / max 延迟、错误数、每请求 SQL 条数，并写入 JSON（--out），
+--compare 与之前的结果对比，便于跨提交比较。
+
+用法（在 apps/cloud_console 目录下，需要 httpx）：
+    python scripts/loadtest.py --agents 2000 --duration 60 --heartbeat-sec 10 --poll-sec 5 --task-rate 200
+    HEARTBEAT_MODE=buffered python scripts/loadtest.py --agents 5000 --out buffered.json --compare sync.json
+    python scripts/loadtest.py --url http://127.0.0.1:8000 --agents 500 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+_agent_root = _root.parents[2] / "ops-node-agent"
+sys.path.insert(0, str(_root))
+sys.path.insert(0, str(_agent_root))
+
+import httpx  # noqa: E402
+
+# 当前请求所属接口，SQL 计数按它归属
+_endpoint: ContextVar[str] = ContextVar("loadtest_endpoint", default="background")
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.statements: Counter = Counter()
+        self.tasks: Counter = Counter()
+
+    def record(self, endpoint: str, elapsed: float, ok: bool) -> None:
+        self.latencies[endpoint].append(elapsed)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def summary(self, duration: float, count_sql: bool) -> dict:
+        endpoints = {}
+        for name in sorted(self.latencies):
+            lat = sorted(self.latencies[name])
+            n = len(lat)
+            endpoints[name] = {
+                "requests": n,
+                "errors": self.errors[name],
+                "rps": round(n / duration, 1),
+                "p50_ms": round(lat[n // 2] * 1000, 2),
+                "p99_ms": round(lat[max(int(n * 0.99) - 1, 0)] * 1000, 2),
+                "max_ms": round(lat[-1] * 1000, 2),
+                "statements": self.statements[name] if count_sql else None,
+                "statements_per_request": round(self.statements[name] / n, 2) if count_sql else None,
+            }
+        total = sum(len(v) for v in self.latencies.values())
+        return {
+            "endpoints": endpoints,
+            "totals": {
+                "requests": total,
+                "errors": sum(self.errors.values()),
+                "rps": round(total / duration, 1),
+                "statements": sum(self.statements.values()) if count_sql else None,
+                "background_statements": self.statements["background"] if count_sql else None,
+            },
+            "tasks": dict(self.tasks),
+        }
+
+
+async def _call(client: httpx.AsyncClient, stats: Stats, endpoint: str, method: str, url: str, **kwargs):
+    """发请求并计时；失败（网络错误或 4xx / 5xx）返回 None。"""
+    token = _endpoint.set(endpoint)
+    t0 = time.perf_counter()
+    try:
+        r = await client.request(method, url, **kwargs)
+        ok = r.status_code < 400
+    except httpx.HTTPError:
+        r, ok = None, False
+    finally:
+        _endpoint.reset(token)
+    stats.record(endpoint, time.perf_counter() - t0, ok)
+    return r if ok else None
+
+
+class Swarm:
+    def __init__(self, args, client: httpx.AsyncClient, stats: Stats, project_key: str) -> None:
+        self.args = args
+        self.client = client
+        self.stats = stats
+        self.project_key = project_key
+        self.registered: list[str] = []
+        self.deadline = 0.0
+
+    async def run(self) -> float:
+        start = time.monotonic()
+        self.deadline = start + self.args.ramp_sec + self.args.duration
+        await asyncio.gather(
+            *(self._agent(i) for i in range(self.args.agents)),
+            self._producer(),
+        )
+        return time.monotonic() - start
+
+    async def _sleep_until(self, t: float) -> bool:
+        """睡到 t；超过压测截止时间返回 False。"""
+        if t >= self.deadline:
+            delay = self.deadline - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return False
+        delay = t - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return True
+
+    async def _agent(self, i: int) -> None:
+        from agent.registrar import register_body
+
+        node_id = f"{self.args.node_prefix}{i:05d}"
+        await asyncio.sleep(random.uniform(0, self.args.ramp_sec))
+        body = {**register_body(), "node_id": node_id, "project_key": self.project_key, "name": node_id}
+        if await _call(self.client, self.stats, "register", "POST", "/api/nodes/register", json=body) is None:
+            return
+        self.registered.append(node_id)
+        await asyncio.gather(self._heartbeat_loop(node_id), self._pull_loop(node_id))
+
+    async def _heartbeat_loop(self, node_id: str) -> None:
+        from agent.registrar import heartbeat_body
+
+        interval = self.args.heartbeat_sec
+        t = time.monotonic() + random.uniform(0, interval)
+        while await self._sleep_until(t):
+            await _call(
+                self.client, self.stats, "heartbeat", "POST", f"/api/nodes/{node_id}/heartbeat", json=heartbeat_body()
+            )
+            t += interval
+
+    async def _pull_loop(self, node_id: str) -> None:
+        from agent.task_executor import execute_async
+
+        args = self.args
+        url = f"/api/nodes/{node_id}/tasks?state=CREATED&limit={args.pull_batch}"
+        if args.long_poll_sec > 0:
+            url += f"&wait={args.long_poll_sec}"
+        t = time.monotonic() + random.uniform(0, args.poll_sec)
+        while await self._sleep_until(t):
+            r = await _call(self.client, self.stats, "pull", "GET", url)
+            tasks = r.json().get("tasks") or [] if r is not None else []
+            self.stats.tasks["pulled"] += len(tasks)
+            items = []
+            for task in tasks:
+                status, result = await execute_async(task)
+                items.append({"task_id": task["task_id"], "status": status, "result": result,
+                              "attempt": task.get("attempt")})
+            if items and args.report == "batch":
+                r = await _call(self.client, self.stats, "report_batch", "POST", "/api/tasks/report_batch",
+                                json={"items": items})
+                if r is not None:
+                    self.stats.tasks["reported"] += len(r.json().get("accepted") or [])
+            else:
+                for it in items:
+                    r = await _call(self.client, self.stats, "report", "POST", f"/api/tasks/{it['task_id']}/report",
+                                    json={"status": it["status"], "result": it["result"], "attempt": it["attempt"]})
+                    if r is not None:
+                        self.stats.tasks["reported"] += 1
+            # 长轮询拿到任务后立即再拉；定时轮询按间隔
+            t = time.monotonic() if args.long_poll_sec > 0 else t + args.poll_sec
+
+    async def _producer(self) -> None:
+        """每 0.1 秒按 task_rate 为随机的已注册节点批量下发任务。"""
+        rate = self.args.task_rate
+        if rate <= 0:
+            return
+        tick = 0.1
+        carry = 0.0
+        t = time.monotonic() + self.args.ramp_sec
+        while await self._sleep_until(t):
+            t += tick
+            carry += rate * tick
+            n, carry = int(carry), carry - int(carry)
+            if not n or not self.registered:
+                continue
+            node_ids = random.choices(self.registered, k=n)
+            r = await _call(self.client, self.stats, "create_batch", "POST", "/api/tasks/create_batch",
+                            json={"node_ids": node_ids, "type": self.args.task_type, "payload": {}})
+            if r is not None:
+                self.stats.tasks["created"] += len(r.json().get("tasks") or [])
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=_root, capture_output=True, text=True)
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def _install_sql_counter(engines, stats: Stats) -> None:
+    from sqlalchemy import event
+
+    for eng in engines:
+        @event.listens_for(eng, "after_cursor_execute")
+        def _count(conn, cursor, statement, parameters, context, executemany):
+            stats.statements[_endpoint.get()] += 1
+
+
+def _sqlite_pragmas(engines) -> None:
+    """SQLite 压测：WAL + busy_timeout，写锁冲突时等待而不是立即报错。"""
+    from sqlalchemy import event
+
+    sync_engine, async_sync_engine = engines
+
+    @event.listens_for(sync_engine, "connect")
+    def _sync_connect(dbapi_conn, _record):
+        dbapi_conn.execute("PRAGMA journal_mode=WAL")
+        dbapi_conn.execute("PRAGMA busy_timeout=30000")
+
+    @event.listens_for(async_sync_engine, "connect")
+    def _async_connect(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA busy_timeout=30000")
+        cursor.close()
+
+
+async def _run_inprocess(args, stats: Stats) -> tuple[float, dict]:
+    from app import db as app_db
+    from app.config import settings
+    from app.main import app
+    from app.models import Base
+
+    engines = (app_db.engine, app_db.async_engine.sync_engine)
+    dialect = app_db.engine.dialect.name
+    if dialect == "sqlite":
+        _sqlite_pragmas(engines)
+    if dialect == "sqlite" or args.create_schema:
+        Base.metadata.create_all(app_db.engine)
+    _install_sql_counter(engines, stats)
+
+    headers = {"Authorization": f"Bearer {args.token or settings.NODE_TOKEN_PROJECT_A}"}
+    limits = httpx.Limits(max_connections=None)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", headers=headers,
+                                     timeout=args.timeout, limits=limits) as client:
+            swarm = Swarm(args, client, stats, args.project_key or settings.PROJECT_KEY_DEFAULT)
+            duration = await swarm.run()
+    info = {
+        "target": "in-process",
+        "db": dialect,
+        "heartbeat_mode": settings.HEARTBEAT_MODE,
+    }
+    return duration, info
+
+
+async def _run_http(args, stats: Stats) -> tuple[float, dict]:
+    token = args.token or os.environ.get("NODE_TOKEN", "")
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=args.url.rstrip("/"), headers={"Authorization": f"Bearer {token}"},
+                                 timeout=args.timeout, limits=limits) as client:
+        swarm = Swarm(args, client, stats, args.project_key or os.environ.get("PROJECT_KEY", "project_a"))
+        duration = await swarm.run()
+    return duration, {"target": args.url}
+
+
+def _print(result: dict) -> None:
+    print(f"duration={result['duration_sec']}s agents={result['config']['agents']} target={result['run']['target']}")
+    print(f"{'endpoint':14s} {'requests':>9s} {'errors':>7s} {'rps':>8s} {'p50_ms':>8s} {'p99_ms':>8s} "
+          f"{'max_ms':>9s} {'sql/req':>8s}")
+    for name, e in result["endpoints"].items():
+        spr = "-" if e["statements_per_request"] is None else f"{e['statements_per_request']:.2f}"
+        print(f"{name:14s} {e['requests']:9d} {e['errors']:7d} {e['rps']:8.1f} {e['p50_ms']:8.2f} {e['p99_ms']:8.2f} "
+              f"{e['max_ms']:9.2f} {spr:>8s}")
+    t = result["totals"]
+    print(f"{'total':14s} {t['requests']:9d} {t['errors']:7d} {t['rps']:8.1f}"
+          + (f"  background_sql={t['background_statements']}" if t["background_statements"] is not None else ""))
+    print("tasks: " + " ".join(f"{k}={v}" for k, v in sorted(result["tasks"].items())))
+
+
+def _compare(result: dict, previous: dict) -> None:
+    print(f"\ncompare with {previous.get('git_commit') or '?'} ({previous.get('started_at', '?')}):")
+    print(f"{'endpoint':14s} {'rps':>18s} {'p99_ms':>20s} {'sql/req':>16s}")
+    for name, e in result["endpoints"].items():
+        old = previous.get("endpoints", {}).get(name)
+        if not old:
+            continue
+
+        def pair(key: str, width: int) -> str:
+            a, b = old.get(key), e.get(key)
+            if a is None or b is None:
+                return f"{'-':>{width}s}"
+            return f"{f'{a:g} -> {b:g}':>{width}s}"
+
+        print(f"{name:14s} {pair('rps', 18)} {pair('p99_ms', 20)} {pair('statements_per_request', 16)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=60.0, help="注册完成后的压测时长（秒）")
+    parser.add_argument("--ramp-sec", type=float, default=10.0, help="Agent 在该时间内陆续注册")
+    parser.add_argument("--heartbeat-sec", type=float, default=10.0, help="每个 Agent 的心跳间隔")
+    parser.add_argument("--poll-sec", type=float, default=5.0, help="每个 Agent 的拉取间隔（--long-poll-sec 为 0 时）")
+    parser.add_argument("--long-poll-sec", type=float, default=0.0, help=">0 时使用长轮询拉取")
+    parser.add_argument("--pull-batch", type=int, default=10, help="单次拉取的 limit")
+    parser.add_argument("--task-rate", type=float, default=50.0, help="全局每秒下发的任务数")
+    parser.add_argument("--task-type", default="PING")
+    parser.add_argument("--report", choices=("batch", "single"), default="batch")
+    parser.add_argument("--node-prefix", default="lt-")
+    parser.add_argument("--project-key", default="")
+    parser.add_argument("--token", default="", help="节点 Token，默认 NODE_TOKEN_PROJECT_A")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--db-url", default="", help="进程内模式的数据库，默认临时 SQLite 文件")
+    parser.add_argument("--create-schema", action="store_true", help="非 SQLite 库也按 models 建表（仅限空测试库）")
+    parser.add_argument("--url", default="", help="压测已启动的 Console，而不是进程内 app")
+    parser.add_argument("--max-connections", type=int, default=1000, help="--url 模式的 HTTP 连接上限")
+    parser.add_argument("--out", default="", help="结果 JSON 路径，默认 loadtest-<时间>.json")
+    parser.add_argument("--compare", default="", help="与之前的结果 JSON 对比")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    # agent.config 导入时校验必需变量；压测只用它的请求体构造函数，这里给出占位值
+    for key, value in (("CONSOLE_BASE_URL", args.url or "http://loadtest"), ("NODE_ID", "loadtest"),
+                       ("PROJECT_KEY", args.project_key or "project_a"), ("NODE_TOKEN", args.token or "loadtest"),
+                       ("HEARTBEAT_INTERVAL_SEC", "10")):
+        os.environ.setdefault(key, value)
+    if not args.url:
+        os.environ["DB_URL"] = args.db_url or f"sqlite:///{Path(tempfile.mkdtemp()) / 'loadtest.sqlite'}"
+        # 压测时只看错误日志；需要请求剖析日志可自行设置 LOG_LEVEL
+        os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+    stats = Stats()
+    started_at = datetime.now(timezone.utc).isoformat()
+    runner = _run_http if args.url else _run_inprocess
+    duration, run_info = asyncio.run(runner(args, stats))
+    result = {
+        "started_at": started_at,
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("token", "out", "compare")},
+        "run": run_info,
+        "duration_sec": round(duration, 2),
+        **stats.summary(duration, count_sql=not args.url),
+    }
+    _print(result)
+
+    out = Path(args.out or f"loadtest-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\nsaved {out}")
+    if args.compare:
+        _compare(result, json.loads(Path(args.compare).read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+task_events 保留与归档任务（适合 cron 每日执行）：补建未来月度分区，按 TASK_EVENTS_RETENTION_DAYS
+归档（TASK_EVENTS_ARCHIVE_DIR）并删除过期分区 / 行。详见 app/retention.py。
+
+用法（在 apps/cloud_console 目录下）：
+    python scripts/task_events_retention.py
+    python scripts/task_events_retention.py --retention-days 30 --archive-dir /data/archive/task_events
+"""
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_root))
+
+from app.config import settings  # noqa: E402
+from app.retention import run_retention  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--retention-days", type=int, default=None, help="覆盖 TASK_EVENTS_RETENTION_DAYS")
+    parser.add_argument("--archive-dir", default=None, help="覆盖 TASK_EVENTS_ARCHIVE_DIR")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    if args.retention_days is not None:
+        settings.TASK_EVENTS_RETENTION_DAYS = args.retention_days
+    if args.archive_dir is not None:
+        settings.TASK_EVENTS_ARCHIVE_DIR = args.archive_dir
+    print(json.dumps(run_retention(), ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+/*
+ * 控制台实时更新：订阅 /ui/events（SSE），按 data-* 属性原地更新页面上的节点 / 任务行，
+ * 不再整页刷新重新查询。
+ *   <tr data-node-id="..."> / <tr data-task-id="..."> 内的 [data-field="status|last_seen|state|updated_at"]；
+ *   #live-node-events：节点详情页状态变更表，节点状态变化时在表头插入一行；
+ *   #live-new-tasks：任务列表第一页，出现符合筛选条件的新任务时提示刷新（data-node-id / data-state / data-type）。
+ * 脚本标签的 data-node-id 非空时只订阅该节点。
+ */
+(function () {
+    if (!window.EventSource) { return; }
+    var script = document.currentScript;
+    var nodeFilter = script && script.getAttribute('data-node-id');
+    var url = '/ui/events' + (nodeFilter ? '?node_id=' + encodeURIComponent(nodeFilter) : '');
+
+    function setField(row, field, value, asClass) {
+        if (value === undefined) { return; }
+        var cells = row.querySelectorAll('[data-field="' + field + '"]');
+        for (var i = 0; i < cells.length; i++) {
+            var cell = cells[i];
+            if (asClass) {
+                cell.classList.remove(cell.textContent);
+                cell.classList.add(value);
+            }
+            cell.textContent = value;
+        }
+    }
+
+    function rows(attr, id) {
+        return document.querySelectorAll('[' + attr + '="' + (window.CSS && CSS.escape ? CSS.escape(id) : id) + '"]');
+    }
+
+    function onNode(d) {
+        var list = rows('data-node-id', d.node_id);
+        for (var i = 0; i < list.length; i++) {
+            var row = list[i];
+            var statusCell = row.querySelector('[data-field="status"]');
+            var previous = statusCell ? statusCell.textContent : null;
+            setField(row, 'status', d.status, true);
+            setField(row, 'last_seen', d.last_seen);
+            var events = document.getElementById('live-node-events');
+            if (events && previous !== null && d.status !== undefined && previous !== d.status) {
+                var tr = document.createElement('tr');
+                [new Date().toISOString().slice(0, 19), previous, d.status].forEach(function (text, idx) {
+                    var td = document.createElement('td');
+                    td.textContent = text;
+                    if (idx === 2) { td.className = text; }
+                    tr.appendChild(td);
+                });
+                events.insertBefore(tr, events.firstChild);
+            }
+        }
+    }
+
+    function onTask(d) {
+        var list = rows('data-task-id', d.task_id);
+        for (var i = 0; i < list.length; i++) {
+            setField(list[i], 'state', d.state);
+            setField(list[i], 'updated_at', d.updated_at);
+        }
+        var banner = document.getElementById('live-new-tasks');
+        if (!list.length && banner && d.state === 'CREATED') {
+            var f = banner.dataset;
+            if ((f.nodeId && f.nodeId !== d.node_id) || (f.state && f.state !== d.state) || (f.type && f.type !== d.type)) {
+                return;
+            }
+            var count = banner.querySelector('[data-field="count"]');
+            count.textContent = String(Number(count.textContent || '0') + 1);
+            banner.style.display = '';
+        }
+    }
+
+    var source = new EventSource(url);
+    source.addEventListener('node', function (e) { onNode(JSON.parse(e.data)); });
+    source.addEventListener('task', function (e) { onTask(JSON.parse(e.data)); });
+    // 服务端积压溢出：增量已不完整，整页刷新
+    source.addEventListener('reset', function () { window.location.reload(); });
+})();
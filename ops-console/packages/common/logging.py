@@ -1,12 +1,37 @@
 """
 JSON 结构化日志。
 必须包含 request_id / node_id / task_id 等字段。
-MVP 阶段占位，业务实现时补充完整。
+
+setup_json_logging 使用 QueueHandler / QueueListener：业务线程只把日志记录放进有界队列，
+格式化与写 stdout 在后台线程完成，stdout 阻塞（管道满、采集端慢）不会变成请求延迟；队列满时丢弃并计数。
+安装了 orjson 时用它序列化，否则用标准库 json。
+高频日志（如每个心跳请求的摘要）可按 logger 配置采样率，WARNING 及以上不采样。
 """
-import logging
+import atexit
+import copy
 import json
+import logging
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
 from typing import Optional
-from datetime import datetime
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 为可选依赖
+    orjson = None
+
+
+def _dumps(obj: dict) -> str:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=str).decode()
+        except TypeError:
+            # orjson 不支持的类型（如超出 64 位的整数）退回标准库
+            pass
+    return json.dumps(obj, ensure_ascii=False, default=str)
 
 
 class JSONFormatter(logging.Formatter):
@@ -14,7 +39,8 @@ class JSONFormatter(logging.Formatter):
 
     def format(self, record: logging.LogRecord) -> str:
         log_obj = {
-            "ts": datetime.utcnow().isoformat() + "Z",
+            # 取记录创建时间：经队列异步格式化时与写出时间不同
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).replace(tzinfo=None).isoformat() + "Z",
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -26,15 +52,145 @@ class JSONFormatter(logging.Formatter):
             log_obj["node_id"] = record.node_id
         if hasattr(record, "task_id"):
             log_obj["task_id"] = record.task_id
+        if hasattr(record, "sample_rate"):
+            log_obj["sample_rate"] = record.sample_rate
+        # 其余结构化字段：logger.info(..., extra={"fields": {...}})，不覆盖上面的保留字段
+        fields = getattr(record, "fields", None)
+        if isinstance(fields, dict):
+            for k, v in fields.items():
+                log_obj.setdefault(k, v)
         if record.exc_info:
             log_obj["exception"] = self.formatException(record.exc_info)
-        return json.dumps(log_obj, ensure_ascii=False)
+        elif record.exc_text:
+            log_obj["exception"] = record.exc_text
+        return _dumps(log_obj)
+
+
+def parse_sample_rates(spec: str) -> dict[str, float]:
+    """解析 "logger=比例,logger=比例"，如 "cloud_console.request=0.01"。"""
+    rates = {}
+    for part in spec.split(","):
+        name, sep, rate = part.strip().partition("=")
+        if not sep or not name.strip():
+            continue
+        rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """
+    按 logger 名前缀采样（最长前缀生效，与 logger 层级一致），只作用于 WARNING 以下。
+    保留下来的记录带 sample_rate 字段，统计时按 1/sample_rate 还原数量。
+    """
+
+    def __init__(self, rates: dict[str, float]) -> None:
+        super().__init__()
+        self.rates = rates
+        self._resolved: dict[str, float | None] = {}
+
+    def _rate(self, name: str) -> float | None:
+        if name in self._resolved:
+            return self._resolved[name]
+        rate = None
+        probe = name
+        while probe:
+            if probe in self.rates:
+                rate = self.rates[probe]
+                break
+            probe = probe.rpartition(".")[0]
+        self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        if rate is None or rate >= 1.0:
+            return True
+        if rate <= 0.0 or random.random() >= rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """队列满时丢弃记录并计数，从不阻塞调用方。"""
+
+    def __init__(self, q: queue.Queue) -> None:
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 只在调用线程里做必须做的：合并 msg/args（args 可能是之后会变的对象）、把异常转成文本；
+        # JSON 序列化留给监听线程。不修改原记录，其他 handler 仍可见完整的 exc_info。
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_lock = threading.Lock()
+_listeners: list[tuple[logging.Logger, _NonBlockingQueueHandler, QueueListener]] = []
+
+
+def setup_json_logging(
+    level: int = logging.INFO,
+    logger_name: Optional[str] = None,
+    queue_size: int = 10000,
+    sample_rates: Optional[dict[str, float]] = None,
+    stream=None,
+) -> QueueListener:
+    """
+    配置 JSON 日志到 stdout（默认挂在 root logger）。重复调用会先停掉同一 logger 上之前的配置。
+    进程退出时自动 flush；应用关闭时也可显式调用 stop_json_logging()。
+    """
+    target = logging.getLogger(logger_name)
+    stop_json_logging(target)
+    q: queue.Queue = queue.Queue(maxsize=max(queue_size, 0))
+    queue_handler = _NonBlockingQueueHandler(q)
+    if sample_rates:
+        queue_handler.addFilter(SamplingFilter(sample_rates))
+    stream_handler = logging.StreamHandler(stream)
+    stream_handler.setFormatter(JSONFormatter())
+    listener = QueueListener(q, stream_handler, respect_handler_level=True)
+    listener.start()
+    target.addHandler(queue_handler)
+    target.setLevel(level)
+    with _lock:
+        _listeners.append((target, queue_handler, listener))
+    return listener
+
+
+def stop_json_logging(target: Optional[logging.Logger] = None) -> None:
+    """摘下 handler 并等待队列中已有的记录写完；target 为空时停掉全部。"""
+    with _lock:
+        matched = [entry for entry in _listeners if target is None or entry[0] is target]
+        for entry in matched:
+            _listeners.remove(entry)
+    for logger, queue_handler, listener in matched:
+        logger.removeHandler(queue_handler)
+        listener.stop()
+        for handler in listener.handlers:
+            handler.flush()
+
+
+def logging_stats() -> dict:
+    """队列积压与丢弃数，供健康检查展示。"""
+    with _lock:
+        entries = list(_listeners)
+    return {
+        "queued": sum(h.queue.qsize() for _, h, _ in entries),
+        "dropped": sum(h.dropped for _, h, _ in entries),
+    }
 
 
-def setup_json_logging(level: int = logging.INFO) -> None:
-    """配置 JSON 日志到 stdout。"""
-    handler = logging.StreamHandler()
-    handler.setFormatter(JSONFormatter())
-    root = logging.getLogger()
-    root.addHandler(handler)
-    root.setLevel(level)
+atexit.register(stop_json_logging)
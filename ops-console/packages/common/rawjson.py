@@ -0,0 +1,60 @@
+"""
+任务 payload / result 的 JSON 编码。
+
+payload、result 在接口中是嵌入的 JSON 值（对象、数组、字符串等），库里以 JSON 文本保存（tasks.payload_json / result_json）：
+- 写入时 encode_document 编码一次，值的类型原样保留：字符串 "123" 存为 JSON 字符串 "\"123\""，不会被当成已编码的文档；
+- 读出时 splice_object 把 JSON 文本列的内容原样拼进响应，不解析、不转义。
+安装了 orjson 时用它序列化（>= 3.9 时拼接用 orjson.Fragment），否则用标准库 json。
+"""
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 为可选依赖
+    orjson = None
+
+# orjson >= 3.9：Fragment 把已编码的 JSON 文本原样嵌入 orjson.dumps 的输出
+_Fragment = getattr(orjson, "Fragment", None)
+
+
+def dumps(obj: Any) -> bytes:
+    """紧凑 JSON（UTF-8 字节，非 ASCII 不转义）。"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            # orjson 不支持的类型（如超出 64 位的整数）退回标准库
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: str | bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def encode_document(value: Any) -> str:
+    """把请求中的 payload / result（已解析的 JSON 值）编码为入库的 JSON 文本，字符串编码为 JSON 字符串。"""
+    return dumps(value).decode("utf-8")
+
+
+def splice_object(obj: dict, raw_fields: dict[str, str]) -> bytes:
+    """
+    序列化 obj，并把 raw_fields 中的 JSON 文本作为字段值原样追加。
+    raw_fields 只能来自 JSON 文本列（经 encode_document 写入的 payload_json 等），调用方保证其为合法 JSON。
+    """
+    if _Fragment is not None:
+        try:
+            return orjson.dumps({**obj, **{key: _Fragment(raw) for key, raw in raw_fields.items()}})
+        except TypeError:
+            pass
+    head = dumps(obj)
+    parts = [head[:-1]]
+    sep = b"," if len(head) > 2 else b""
+    for key, raw in raw_fields.items():
+        parts.append(sep + dumps(key) + b":" + raw.encode("utf-8"))
+        sep = b","
+    parts.append(b"}")
+    return b"".join(parts)
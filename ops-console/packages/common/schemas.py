@@ -2,10 +2,13 @@
 Pydantic schemas for Node / Task / Events.
 """
 from datetime import datetime
-from typing import Optional
+from typing import Any, Optional
 
 from pydantic import BaseModel
 
+# 任务 payload / result：嵌入的 JSON 值，按值入库（字符串就是字符串，见 packages.common.rawjson）
+JSONValue = Any
+
 
 # --- Node Register ---
 class NodeRegisterRequest(BaseModel):
@@ -52,16 +55,117 @@ class NodeRead(NodeBase):
         from_attributes = True
 
 
+# --- Node List ---
+class NodeListItem(BaseModel):
+    node_id: str
+    name: str
+    status: str
+    version: Optional[str] = None
+    last_seen: Optional[str] = None  # ISO8601
+
+
+class NodeListResponse(BaseModel):
+    ok: bool = True
+    nodes: list[NodeListItem]
+
+
+# --- Node Tokens (admin) ---
+class NodeTokenCreateRequest(BaseModel):
+    project_key: str
+    # 为空时可用于项目内任意节点
+    node_id: Optional[str] = None
+    description: Optional[str] = None
+
+
+class NodeTokenCreateResponse(BaseModel):
+    ok: bool = True
+    token_id: str
+    # 明文 Token 只在签发 / 轮换时返回一次
+    token: str
+    project_key: str
+    node_id: Optional[str] = None
+
+
+class NodeTokenItem(BaseModel):
+    token_id: str
+    project_key: str
+    node_id: Optional[str] = None
+    description: Optional[str] = None
+    created_at: str  # ISO8601
+    rotated_at: Optional[str] = None
+    revoked_at: Optional[str] = None
+
+
+class NodeTokenListResponse(BaseModel):
+    ok: bool = True
+    tokens: list[NodeTokenItem]
+
+
+class NodeTokenRevokeResponse(BaseModel):
+    ok: bool = True
+    token_id: str
+
+
 # --- Task Create ---
 class TaskCreateRequest(BaseModel):
     node_id: str
     type: str = "PING"
-    payload: str = "{}"
+    payload: JSONValue = {}
+    # 越大越先被认领（-1000 ~ 1000），同优先级按创建顺序
+    priority: int = 0
+    # 在此时间之前不会被拉取；不带时区按 UTC
+    not_before: Optional[datetime] = None
+    # 幂等键（项目内唯一，最长 128 字符）：重试时带同一个键只返回首次创建的 task_id，不会重复创建
+    idempotency_key: Optional[str] = None
 
 
 class TaskCreateResponse(BaseModel):
     ok: bool = True
     task_id: str
+    # 命中幂等键：任务已由之前的请求创建，本次未写入
+    duplicate: bool = False
+
+
+# --- Task Batch Create（批量下发） ---
+class TaskBatchCreateRequest(BaseModel):
+    node_ids: list[str] = []
+    # 项目级选择器：为 token 所属项目的全部节点下发，可用 node_status 限定节点状态
+    all_nodes: bool = False
+    node_status: Optional[str] = None
+    type: str = "PING"
+    payload: JSONValue = {}
+    priority: int = 0
+    not_before: Optional[datetime] = None
+
+
+class TaskBatchCreateItem(BaseModel):
+    node_id: str
+    task_id: str
+
+
+class TaskBatchCreateResponse(BaseModel):
+    ok: bool = True
+    tasks: list[TaskBatchCreateItem]
+
+
+# --- Task List（管理端任务列表，键集分页） ---
+class TaskListItem(BaseModel):
+    task_id: str
+    node_id: str
+    type: str
+    state: str
+    priority: int = 0
+    not_before: Optional[str] = None
+    attempts: int = 0
+    created_at: str
+    updated_at: str
+
+
+class TaskListResponse(BaseModel):
+    ok: bool = True
+    tasks: list[TaskListItem]
+    # 下一页游标，没有更多数据时为 None
+    next_cursor: Optional[str] = None
 
 
 # --- Task Pull ---
@@ -69,8 +173,12 @@ class TaskPullItem(BaseModel):
     task_id: str
     node_id: str
     type: str
-    payload: str
+    payload: JSONValue
+    priority: int = 0
     state: str
+    # 第几次认领（从 1 开始）与租约到期时间，到期前需 POST /api/tasks/renew 续租或回传
+    attempt: int = 1
+    lease_expires_at: Optional[str] = None
     created_at: str
     updated_at: str
 
@@ -82,13 +190,79 @@ class TaskPullResponse(BaseModel):
 # --- Task Report ---
 class TaskReportRequest(BaseModel):
     status: str  # SUCCEEDED / FAILED
-    result: str = "{}"
+    result: JSONValue = {}
+    # 拉取结果中的 attempt：与任务当前认领次数不一致（租约过期后已被重新认领）时拒绝；旧版 Agent 不带则只校验状态
+    attempt: Optional[int] = None
 
 
 class TaskReportResponse(BaseModel):
     ok: bool = True
 
 
+# --- Task Batch Report（批量回传） ---
+class TaskReportBatchItem(BaseModel):
+    task_id: str
+    status: str  # SUCCEEDED / FAILED
+    result: JSONValue = {}
+    attempt: Optional[int] = None
+
+
+class TaskReportBatchRequest(BaseModel):
+    items: list[TaskReportBatchItem]
+
+
+class TaskReportBatchResponse(BaseModel):
+    ok: bool = True
+    accepted: list[str] = []
+    # 不存在、不属于本项目、status 非法、任务不在 RUNNING 或 attempt 已过期的 task_id
+    rejected: list[str] = []
+
+
+# --- Task Lease Renew（租约续期） ---
+class TaskLeaseRenewRequest(BaseModel):
+    task_ids: list[str]
+
+
+class TaskLeaseRenewResponse(BaseModel):
+    ok: bool = True
+    lease_expires_at: str
+    renewed: list[str] = []
+    # 不在 RUNNING（已回传、已被回收重新入队或置为 FAILED）、不存在或无权限的 task_id
+    lost: list[str] = []
+
+
+# --- Task Output（运行中流式输出） ---
+class TaskOutputRequest(BaseModel):
+    # 片段序号，从 0 开始递增；重传同一 seq 会被去重
+    seq: int
+    data: str
+
+
+class TaskOutputResponse(BaseModel):
+    ok: bool = True
+    # 本片段实际保存的字节数（达到单任务上限时被截断）
+    accepted_bytes: int
+    # 已达到单任务输出上限，后续片段不再保存
+    truncated: bool = False
+    duplicate: bool = False
+
+
+class TaskOutputChunkItem(BaseModel):
+    seq: int
+    data: str
+
+
+class TaskOutputTailResponse(BaseModel):
+    ok: bool = True
+    state: str
+    chunks: list[TaskOutputChunkItem]
+    # 下次请求的 after_seq
+    last_seq: int
+    output_bytes: int
+    # 任务已结束（SUCCEEDED / FAILED），不会再有新片段
+    done: bool
+
+
 # --- Task (generic) ---
 class TaskBase(BaseModel):
     node_id: str
@@ -0,0 +1,80 @@
+"""
+异步 HTTP 客户端（asyncio 运行时使用）：httpx.AsyncClient 连接池，
+退避、Retry-After、重试预算以及 retry=True 才重试连接错误与 5xx 的策略都和 http_client 一致。
+"""
+import asyncio
+import time
+
+import httpx
+
+from .config import config
+from .http_client import (
+    MAX_RETRIES,
+    POOL_MAXSIZE,
+    RETRY_STATUS,
+    TIMEOUT_SEC,
+    HttpStats,
+    RetryBudget,
+    backoff_delay,
+    endpoint_key,
+    retry_after_sec,
+    retryable_status,
+)
+
+
+class AsyncHttpClient:
+    """自动加 Authorization 的异步客户端，单个事件循环内共享。"""
+
+    def __init__(self, max_connections: int = POOL_MAXSIZE) -> None:
+        self._client = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {config.NODE_TOKEN}"},
+            timeout=TIMEOUT_SEC,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self._budget = RetryBudget()
+        self._stats = HttpStats()
+
+    async def request(self, method: str, url: str, retry: bool = False, **kwargs) -> httpx.Response:
+        endpoint = endpoint_key(method, url)
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                r = await self._client.request(method, url, **kwargs)
+            except httpx.HTTPError:
+                self._stats.record(endpoint, time.monotonic() - started, error=True, retry=attempt > 0)
+                if not retry or attempt + 1 >= MAX_RETRIES or not self._budget.withdraw():
+                    raise
+                delay = backoff_delay(attempt)
+            else:
+                self._stats.record(endpoint, time.monotonic() - started, error=r.status_code >= 500, retry=attempt > 0)
+                r.retried = attempt > 0
+                if r.status_code not in RETRY_STATUS:
+                    self._budget.deposit()
+                    return r
+                if not retryable_status(r.status_code, retry):
+                    return r
+                if attempt + 1 >= MAX_RETRIES or not self._budget.withdraw():
+                    return r
+                delay = None
+                if r.status_code in (429, 503):
+                    delay = retry_after_sec(r.headers.get("Retry-After"))
+                if delay is None:
+                    delay = backoff_delay(attempt)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def get(self, url: str, retry: bool = False, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, retry=retry, **kwargs)
+
+    async def post(self, url: str, json: dict | None = None, retry: bool = False, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, retry=retry, json=json or {}, **kwargs)
+
+    def stats(self) -> dict:
+        return {
+            "retry_budget": {"tokens": round(self._budget.tokens, 1), "exhausted_total": self._budget.exhausted_total},
+            "endpoints": self._stats.snapshot(),
+        }
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
@@ -0,0 +1,134 @@
+"""
+asyncio 运行时的任务输出上传：协议、切片、失败重传与积压上限同 output_stream.OutputStreamer，
+上传走 AsyncHttpClient，write() 为协程；每个流自带一个 flusher 协程，定时上传积压超过
+TASK_OUTPUT_FLUSH_SEC 的输出，不占用线程。
+"""
+import asyncio
+import time
+
+from .async_http_client import AsyncHttpClient
+from .config import config
+from .output_stream import MAX_BACKLOG_CHUNKS, split_utf8
+
+
+class AsyncOutputStreamer:
+    """单个任务的输出上传器，只在创建它的事件循环内使用。"""
+
+    def __init__(self, http: AsyncHttpClient, task_id: str) -> None:
+        self.task_id = task_id
+        self._http = http
+        self._url = f"{config.CONSOLE_BASE_URL}/api/tasks/{task_id}/output"
+        self._send_lock = asyncio.Lock()
+        self._pending: list[str] = []
+        self._pending_bytes = 0
+        self._first_pending_at = 0.0
+        self._seq = 0
+        self._stopped = False
+        self._closing = asyncio.Event()
+        self._flusher: asyncio.Task | None = None
+        self.sent_bytes = 0
+        self.dropped_bytes = 0
+
+    def start(self) -> None:
+        self._flusher = asyncio.create_task(self._run())
+
+    async def write(self, text: str) -> None:
+        """追加输出；积压满一个片段时等待上传完成（背压）。"""
+        if not text:
+            return
+        n = len(text.encode("utf-8"))
+        if self._stopped or self._pending_bytes >= config.TASK_OUTPUT_CHUNK_BYTES * MAX_BACKLOG_CHUNKS:
+            self.dropped_bytes += n
+            return
+        if not self._pending:
+            self._first_pending_at = time.monotonic()
+        self._pending.append(text)
+        self._pending_bytes += n
+        if self._pending_bytes >= config.TASK_OUTPUT_CHUNK_BYTES:
+            await self.flush()
+
+    def due(self) -> bool:
+        return bool(self._pending) and time.monotonic() - self._first_pending_at >= config.TASK_OUTPUT_FLUSH_SEC
+
+    async def flush(self) -> bool:
+        """上传积压的输出；某个片段上传失败时，它和之后的数据放回积压，返回 False。"""
+        async with self._send_lock:
+            if not self._pending or self._stopped:
+                return True
+            data = "".join(self._pending)
+            self._pending.clear()
+            self._pending_bytes = 0
+            chunks = split_utf8(data, config.TASK_OUTPUT_CHUNK_BYTES)
+            for i, chunk in enumerate(chunks):
+                sent = await self._send(chunk)
+                if sent is None:
+                    self._requeue("".join(chunks[i:]))
+                    return False
+                if not sent:
+                    break
+            return True
+
+    def _requeue(self, data: str) -> None:
+        n = len(data.encode("utf-8"))
+        if self._stopped:
+            self.dropped_bytes += n
+            return
+        if not self._pending:
+            self._first_pending_at = time.monotonic()
+        self._pending.insert(0, data)
+        self._pending_bytes += n
+
+    async def _send(self, chunk: str) -> bool | None:
+        """同 OutputStreamer._send：True 已上传，False 停止上传，None 失败（seq 不前进）。"""
+        seq = self._seq
+        try:
+            r = await self._http.post(self._url, json={"seq": seq, "data": chunk}, retry=True)
+        except Exception as e:
+            print(f"[output] {self.task_id} seq={seq} error: {e}")
+            return None
+        if r.status_code in (404, 409):
+            self._stop()
+            return False
+        if r.status_code != 200:
+            print(f"[output] {self.task_id} seq={seq} http {r.status_code}")
+            return None
+        self._seq += 1
+        data = r.json()
+        self.sent_bytes += int(data.get("accepted_bytes") or 0)
+        if data.get("truncated"):
+            print(f"[output] {self.task_id} output limit reached, further output dropped")
+            self._stop()
+            return False
+        return True
+
+    def _stop(self) -> None:
+        self._stopped = True
+        self.dropped_bytes += self._pending_bytes
+        self._pending.clear()
+        self._pending_bytes = 0
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._closing.wait(), min(config.TASK_OUTPUT_FLUSH_SEC, 1.0))
+                return
+            except asyncio.TimeoutError:
+                pass
+            if self.due():
+                await self.flush()
+
+    async def close(self) -> None:
+        """任务结束：等 flusher 退出（不打断进行中的上传）后上传剩余输出，应在回传结果之前调用。"""
+        self._closing.set()
+        if self._flusher is not None:
+            await self._flusher
+        if not await self.flush():
+            print(f"[output] {self.task_id} {self._pending_bytes} byte(s) not uploaded")
+            self._stop()
+
+
+def open_async_stream(http: AsyncHttpClient, task_id: str) -> AsyncOutputStreamer:
+    """为任务创建输出上传器并启动它的 flusher 协程。"""
+    s = AsyncOutputStreamer(http, task_id)
+    s.start()
+    return s
@@ -0,0 +1,298 @@
+"""
+asyncio 运行时（AGENT_RUNTIME=asyncio）：心跳、拉取、执行、回传均为同一事件循环上的协程，
+HTTP 走 httpx.AsyncClient 连接池。在途任务数上限为 ASYNC_MAX_INFLIGHT（协程开销很小，可远大于
+线程运行时的 TASK_WORKERS）；TASK_TYPE_CONCURRENCY 按类型限制并发。
+行为与线程运行时保持一致：长轮询拉取、租约续期、结果合并回传（不支持批量接口时退回逐条）、信号优雅退出。
+"""
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+
+from .async_http_client import AsyncHttpClient
+from .async_output_stream import open_async_stream
+from .config import config
+from .http_client import TIMEOUT_SEC
+from .lease_renewer import RENEW_CHUNK, renew_url
+from .registrar import heartbeat_body, register_body
+from .reporter import report_item
+from .task_executor import STREAMING_TYPES, execute_async
+from .worker_pool import parse_type_limits
+
+
+class AsyncAgent:
+    """单事件循环内的 Agent。"""
+
+    def __init__(self) -> None:
+        self._max_inflight = max(1, config.ASYNC_MAX_INFLIGHT)
+        self._http = AsyncHttpClient(max_connections=min(self._max_inflight, 32) + 2)
+        self._stop = asyncio.Event()
+        self._inflight: set[asyncio.Task] = set()
+        self._slot_freed = asyncio.Event()
+        self._type_sems = {t: asyncio.Semaphore(n) for t, n in parse_type_limits(config.TASK_TYPE_CONCURRENCY).items()}
+        self._results: asyncio.Queue = asyncio.Queue()
+        # 需要续租的在途任务 id，结果入回传队列后移除
+        self._leased: set[str] = set()
+        self._batch_supported = True
+
+    # ---------- 注册 / 心跳 ----------
+
+    async def _post_ok(self, url: str, body: dict) -> bool:
+        """注册 / 心跳：幂等，连接错误与 5xx 可重试。"""
+        r = await self._http.post(url, json=body, retry=True)
+        if r.status_code != 200:
+            return False
+        return r.json().get("ok") is True
+
+    async def _register(self) -> bool:
+        return await self._post_ok(f"{config.CONSOLE_BASE_URL}/api/nodes/register", register_body())
+
+    async def _heartbeat_loop(self) -> None:
+        """心跳循环；每 HTTP_STATS_INTERVAL_SEC 输出一次 HTTP 统计。"""
+        url = f"{config.CONSOLE_BASE_URL}/api/nodes/{config.NODE_ID}/heartbeat"
+        last_stats = time.monotonic()
+        while True:
+            await asyncio.sleep(config.HEARTBEAT_INTERVAL_SEC)
+            try:
+                if await self._post_ok(url, heartbeat_body()):
+                    print("[heartbeat] ok")
+                else:
+                    print("[heartbeat] fail")
+            except Exception as e:
+                print(f"[heartbeat] error: {e}")
+            if config.HTTP_STATS_INTERVAL_SEC > 0 and time.monotonic() - last_stats >= config.HTTP_STATS_INTERVAL_SEC:
+                last_stats = time.monotonic()
+                print(f"[http] {json.dumps(self._http.stats(), ensure_ascii=False)}")
+
+    # ---------- 拉取 / 执行 ----------
+
+    async def _pull(self, limit: int) -> list[dict]:
+        url = f"{config.CONSOLE_BASE_URL}/api/nodes/{config.NODE_ID}/tasks"
+        params = {"state": "CREATED", "limit": limit}
+        kwargs = {}
+        if config.TASK_LONG_POLL_SEC > 0:
+            params["wait"] = config.TASK_LONG_POLL_SEC
+            kwargs["timeout"] = config.TASK_LONG_POLL_SEC + TIMEOUT_SEC
+        r = await self._http.get(url, params=params, **kwargs)
+        if r.status_code != 200:
+            return []
+        return r.json().get("tasks") or []
+
+    async def _wait(self, event: asyncio.Event, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _poll_loop(self) -> None:
+        """拉取任务并创建执行协程；在途数达到上限时暂停拉取，每次最多拉取空闲槽位数。"""
+        long_poll = config.TASK_LONG_POLL_SEC > 0
+        while not self._stop.is_set():
+            if not long_poll and await self._wait(self._stop, config.TASK_POLL_INTERVAL_SEC):
+                break
+            free = self._max_inflight - len(self._inflight)
+            if free <= 0:
+                self._slot_freed.clear()
+                await self._wait(self._slot_freed, 1)
+                continue
+            started = time.monotonic()
+            tasks = []
+            pull = asyncio.ensure_future(self._pull(min(free, config.TASK_PULL_BATCH)))
+            stop = asyncio.ensure_future(self._stop.wait())
+            try:
+                await asyncio.wait({pull, stop}, return_when=asyncio.FIRST_COMPLETED)
+                if not pull.done():
+                    # 退出时不必等长轮询返回；未被认领的任务留在 Console
+                    pull.cancel()
+                    break
+                tasks = pull.result()
+                for task in tasks:
+                    if task.get("task_id"):
+                        self._leased.add(task["task_id"])
+                        t = asyncio.create_task(self._run(task))
+                        self._inflight.add(t)
+                        t.add_done_callback(self._on_done)
+            except Exception as e:
+                print(f"[pull] error: {e}")
+            finally:
+                stop.cancel()
+            # 长轮询立即返回空结果（出错或旧版 Console 不支持 wait）时退回定时轮询，避免空转
+            if long_poll and not tasks and time.monotonic() - started < 1:
+                await self._wait(self._stop, config.TASK_POLL_INTERVAL_SEC)
+
+    def _on_done(self, t: asyncio.Task) -> None:
+        self._inflight.discard(t)
+        self._slot_freed.set()
+
+    async def _run(self, task: dict) -> None:
+        t = task.get("type", "")
+        sem = self._type_sems.get(t)
+        output = None
+        if config.TASK_OUTPUT_STREAM and t in STREAMING_TYPES:
+            output = open_async_stream(self._http, task["task_id"])
+        try:
+            if sem is None:
+                status, result = await execute_async(task, output)
+            else:
+                async with sem:
+                    status, result = await execute_async(task, output)
+        except Exception as e:
+            status, result = "FAILED", {"error": str(e)}
+        finally:
+            # 传完剩余输出后再回传结果：Console 只接受运行中任务的输出
+            if output is not None:
+                await output.close()
+        self._results.put_nowait(report_item(task["task_id"], status, result, task.get("attempt")))
+        self._leased.discard(task["task_id"])
+
+    # ---------- 租约续期 ----------
+
+    async def _renew_loop(self) -> None:
+        """每 TASK_LEASE_RENEW_SEC 为在途任务续租；Console 判定为 lost 的任务只记录日志，不再续租。"""
+        while True:
+            await asyncio.sleep(config.TASK_LEASE_RENEW_SEC)
+            task_ids = sorted(self._leased)
+            for i in range(0, len(task_ids), RENEW_CHUNK):
+                try:
+                    r = await self._http.post(renew_url(), json={"task_ids": task_ids[i:i + RENEW_CHUNK]}, retry=True)
+                except Exception as e:
+                    print(f"[lease] renew error: {e}")
+                    break
+                if r.status_code == 404:
+                    print("[lease] console has no renew endpoint, stop renewing")
+                    return
+                if r.status_code != 200:
+                    print(f"[lease] renew error: HTTP {r.status_code}")
+                    break
+                for task_id in r.json().get("lost") or []:
+                    print(f"[lease] {task_id} lost (requeued or finished on console)")
+                    self._leased.discard(task_id)
+
+    # ---------- 回传 ----------
+
+    async def _report_loop(self) -> None:
+        """
+        结果合并回传：自第一条结果起等待 REPORT_BATCH_WINDOW_SEC 或攒满 REPORT_BATCH_MAX 条后发送。
+        队列中的 None 为结束标记（所有执行协程结束后才放入），收到后发送当前批次并退出。
+        """
+        max_items = max(1, config.REPORT_BATCH_MAX)
+        while True:
+            item = await self._results.get()
+            if item is None:
+                return
+            batch = [item]
+            closed = False
+            deadline = time.monotonic() + config.REPORT_BATCH_WINDOW_SEC
+            while len(batch) < max_items:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    nxt = await asyncio.wait_for(self._results.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if nxt is None:
+                    closed = True
+                    break
+                batch.append(nxt)
+            await self._send(batch)
+            if closed:
+                return
+
+    async def _report_batch(self, batch: list[dict]) -> set[str] | None:
+        """同 reporter.report_batch：不重试连接错误与 5xx，出错时抛出，由 _send 逐条补发。"""
+        r = await self._http.post(f"{config.CONSOLE_BASE_URL}/api/tasks/report_batch", json={"items": batch})
+        if r.status_code == 404:
+            return None
+        if r.status_code >= 500:
+            raise RuntimeError(f"HTTP {r.status_code}")
+        if r.status_code != 200:
+            return set()
+        return set(r.json().get("accepted") or [])
+
+    async def _report(self, item: dict, resend: bool) -> bool:
+        """同 reporter.report：重试后（或批量回传结果未知时）收到的 409 视为先前的请求已生效。"""
+        url = f"{config.CONSOLE_BASE_URL}/api/tasks/{item['task_id']}/report"
+        body = {k: v for k, v in item.items() if k != "task_id"}
+        r = await self._http.post(url, json=body, retry=True)
+        if r.status_code == 409 and (resend or r.retried):
+            return True
+        if r.status_code != 200:
+            return False
+        return r.json().get("ok") is True
+
+    async def _send(self, batch: list[dict]) -> None:
+        accepted: set[str] | None = None
+        resend = False
+        if self._batch_supported:
+            try:
+                accepted = await self._report_batch(batch)
+            except Exception as e:
+                print(f"[report] batch error: {e}, resend one by one")
+                resend = True
+            if accepted is None and not resend:
+                print("[report] console has no batch endpoint, fall back to single report")
+                self._batch_supported = False
+        if accepted is None:
+            accepted = set()
+            for it in batch:
+                try:
+                    if await self._report(it, resend):
+                        accepted.add(it["task_id"])
+                except Exception as e:
+                    print(f"[report] {it['task_id']} error: {e}")
+        for it in batch:
+            if it["task_id"] in accepted:
+                print(f"[task] {it['task_id']} {it['status']}")
+            else:
+                print(f"[task] {it['task_id']} report fail")
+
+    # ---------- 生命周期 ----------
+
+    def _on_signal(self) -> None:
+        if self._stop.is_set():
+            print("\n[agent] forced exit")
+            os._exit(1)
+        print("\n[agent] shutdown requested, finishing in-flight tasks (signal again to force)")
+        self._stop.set()
+
+    async def run(self) -> None:
+        print(f"[agent] node_id={config.NODE_ID} console={config.CONSOLE_BASE_URL} runtime=asyncio")
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._on_signal)
+
+        try:
+            ok = await self._register()
+        except Exception as e:
+            print(f"[agent] register error: {e}")
+            ok = False
+        if not ok:
+            print("[agent] register failed")
+            await self._http.aclose()
+            sys.exit(1)
+        print("[agent] register ok")
+
+        hb = asyncio.create_task(self._heartbeat_loop())
+        reporter = asyncio.create_task(self._report_loop())
+        renewer = asyncio.create_task(self._renew_loop()) if config.TASK_LEASE_RENEW_SEC > 0 else None
+        try:
+            await self._poll_loop()
+        finally:
+            print("[agent] draining in-flight tasks")
+            if self._inflight:
+                await asyncio.gather(*self._inflight, return_exceptions=True)
+            self._results.put_nowait(None)
+            await reporter
+            hb.cancel()
+            if renewer is not None:
+                renewer.cancel()
+            await self._http.aclose()
+        print("[agent] shutdown")
+
+
+def main():
+    asyncio.run(AsyncAgent().run())
@@ -29,6 +29,9 @@ def _validate():
     except (TypeError, ValueError):
         print("[config] HEARTBEAT_INTERVAL_SEC must be integer")
         sys.exit(1)
+    if (os.getenv("AGENT_RUNTIME") or "threaded").strip().lower() not in ("threaded", "asyncio"):
+        print("[config] AGENT_RUNTIME must be threaded or asyncio")
+        sys.exit(1)
 
 
 class Config:
@@ -41,7 +44,29 @@ class Config:
     HEARTBEAT_INTERVAL_SEC: int = int(os.getenv("HEARTBEAT_INTERVAL_SEC", "10") or "10")
 
     NODE_NAME: str = os.getenv("NODE_NAME", "Node")
+    # 运行时：threaded（默认，线程 + requests）或 asyncio（单事件循环 + httpx，需安装 httpx）
+    AGENT_RUNTIME: str = (os.getenv("AGENT_RUNTIME", "threaded") or "threaded").strip().lower()
+    # asyncio 运行时的在途任务上限（含按类型排队中的任务）
+    ASYNC_MAX_INFLIGHT: int = int(os.getenv("ASYNC_MAX_INFLIGHT", "64") or "64")
     TASK_POLL_INTERVAL_SEC: int = int(os.getenv("TASK_POLL_INTERVAL_SEC", "5") or "5")
+    # 长轮询等待秒数：>0 时连续长轮询拉取任务，0 则退回按 TASK_POLL_INTERVAL_SEC 定时轮询
+    TASK_LONG_POLL_SEC: int = int(os.getenv("TASK_LONG_POLL_SEC", "25") or "25")
+    # 单次拉取最多认领的任务数
+    TASK_PULL_BATCH: int = int(os.getenv("TASK_PULL_BATCH", "10") or "10")
+    # HTTP 连接复用 / RTT 统计输出间隔（秒），0 关闭
+    HTTP_STATS_INTERVAL_SEC: int = int(os.getenv("HTTP_STATS_INTERVAL_SEC", "300") or "300")
+    # 执行池：并发工作线程数；按类型并发上限，如 "PING=8,ECHO=2"
+    TASK_WORKERS: int = int(os.getenv("TASK_WORKERS", "4") or "4")
+    TASK_TYPE_CONCURRENCY: str = os.getenv("TASK_TYPE_CONCURRENCY", "")
+    # 任务输出流式上传（ECHO 等类型运行中输出）：开关、单片段字节数、积压上传间隔（秒）
+    TASK_OUTPUT_STREAM: bool = (os.getenv("TASK_OUTPUT_STREAM", "true") or "true").strip().lower() in ("1", "true", "yes")
+    TASK_OUTPUT_CHUNK_BYTES: int = int(os.getenv("TASK_OUTPUT_CHUNK_BYTES", "16384") or "16384")
+    TASK_OUTPUT_FLUSH_SEC: float = float(os.getenv("TASK_OUTPUT_FLUSH_SEC", "1.0") or "1.0")
+    # 任务租约续期间隔（秒），需小于 Console 的 TASK_LEASE_SEC；0 关闭续租
+    TASK_LEASE_RENEW_SEC: float = float(os.getenv("TASK_LEASE_RENEW_SEC", "60") or "60")
+    # 结果合并回传：窗口秒数与单批最大条数
+    REPORT_BATCH_WINDOW_SEC: float = float(os.getenv("REPORT_BATCH_WINDOW_SEC", "0.5") or "0.5")
+    REPORT_BATCH_MAX: int = int(os.getenv("REPORT_BATCH_MAX", "50") or "50")
 
 
 _validate()
@@ -1,37 +1,201 @@
 """
 HTTP 客户端：封装 GET/POST，自动加 Authorization，超时与重试。
+
+- 共享 requests.Session（keep-alive 连接池），心跳 / 拉取 / 回传复用 TCP+TLS 连接；
+- 重试：指数退避 + 全抖动，429/503 优先遵循 Retry-After。幂等调用（retry=True：注册、心跳、续租、
+  按 seq 去重的输出上传、重试后把 409 视为成功的单条回传）重试连接错误与 429/502/503/504；
+  其余调用（认领任务的拉取、批量回传）只重试 429，连接错误与 5xx 时请求可能已在 Console 生效，交给调用方处理；
+- 重试预算：每次重试消耗 1 个令牌，成功请求返还 RETRY_BUDGET_RATIO 个，
+  Console 整体故障时预算很快耗尽、不再重试，避免全网节点把故障放大；
+- stats()：连接复用情况与各接口 RTT。
 """
+import random
+import re
+import threading
 import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
 
 import requests
+from requests.adapters import HTTPAdapter
 
 from .config import config
 
 MAX_RETRIES = 3
 TIMEOUT_SEC = 15
+BACKOFF_BASE_SEC = 0.5
+BACKOFF_MAX_SEC = 30.0
+RETRY_AFTER_MAX_SEC = 60.0
+RETRY_STATUS = frozenset({429, 502, 503, 504})
+RETRY_BUDGET_MAX = 10.0
+RETRY_BUDGET_RATIO = 0.1
+# 同时在途的请求：每个工作线程的输出上传，加上心跳、拉取、回传、续租各一个
+POOL_MAXSIZE = max(10, config.TASK_WORKERS + 4)
+
+_TASK_ID_RE = re.compile(r"/task-[0-9a-f]+")
 
 
 def _headers():
     return {"Authorization": f"Bearer {config.NODE_TOKEN}", "Content-Type": "application/json"}
 
 
-def _request(method: str, url: str, **kwargs) -> requests.Response:
+def backoff_delay(attempt: int) -> float:
+    """第 attempt 次（从 0 开始）重试前的等待：全抖动指数退避。"""
+    return random.uniform(0, min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * (2 ** attempt)))
+
+
+def retryable_status(status_code: int, retry: bool) -> bool:
+    """该状态码是否应重试：429 表示请求被拒绝、未被处理，总是可重试；502/503/504 仅限幂等调用。"""
+    return status_code == 429 or (retry and status_code in RETRY_STATUS)
+
+
+def retry_after_sec(value: str | None) -> float | None:
+    """解析 Retry-After（秒数或 HTTP 日期），无法解析返回 None。"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return min(float(value), RETRY_AFTER_MAX_SEC)
+    try:
+        delay = parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
+    return min(max(delay, 0.0), RETRY_AFTER_MAX_SEC)
+
+
+def endpoint_key(method: str, url: str) -> str:
+    """把 URL 归一成接口名，如 "POST /api/tasks/{task_id}/report"。"""
+    path = urlsplit(url).path.replace(f"/{config.NODE_ID}/", "/{node_id}/")
+    return f"{method} {_TASK_ID_RE.sub('/{task_id}', path)}"
+
+
+class RetryBudget:
+    """令牌桶式重试预算，线程安全。"""
+
+    def __init__(self, max_tokens: float = RETRY_BUDGET_MAX, ratio: float = RETRY_BUDGET_RATIO) -> None:
+        self._lock = threading.Lock()
+        self._max = max_tokens
+        self._ratio = ratio
+        self.tokens = max_tokens
+        self.exhausted_total = 0
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            self.exhausted_total += 1
+            return False
+
+    def deposit(self) -> None:
+        with self._lock:
+            self.tokens = min(self._max, self.tokens + self._ratio)
+
+
+class HttpStats:
+    """各接口请求数、错误数、重试数与 RTT（平均 / EWMA / 最大，毫秒）。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._endpoints: dict[str, dict] = {}
+
+    def record(self, endpoint: str, rtt_sec: float, error: bool = False, retry: bool = False) -> None:
+        ms = rtt_sec * 1000
+        with self._lock:
+            e = self._endpoints.setdefault(
+                endpoint, {"count": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "ewma_ms": ms, "max_ms": 0.0}
+            )
+            e["count"] += 1
+            e["errors"] += int(error)
+            e["retries"] += int(retry)
+            e["total_ms"] += ms
+            e["ewma_ms"] = 0.8 * e["ewma_ms"] + 0.2 * ms
+            e["max_ms"] = max(e["max_ms"], ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "count": e["count"],
+                    "errors": e["errors"],
+                    "retries": e["retries"],
+                    "avg_ms": round(e["total_ms"] / e["count"], 1),
+                    "ewma_ms": round(e["ewma_ms"], 1),
+                    "max_ms": round(e["max_ms"], 1),
+                }
+                for name, e in self._endpoints.items()
+            }
+
+
+_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE)
+_session = requests.Session()
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
+_budget = RetryBudget()
+_stats = HttpStats()
+
+
+def _request(method: str, url: str, retry: bool = False, **kwargs) -> requests.Response:
+    """
+    发送请求。retry=False 时只重试 429，连接错误抛出、5xx 直接返回。
+    返回的响应带 retried 属性：是否经过重试（重试后的 409 可能是首次请求已经生效）。
+    """
     kwargs.setdefault("headers", {}).update(_headers())
     kwargs.setdefault("timeout", TIMEOUT_SEC)
-    for attempt in range(MAX_RETRIES):
+    endpoint = endpoint_key(method, url)
+    attempt = 0
+    while True:
+        started = time.monotonic()
         try:
-            r = requests.request(method, url, **kwargs)
-            return r
-        except (requests.RequestException, OSError) as e:
-            if attempt == MAX_RETRIES - 1:
+            r = _session.request(method, url, **kwargs)
+        except (requests.RequestException, OSError):
+            _stats.record(endpoint, time.monotonic() - started, error=True, retry=attempt > 0)
+            if not retry or attempt + 1 >= MAX_RETRIES or not _budget.withdraw():
                 raise
-            time.sleep(1)
-    raise RuntimeError("unreachable")
+            delay = backoff_delay(attempt)
+        else:
+            _stats.record(endpoint, time.monotonic() - started, error=r.status_code >= 500, retry=attempt > 0)
+            r.retried = attempt > 0
+            if r.status_code not in RETRY_STATUS:
+                _budget.deposit()
+                return r
+            if not retryable_status(r.status_code, retry):
+                return r
+            if attempt + 1 >= MAX_RETRIES or not _budget.withdraw():
+                return r
+            delay = None
+            if r.status_code in (429, 503):
+                delay = retry_after_sec(r.headers.get("Retry-After"))
+            if delay is None:
+                delay = backoff_delay(attempt)
+            r.close()
+        attempt += 1
+        time.sleep(delay)
+
+
+def get(url: str, retry: bool = False, **kwargs) -> requests.Response:
+    return _request("GET", url, retry=retry, **kwargs)
 
 
-def get(url: str, **kwargs) -> requests.Response:
-    return _request("GET", url, **kwargs)
+def post(url: str, json: dict | None = None, retry: bool = False, **kwargs) -> requests.Response:
+    return _request("POST", url, retry=retry, json=json or {}, **kwargs)
 
 
-def post(url: str, json: dict | None = None, **kwargs) -> requests.Response:
-    return _request("POST", url, json=json or {}, **kwargs)
+def stats() -> dict:
+    """连接复用统计（新建连接数 / 请求数）、重试预算与各接口 RTT。"""
+    new_connections = requests_sent = 0
+    pools = _adapter.poolmanager.pools
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool is not None:
+            new_connections += pool.num_connections
+            requests_sent += pool.num_requests
+    return {
+        "connections": {
+            "requests": requests_sent,
+            "new": new_connections,
+            "reused": max(0, requests_sent - new_connections),
+        },
+        "retry_budget": {"tokens": round(_budget.tokens, 1), "exhausted_total": _budget.exhausted_total},
+        "endpoints": _stats.snapshot(),
+    }
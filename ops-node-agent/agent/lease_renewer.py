@@ -0,0 +1,74 @@
+"""
+任务租约续期：Console 认领任务时给出租约（lease_expires_at），到期未续租或回传的任务会被重新入队。
+在途任务（含按类型排队中的）每 TASK_LEASE_RENEW_SEC 秒经 POST /api/tasks/renew 批量续租一次；
+Console 返回 lost 的任务已被回收或已结束，只记录日志（执行中的任务不中断，结果照常回传）。
+Console 不支持该接口（404）时停止续租。
+"""
+import threading
+
+from .config import config
+from .http_client import post
+
+# 单次续租请求最多携带的任务数（Console 上限 1000）
+RENEW_CHUNK = 500
+
+
+def renew_url() -> str:
+    return f"{config.CONSOLE_BASE_URL}/api/tasks/renew"
+
+
+def renew(task_ids: list[str]) -> list[str] | None:
+    """续租，返回 Console 判定为 lost 的 task_id；Console 不支持续租接口时返回 None。"""
+    r = post(renew_url(), json={"task_ids": task_ids}, retry=True)
+    if r.status_code == 404:
+        return None
+    if r.status_code != 200:
+        raise RuntimeError(f"HTTP {r.status_code}")
+    return r.json().get("lost") or []
+
+
+class LeaseRenewer:
+    """线程运行时的续租线程：track() 登记在途任务，release() 在结果交给回传队列后移除。"""
+
+    def __init__(self, interval_sec: float) -> None:
+        self._interval_sec = interval_sec
+        self._lock = threading.Lock()
+        self._task_ids: set[str] = set()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def track(self, task_id: str) -> None:
+        with self._lock:
+            self._task_ids.add(task_id)
+
+    def release(self, task_id: str) -> None:
+        with self._lock:
+            self._task_ids.discard(task_id)
+
+    def start(self) -> None:
+        """TASK_LEASE_RENEW_SEC <= 0 时不启动（只登记，不续租）。"""
+        if self._interval_sec > 0:
+            self._thread = threading.Thread(target=self._run, name="lease-renewer", daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval_sec):
+            with self._lock:
+                task_ids = sorted(self._task_ids)
+            for i in range(0, len(task_ids), RENEW_CHUNK):
+                try:
+                    lost = renew(task_ids[i:i + RENEW_CHUNK])
+                except Exception as e:
+                    print(f"[lease] renew error: {e}")
+                    break
+                if lost is None:
+                    print("[lease] console has no renew endpoint, stop renewing")
+                    return
+                for task_id in lost:
+                    print(f"[lease] {task_id} lost (requeued or finished on console)")
+                    self.release(task_id)
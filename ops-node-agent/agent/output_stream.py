@@ -0,0 +1,195 @@
+"""
+任务输出流式上传：执行中的任务通过 OutputStreamer.write() 输出文本，
+按 TASK_OUTPUT_CHUNK_BYTES 或 TASK_OUTPUT_FLUSH_SEC 切片，以递增 seq 上传到
+POST /api/tasks/{task_id}/output（只追加；重传同一 seq 由 Console 去重）。
+
+- 背压：积压满一个片段时 write() 在调用线程内同步上传，后台 flusher 正在上传时则等待其完成，
+  未上传的输出始终不超过约一个片段，任务产出快于上传时被拖慢而不是无限占用内存；
+- 失败重传：上传出错（连接错误、5xx）时 seq 不前进，未上传的数据放回积压，下次以同一 seq 重传，
+  tail 不会出现缺口；Console 持续不可用、积压超过 MAX_BACKLOG_CHUNKS 个片段时新输出直接丢弃；
+- 上限：Console 返回 truncated 后不再上传，后续输出直接丢弃；
+- Console 不支持该接口（404）或任务已不在运行（409）时停止上传，不影响任务执行与结果回传。
+"""
+import threading
+import time
+
+from .config import config
+from .http_client import post
+
+# 上传持续失败时最多积压的片段数，超出后新输出丢弃
+MAX_BACKLOG_CHUNKS = 8
+
+
+class OutputStreamer:
+    """单个任务的输出上传器，线程安全。"""
+
+    def __init__(self, task_id: str) -> None:
+        self.task_id = task_id
+        self._url = f"{config.CONSOLE_BASE_URL}/api/tasks/{task_id}/output"
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._pending: list[str] = []
+        self._pending_bytes = 0
+        self._first_pending_at = 0.0
+        self._seq = 0
+        self._stopped = False
+        self.sent_bytes = 0
+        self.dropped_bytes = 0
+
+    def write(self, text: str) -> None:
+        """追加输出；积压满一个片段时在调用线程内同步上传（背压：上传慢时 write() 随之变慢）。"""
+        if not text:
+            return
+        n = len(text.encode("utf-8"))
+        with self._lock:
+            if self._stopped or self._pending_bytes >= config.TASK_OUTPUT_CHUNK_BYTES * MAX_BACKLOG_CHUNKS:
+                self.dropped_bytes += n
+                return
+            if not self._pending:
+                self._first_pending_at = time.monotonic()
+            self._pending.append(text)
+            self._pending_bytes += n
+            full = self._pending_bytes >= config.TASK_OUTPUT_CHUNK_BYTES
+        if full:
+            self.flush()
+
+    def due(self) -> bool:
+        """是否有积压超过 TASK_OUTPUT_FLUSH_SEC 的输出（由后台 flusher 调用）。"""
+        with self._lock:
+            return bool(self._pending) and time.monotonic() - self._first_pending_at >= config.TASK_OUTPUT_FLUSH_SEC
+
+    def flush(self) -> bool:
+        """
+        上传积压的输出；同一时刻只有一个线程在上传，保证 seq 顺序。
+        某个片段上传失败时，它和之后的数据放回积压，返回 False。
+        """
+        with self._send_lock:
+            with self._lock:
+                if not self._pending or self._stopped:
+                    return True
+                data = "".join(self._pending)
+                self._pending.clear()
+                self._pending_bytes = 0
+            chunks = split_utf8(data, config.TASK_OUTPUT_CHUNK_BYTES)
+            for i, chunk in enumerate(chunks):
+                sent = self._send(chunk)
+                if sent is None:
+                    self._requeue("".join(chunks[i:]))
+                    return False
+                if not sent:
+                    break
+            return True
+
+    def _requeue(self, data: str) -> None:
+        """把上传失败的数据放回积压最前面（之后 write() 追加的输出排在其后）。"""
+        with self._lock:
+            n = len(data.encode("utf-8"))
+            if self._stopped:
+                self.dropped_bytes += n
+                return
+            if not self._pending:
+                self._first_pending_at = time.monotonic()
+            self._pending.insert(0, data)
+            self._pending_bytes += n
+
+    def _send(self, chunk: str) -> bool | None:
+        """上传一个片段：True 已上传，False 停止上传，None 失败（seq 不前进，稍后以同一 seq 重传）。"""
+        seq = self._seq
+        try:
+            # Console 按 (task_id, seq) 去重，重发同一片段是安全的
+            r = post(self._url, json={"seq": seq, "data": chunk}, retry=True)
+        except Exception as e:
+            print(f"[output] {self.task_id} seq={seq} error: {e}")
+            return None
+        if r.status_code in (404, 409):
+            with self._lock:
+                self._stop_locked()
+            return False
+        if r.status_code != 200:
+            print(f"[output] {self.task_id} seq={seq} http {r.status_code}")
+            return None
+        self._seq += 1
+        data = r.json()
+        self.sent_bytes += int(data.get("accepted_bytes") or 0)
+        if data.get("truncated"):
+            print(f"[output] {self.task_id} output limit reached, further output dropped")
+            with self._lock:
+                self._stop_locked()
+            return False
+        return True
+
+    def _stop_locked(self) -> None:
+        self._stopped = True
+        self.dropped_bytes += self._pending_bytes
+        self._pending.clear()
+        self._pending_bytes = 0
+
+    def close(self) -> None:
+        """
+        任务结束：上传剩余输出。应在回传结果之前调用，Console 只接受运行中任务的输出。
+        此时仍上传失败的输出计入 dropped_bytes。
+        """
+        _registry.remove(self)
+        if not self.flush():
+            with self._lock:
+                print(f"[output] {self.task_id} {self._pending_bytes} byte(s) not uploaded")
+                self._stop_locked()
+
+
+def split_utf8(data: str, max_bytes: int) -> list[str]:
+    """按 UTF-8 字节数切片，不切开多字节字符。"""
+    raw = data.encode("utf-8")
+    if len(raw) <= max_bytes:
+        return [data]
+    parts = []
+    start = 0
+    while start < len(raw):
+        end = min(start + max_bytes, len(raw))
+        # 回退到字符边界（UTF-8 续字节为 10xxxxxx）
+        while end < len(raw) and (raw[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(raw[start:end].decode("utf-8"))
+        start = end
+    return parts
+
+
+class _Registry:
+    """登记运行中的 OutputStreamer，后台线程定时上传积压超过 TASK_OUTPUT_FLUSH_SEC 的输出。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._streamers: set[OutputStreamer] = set()
+        self._thread: threading.Thread | None = None
+
+    def add(self, s: OutputStreamer) -> None:
+        with self._lock:
+            self._streamers.add(s)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="output-flusher", daemon=True)
+                self._thread.start()
+
+    def remove(self, s: OutputStreamer) -> None:
+        with self._lock:
+            self._streamers.discard(s)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(min(config.TASK_OUTPUT_FLUSH_SEC, 1.0))
+            with self._lock:
+                streamers = list(self._streamers)
+            for s in streamers:
+                if s.due():
+                    try:
+                        s.flush()
+                    except Exception as e:
+                        print(f"[output] {s.task_id} flush error: {e}")
+
+
+_registry = _Registry()
+
+
+def open_stream(task_id: str) -> OutputStreamer:
+    """为任务创建输出上传器并登记到后台 flusher。"""
+    s = OutputStreamer(task_id)
+    _registry.add(s)
+    return s
@@ -5,17 +5,26 @@ from .config import config
 from .http_client import post
 
 
-def register() -> bool:
-    """向 Console 注册节点。"""
-    url = f"{config.CONSOLE_BASE_URL}/api/nodes/register"
-    body = {
+def register_body() -> dict:
+    """注册请求体（线程 / asyncio 两种运行时共用）。"""
+    return {
         "node_id": config.NODE_ID,
         "project_key": config.PROJECT_KEY,
         "name": config.NODE_NAME,
         "tags": [],
         "version": "0.1.0",
     }
-    r = post(url, json=body)
+
+
+def heartbeat_body() -> dict:
+    """心跳请求体。"""
+    return {"status": "online"}
+
+
+def register() -> bool:
+    """向 Console 注册节点。"""
+    url = f"{config.CONSOLE_BASE_URL}/api/nodes/register"
+    r = post(url, json=register_body(), retry=True)
     if r.status_code != 200:
         return False
     data = r.json()
@@ -25,8 +34,7 @@ def register() -> bool:
 def heartbeat() -> bool:
     """发送心跳。"""
     url = f"{config.CONSOLE_BASE_URL}/api/nodes/{config.NODE_ID}/heartbeat"
-    body = {"status": "online"}
-    r = post(url, json=body)
+    r = post(url, json=heartbeat_body(), retry=True)
     if r.status_code != 200:
         return False
     data = r.json()
@@ -1,16 +1,135 @@
 """
 任务结果回传。
 """
+import threading
+import time
+from typing import Any
+
 from .config import config
 from .http_client import post
 
 
-def report(task_id: str, status: str, result: str = "{}") -> bool:
-    """回传任务结果。"""
+def report_item(task_id: str, status: str, result: Any = None, attempt: int | None = None) -> dict:
+    """
+    回传条目（两种运行时共用）。attempt 为拉取结果中的认领次数，Console 据此拒绝租约过期后
+    已被回收或重新认领的任务的迟到回传；旧版 Console 不下发 attempt 时省略。
+    """
+    item = {"task_id": task_id, "status": status, "result": {} if result is None else result}
+    if attempt is not None:
+        item["attempt"] = attempt
+    return item
+
+
+def report(
+    task_id: str, status: str, result: Any = None, attempt: int | None = None, resend: bool = False
+) -> bool:
+    """
+    回传任务结果，result 为 JSON 值（作为对象嵌入请求体）；409 表示任务已不属于本次认领。
+    连接错误与 5xx 会重试：重试后（或 resend=True，即此前的批量回传结果未知）收到的 409
+    说明先前的请求已经生效，视为成功。
+    """
     url = f"{config.CONSOLE_BASE_URL}/api/tasks/{task_id}/report"
-    body = {"status": status, "result": result}
-    r = post(url, json=body)
+    body = report_item(task_id, status, result, attempt)
+    del body["task_id"]
+    r = post(url, json=body, retry=True)
+    if r.status_code == 409 and (resend or r.retried):
+        return True
     if r.status_code != 200:
         return False
     data = r.json()
     return data.get("ok") is True
+
+
+def report_batch(items: list[dict]) -> set[str] | None:
+    """
+    批量回传，items 为 {task_id, status, result} 列表。
+    返回 Console 接受的 task_id 集合；Console 不支持批量接口时返回 None。
+    不重试连接错误与 5xx（被拒绝的条目无法区分是否来自首次请求），此时抛出异常，由调用方逐条补发。
+    """
+    url = f"{config.CONSOLE_BASE_URL}/api/tasks/report_batch"
+    r = post(url, json={"items": items})
+    if r.status_code == 404:
+        return None
+    if r.status_code >= 500:
+        raise RuntimeError(f"HTTP {r.status_code}")
+    if r.status_code != 200:
+        return set()
+    data = r.json()
+    return set(data.get("accepted") or [])
+
+
+class ResultBatcher:
+    """
+    结果合并回传：完成的任务先入队，自第一条入队起等待 REPORT_BATCH_WINDOW_SEC
+    （或攒满 REPORT_BATCH_MAX 条）后一次性调用批量接口。
+    Console 不支持批量接口时退回逐条 report()；批量请求出错（结果未知）时本批逐条补发。
+    """
+
+    def __init__(self, window_sec: float, max_items: int) -> None:
+        self._window_sec = window_sec
+        self._max_items = max(1, max_items)
+        self._items: list[dict] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._batch_supported = True
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="result-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, task_id: str, status: str, result: Any = None, attempt: int | None = None) -> None:
+        with self._cond:
+            self._items.append(report_item(task_id, status, result, attempt))
+            self._cond.notify()
+
+    def close(self) -> None:
+        """停止并回传队列中剩余的结果。"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._items and not self._closed:
+                    self._cond.wait()
+                if not self._items and self._closed:
+                    return
+                deadline = time.monotonic() + self._window_sec
+                while len(self._items) < self._max_items and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._items[:self._max_items]
+                del self._items[:self._max_items]
+            self._send(batch)
+
+    def _send(self, batch: list[dict]) -> None:
+        accepted: set[str] | None = None
+        resend = False
+        if self._batch_supported:
+            try:
+                accepted = report_batch(batch)
+            except Exception as e:
+                print(f"[report] batch error: {e}, resend one by one")
+                resend = True
+            if accepted is None and not resend:
+                print("[report] console has no batch endpoint, fall back to single report")
+                self._batch_supported = False
+        if accepted is None:
+            accepted = set()
+            for it in batch:
+                try:
+                    if report(it["task_id"], it["status"], it["result"], it.get("attempt"), resend=resend):
+                        accepted.add(it["task_id"])
+                except Exception as e:
+                    print(f"[report] {it['task_id']} error: {e}")
+        for it in batch:
+            if it["task_id"] in accepted:
+                print(f"[task] {it['task_id']} {it['status']}")
+            else:
+                print(f"[task] {it['task_id']} report fail")
@@ -1,20 +1,28 @@
 """
 ops-node-agent 入口：注册 → 心跳 → 拉取 → 执行 → 回传。
 """
+import json
+import os
 import signal
 import sys
 import threading
 import time
 
 from .config import config
+from .http_client import stats as http_stats
+from .lease_renewer import LeaseRenewer
 from .registrar import heartbeat, register
-from .reporter import report
-from .task_executor import execute
+from .reporter import ResultBatcher
 from .task_puller import pull_created_tasks
+from .worker_pool import TaskPool, parse_type_limits
+
+# SIGINT / SIGTERM 置位：停止拉取，等待在途任务执行并回传后退出
+_stop = threading.Event()
 
 
 def _heartbeat_loop():
-    """心跳循环。"""
+    """心跳循环；每 HTTP_STATS_INTERVAL_SEC 输出一次 HTTP 连接复用与 RTT 统计。"""
+    last_stats = time.monotonic()
     while True:
         time.sleep(config.HEARTBEAT_INTERVAL_SEC)
         try:
@@ -24,6 +32,9 @@ def _heartbeat_loop():
                 print("[heartbeat] fail")
         except Exception as e:
             print(f"[heartbeat] error: {e}")
+        if config.HTTP_STATS_INTERVAL_SEC > 0 and time.monotonic() - last_stats >= config.HTTP_STATS_INTERVAL_SEC:
+            last_stats = time.monotonic()
+            print(f"[http] {json.dumps(http_stats(), ensure_ascii=False)}")
 
 
 def _main_loop():
@@ -38,27 +49,58 @@ def _main_loop():
     t = threading.Thread(target=_heartbeat_loop, daemon=True)
     t.start()
 
-    while True:
-        time.sleep(config.TASK_POLL_INTERVAL_SEC)
+    batcher = ResultBatcher(config.REPORT_BATCH_WINDOW_SEC, config.REPORT_BATCH_MAX)
+    batcher.start()
+    renewer = LeaseRenewer(config.TASK_LEASE_RENEW_SEC)
+    renewer.start()
+    pool = TaskPool(config.TASK_WORKERS, parse_type_limits(config.TASK_TYPE_CONCURRENCY), batcher, renewer)
+    try:
+        _poll_loop(pool)
+    finally:
+        print("[agent] draining in-flight tasks")
+        # 排空期间继续续租，执行完的任务回传前不会被 Console 回收
+        pool.drain()
+        renewer.close()
+        batcher.close()
+    print("[agent] shutdown")
+
+
+def _poll_loop(pool: TaskPool):
+    """拉取任务交给执行池；池满时暂停拉取，且每次最多拉取空闲槽位数。"""
+    long_poll = config.TASK_LONG_POLL_SEC > 0
+    while not _stop.is_set():
+        if not long_poll and _stop.wait(config.TASK_POLL_INTERVAL_SEC):
+            break
+        if not pool.wait_for_slot(timeout=1):
+            continue
+        started = time.monotonic()
+        tasks = []
         try:
-            tasks = pull_created_tasks()
+            limit = min(pool.free_slots(), config.TASK_PULL_BATCH) or 1
+            tasks = pull_created_tasks(wait=config.TASK_LONG_POLL_SEC, limit=limit)
             for task in tasks:
-                task_id = task.get("task_id", "")
-                if not task_id:
-                    continue
-                status, result = execute(task)
-                if report(task_id, status, result):
-                    print(f"[task] {task_id} {status}")
-                else:
-                    print(f"[task] {task_id} report fail")
+                if task.get("task_id"):
+                    pool.submit(task)
         except Exception as e:
             print(f"[pull] error: {e}")
+        # 长轮询立即返回空结果（出错或旧版 Console 不支持 wait）时退回定时轮询，避免空转
+        if long_poll and not tasks and time.monotonic() - started < 1:
+            _stop.wait(config.TASK_POLL_INTERVAL_SEC)
 
 
 def main():
+    if config.AGENT_RUNTIME == "asyncio":
+        from .async_runtime import main as async_main
+
+        async_main()
+        return
+
     def _sig(signum, frame):
-        print("\n[agent] shutdown")
-        sys.exit(0)
+        if _stop.is_set():
+            print("\n[agent] forced exit")
+            os._exit(1)
+        print("\n[agent] shutdown requested, finishing in-flight tasks (signal again to force)")
+        _stop.set()
 
     signal.signal(signal.SIGINT, _sig)
     signal.signal(signal.SIGTERM, _sig)
@@ -1,16 +1,95 @@
 """
-任务执行：当前仅支持 PING，模拟成功。
+任务执行：PING（探活）、ECHO（回显 payload，运行中流式输出）。
+execute() 供线程运行时使用；execute_async() 供 asyncio 运行时使用，PING / ECHO 为协程实现。
 """
-# task: {"task_id", "node_id", "type", "payload", "state", "created_at", "updated_at"}
+import asyncio
+import json
+import time
+from typing import Any
 
+# task: {"task_id", "node_id", "type", "payload", "state", "attempt", "lease_expires_at", "created_at", "updated_at"}
+# payload 为 JSON 值（通常是 dict，也可以是字符串等）；旧版 Console 下发的是编码后的 JSON 文本，由 _payload 兼容
+# output: 可选的输出流，任务运行中通过 output.write() 上传输出
+#   线程运行时为 OutputStreamer；asyncio 运行时为 AsyncOutputStreamer（write() 为协程）
 
-def execute(task: dict) -> tuple[str, str]:
+
+def _payload(task: dict) -> Any:
+    """
+    任务 payload。字符串就是字符串值（"123" 不会变成数字）；只有能解析为 JSON 对象的字符串
+    按旧版 Console 下发的已编码对象处理，兼容旧版 Console 上以对象文本保存的 payload。
+    """
+    payload = task.get("payload")
+    if isinstance(payload, str) and payload.lstrip().startswith("{"):
+        try:
+            decoded = json.loads(payload)
+        except ValueError:
+            return payload
+        if isinstance(decoded, dict):
+            return decoded
+    return {} if payload is None else payload
+
+
+def _echo_args(task: dict) -> tuple[str, int, float]:
+    """
+    ECHO：payload 为 {"text": str, "repeat": int, "interval_sec": float}（均可省略），
+    把 text 逐行输出 repeat 次、每次间隔 interval_sec，结果为 {"echo": text}。
+    """
+    payload = _payload(task)
+    if not isinstance(payload, dict):
+        payload = {"text": str(payload)}
+    text = str(payload.get("text", ""))
+    repeat = max(1, int(payload.get("repeat", 1)))
+    interval = max(0.0, float(payload.get("interval_sec", 0)))
+    return text, repeat, interval
+
+
+def _echo(task: dict, output) -> tuple[str, dict]:
+    text, repeat, interval = _echo_args(task)
+    for i in range(repeat):
+        if output is not None:
+            output.write(f"{text}\n")
+        if interval and i < repeat - 1:
+            time.sleep(interval)
+    return "SUCCEEDED", {"echo": text}
+
+
+def execute(task: dict, output=None) -> tuple[str, Any]:
     """
     执行任务，返回 (status, result)。
     status: SUCCEEDED | FAILED
-    result: JSON 字符串
+    result: JSON 值（dict 等），回传时直接嵌入请求体，不再预先编码成字符串
+    """
+    t = task.get("type", "")
+    if t == "PING":
+        return "SUCCEEDED", {}
+    if t == "ECHO":
+        return _echo(task, output)
+    return "FAILED", {"error": "unsupported type"}
+
+
+async def _echo_async(task: dict, output) -> tuple[str, dict]:
+    """ECHO 的协程实现：asyncio.sleep 等待，输出经 AsyncOutputStreamer 上传，不占线程。"""
+    text, repeat, interval = _echo_args(task)
+    for i in range(repeat):
+        if output is not None:
+            await output.write(f"{text}\n")
+        if interval and i < repeat - 1:
+            await asyncio.sleep(interval)
+    return "SUCCEEDED", {"echo": text}
+
+
+# 会产生运行中输出、需要打开输出流的类型
+STREAMING_TYPES = frozenset({"ECHO"})
+
+
+async def execute_async(task: dict, output=None) -> tuple[str, Any]:
+    """
+    asyncio 运行时的执行入口，返回值同 execute()。
+    PING、ECHO 直接在事件循环内执行；其余类型含阻塞调用，放到线程池执行（不传输出流）。
     """
     t = task.get("type", "")
     if t == "PING":
-        return "SUCCEEDED", "{}"
-    return "FAILED", '{"error": "unsupported type"}'
+        return "SUCCEEDED", {}
+    if t == "ECHO":
+        return await _echo_async(task, output)
+    return await asyncio.to_thread(execute, task)
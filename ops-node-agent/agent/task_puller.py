@@ -2,13 +2,21 @@
 拉取任务。
 """
 from .config import config
-from .http_client import get
+from .http_client import TIMEOUT_SEC, get
 
 
-def pull_created_tasks() -> list[dict]:
-    """拉取 state=CREATED 的任务。"""
-    url = f"{config.CONSOLE_BASE_URL}/api/nodes/{config.NODE_ID}/tasks?state=CREATED"
-    r = get(url)
+def pull_created_tasks(wait: int = 0, limit: int | None = None) -> list[dict]:
+    """
+    拉取 state=CREATED 的任务，最多 limit 个（默认 TASK_PULL_BATCH）。
+    wait > 0 时为长轮询：Console 在没有任务时最多挂起 wait 秒。
+    """
+    limit = limit or config.TASK_PULL_BATCH
+    url = f"{config.CONSOLE_BASE_URL}/api/nodes/{config.NODE_ID}/tasks?state=CREATED&limit={limit}"
+    kwargs = {}
+    if wait > 0:
+        url += f"&wait={wait}"
+        kwargs["timeout"] = wait + TIMEOUT_SEC
+    r = get(url, **kwargs)
     if r.status_code != 200:
         return []
     data = r.json()
@@ -0,0 +1,100 @@
+"""
+任务执行池：TASK_WORKERS 个工作线程并发执行任务，可按任务类型限制并发（TASK_TYPE_CONCURRENCY）。
+超出类型上限的任务在池内排队，不占用工作线程；排队中的任务也计入在途数量，池满时主循环暂停拉取。
+在途任务（含排队中的）登记到 LeaseRenewer 定期续租，结果交给回传队列后移除。
+"""
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import config
+from .lease_renewer import LeaseRenewer
+from .output_stream import open_stream
+from .reporter import ResultBatcher
+from .task_executor import STREAMING_TYPES, execute
+
+
+def parse_type_limits(spec: str) -> dict[str, int]:
+    """解析 "PING=8,ECHO=2" 形式的按类型并发上限，忽略格式错误的项。"""
+    limits = {}
+    for part in spec.split(","):
+        name, _, value = part.partition("=")
+        name = name.strip()
+        try:
+            limit = int(value)
+        except ValueError:
+            continue
+        if name and limit > 0:
+            limits[name] = limit
+    return limits
+
+
+class TaskPool:
+    """有界任务执行池，执行结果交给 ResultBatcher 回传。"""
+
+    def __init__(
+        self, size: int, type_limits: dict[str, int], batcher: ResultBatcher, renewer: LeaseRenewer | None = None
+    ) -> None:
+        self._size = max(1, size)
+        self._type_limits = type_limits
+        self._batcher = batcher
+        self._renewer = renewer
+        self._executor = ThreadPoolExecutor(max_workers=self._size, thread_name_prefix="task")
+        self._cond = threading.Condition()
+        self._inflight = 0
+        self._type_running: dict[str, int] = {}
+        self._type_pending: dict[str, deque] = {}
+
+    def free_slots(self) -> int:
+        with self._cond:
+            return max(0, self._size - self._inflight)
+
+    def wait_for_slot(self, timeout: float) -> bool:
+        """等待出现空闲槽位；超时返回 False。"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._inflight < self._size, timeout)
+
+    def submit(self, task: dict) -> None:
+        t = task.get("type", "")
+        if self._renewer is not None:
+            self._renewer.track(task["task_id"])
+        with self._cond:
+            self._inflight += 1
+            limit = self._type_limits.get(t)
+            if limit is not None and self._type_running.get(t, 0) >= limit:
+                self._type_pending.setdefault(t, deque()).append(task)
+                return
+            self._type_running[t] = self._type_running.get(t, 0) + 1
+        self._executor.submit(self._run, task)
+
+    def _run(self, task: dict) -> None:
+        t = task.get("type", "")
+        try:
+            output = open_stream(task["task_id"]) if config.TASK_OUTPUT_STREAM and t in STREAMING_TYPES else None
+            try:
+                status, result = execute(task, output)
+            except Exception as e:
+                status, result = "FAILED", {"error": str(e)}
+            finally:
+                # 先传完剩余输出再回传结果：任务结束后 Console 不再接受输出
+                if output is not None:
+                    output.close()
+            self._batcher.submit(task["task_id"], status, result, task.get("attempt"))
+        finally:
+            if self._renewer is not None:
+                self._renewer.release(task["task_id"])
+            with self._cond:
+                self._inflight -= 1
+                pending = self._type_pending.get(t)
+                nxt = pending.popleft() if pending else None
+                if nxt is None:
+                    self._type_running[t] -= 1
+                self._cond.notify_all()
+            if nxt is not None:
+                self._executor.submit(self._run, nxt)
+
+    def drain(self) -> None:
+        """等待所有在途任务（含排队中的）执行完毕并关闭线程池。"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._inflight == 0)
+        self._executor.shutdown(wait=True)